@@ -1,64 +1,311 @@
-import pandas as pd
+import argparse
 import asyncio
-import aiohttp
-import math
+import json
+import sqlite3
 import time
+from email.utils import parsedate_to_datetime
+
+import aiohttp
+import numpy as np
+import pandas as pd
+
+from src.dataset import BASE_DATASET, CITY_DATASET
+from src.dem import add_elevation_column
+from src.profiling import add_arguments as add_profiling_arguments, session, stage
 
-INPUT_FILE = "data/processed/worldcities_time_dilation.csv"
-OUTPUT_FILE = "data/processed/worldcities_time_dilation_with_elevation.csv"
+INPUT_FILE = BASE_DATASET
+OUTPUT_FILE = CITY_DATASET
+CACHE_FILE = "data/processed/elevation_cache.sqlite"
+REPORT_FILE = "data/processed/elevation_failures.json"
 
 BATCH_SIZE = 100  # OpenTopoData allows batches of 100 locations
 API_URL = "https://api.opentopodata.org/v1/srtm90m"
 
+CONCURRENCY = 4         # requests in flight at once
+RATE_PER_SECOND = 1.0   # public OpenTopoData limit: 1 call per second
+BURST = 1               # requests allowed back to back before the rate applies
+RETRIES = 3
+BACKOFF = 0.5           # seconds, doubled after every failed attempt
+
+# Coordinates are cached at 1e-5 degrees (~1 m), well below SRTM resolution
+KEY_SCALE = 100_000
+
+# Keys per cache query: 2 parameters each, under SQLite's 999-parameter default
+LOOKUP_BATCH = 400
+
+
+class TokenBucket:
+    """
+    Async token bucket: `rate` tokens per second, bursts up to `capacity`.
+    """
+
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity,
+                                  self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class ElevationCache:
+    """
+    Persistent SQLite cache of elevations keyed on rounded coordinates.
+    Every successful batch is committed right away, so it doubles as the
+    checkpoint: a restarted run only requests points that are not cached.
+    Points the API returns as null (e.g. open ocean) are cached as NULL.
+    """
+
+    def __init__(self, path=CACHE_FILE):
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS elevation ("
+            "lat_key INTEGER, lng_key INTEGER, elevation REAL, "
+            "PRIMARY KEY (lat_key, lng_key))"
+        )
+
+    def get_many(self, keys, batch_size=LOOKUP_BATCH):
+        """
+        Cached elevations for a list of (lat_key, lng_key), one
+        `(lat_key, lng_key) IN (VALUES ...)` query per batch of keys.
+        """
+        found = {}
+        cur = self.conn.cursor()
+        for batch in chunk_keys(list(keys), batch_size):
+            values = ", ".join(["(?, ?)"] * len(batch))
+            params = [k for key in batch for k in key]
+            rows = cur.execute(
+                "SELECT lat_key, lng_key, elevation FROM elevation "
+                f"WHERE (lat_key, lng_key) IN (VALUES {values})",
+                params,
+            )
+            for lat_key, lng_key, elevation in rows:
+                found[(lat_key, lng_key)] = elevation
+        return found
+
+    def put_many(self, items):
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO elevation VALUES (?, ?, ?)",
+            [(lat_key, lng_key, elev) for (lat_key, lng_key), elev in items],
+        )
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+
+def coordinate_keys(lat, lng):
+    """
+    Integer cache keys for arrays of coordinates.
+    """
+    lat_key = np.rint(np.asarray(lat, dtype=np.float64) * KEY_SCALE).astype(np.int64)
+    lng_key = np.rint(np.asarray(lng, dtype=np.float64) * KEY_SCALE).astype(np.int64)
+    return lat_key, lng_key
 
-def chunk_rows(df, batch_size):
-    for i in range(0, len(df), batch_size):
-        yield df.iloc[i:i + batch_size]
 
+def chunk_keys(keys, batch_size):
+    for i in range(0, len(keys), batch_size):
+        yield keys[i:i + batch_size]
 
-async def fetch_batch(session, batch):
-    locations_str = "|".join(f"{row.lat},{row.lng}" for _, row in batch.iterrows())
-    params = {"locations": locations_str}
 
-    for attempt in range(3):  # retry logic
-        try:
-            async with session.get(API_URL, params=params) as response:
-                data = await response.json()
-                return data
-        except Exception:
-            await asyncio.sleep(0.5)
+def retry_after(value):
+    """
+    Seconds to wait from a Retry-After header (delta-seconds or an HTTP
+    date), or None if absent or unparseable.
+    """
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
 
-    return None
 
+def locations_param(keys):
+    return "|".join(
+        f"{lat_key / KEY_SCALE:.5f},{lng_key / KEY_SCALE:.5f}" for lat_key, lng_key in keys
+    )
 
-async def main():
-    df = pd.read_csv(INPUT_FILE)
-    df["elevation_meters"] = None
 
-    batches = list(chunk_rows(df, BATCH_SIZE))
-    total_batches = len(batches)
+async def fetch_batch(session, keys, semaphore, bucket, api_url=API_URL, retries=RETRIES):
+    """
+    Fetch one batch of locations. Returns (elevations, None) on success or
+    (None, error message) once every retry has failed. HTTP 429 waits for
+    Retry-After (or the backoff if longer); other 4xx responses are not
+    retried since the same request would fail again.
+    """
+    params = {"locations": locations_param(keys)}
+    error = None
 
-    print(f"Fetching elevation in {total_batches} batches...")
+    for attempt in range(retries):  # retry logic
+        delay = BACKOFF * 2**attempt
+        async with semaphore:
+            await bucket.acquire()
+            try:
+                async with session.get(api_url, params=params) as response:
+                    if response.status == 429:
+                        error = "HTTP 429"
+                        delay = max(delay, retry_after(response.headers.get("Retry-After")) or 0.0)
+                    elif 400 <= response.status < 500:
+                        return None, f"HTTP {response.status}"
+                    elif response.status != 200:
+                        error = f"HTTP {response.status}"
+                    else:
+                        data = await response.json()
+                        results = data.get("results")
+                        if results is None or len(results) != len(keys):
+                            error = f"bad response: {data.get('status', 'no results')}"
+                        else:
+                            return [r.get("elevation") for r in results], None
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+                error = f"{type(e).__name__}: {e}"
+
+        if attempt < retries - 1:
+            await asyncio.sleep(delay)
+
+    return None, error
+
+
+async def fetch_elevations(lat, lng, cache, api_url=API_URL, batch_size=BATCH_SIZE,
+                           concurrency=CONCURRENCY, rate=RATE_PER_SECOND, burst=BURST,
+                           retries=RETRIES, progress_every=20):
+    """
+    Elevations for arrays of coordinates. Duplicate and already-cached points
+    never hit the API; the rest are fetched in batches with at most
+    `concurrency` requests in flight and at most `rate` requests per second
+    after an initial burst of `burst`.
+    Returns (elevations as float array with NaN for missing, failure report).
+    """
+    lat_key, lng_key = coordinate_keys(lat, lng)
+    pairs = np.stack([lat_key, lng_key], axis=1)
+    unique, inverse = np.unique(pairs, axis=0, return_inverse=True)
+    unique = [tuple(k) for k in unique.tolist()]
+
+    known = cache.get_many(unique)
+    missing = [k for k in unique if k not in known]
+    batches = list(chunk_keys(missing, batch_size))
+
+    print(f"{len(unique)} unique points, {len(known)} cached, "
+          f"fetching {len(missing)} in {len(batches)} batches...")
+
+    semaphore = asyncio.Semaphore(concurrency)
+    bucket = TokenBucket(rate, capacity=burst)
+    failures = []
+
+    async def run(idx, keys):
+        elevations, error = await fetch_batch(session, keys, semaphore, bucket,
+                                              api_url, retries)
+        return idx, keys, elevations, error
+
+    timeout = aiohttp.ClientTimeout(total=60)
+    async with aiohttp.ClientSession(timeout=timeout) as session:
+        tasks = [asyncio.create_task(run(idx, keys)) for idx, keys in enumerate(batches)]
+
+        for done, task in enumerate(asyncio.as_completed(tasks), start=1):
+            idx, keys, elevations, error = await task
+
+            if error is None:
+                items = list(zip(keys, elevations))
+                cache.put_many(items)
+                known.update(items)
+            else:
+                failures.append({
+                    "batch": idx,
+                    "locations": len(keys),
+                    "first_location": locations_param(keys[:1]),
+                    "error": error,
+                })
+
+            if progress_every and done % progress_every == 0:
+                print(f"Processed {done}/{len(batches)} batches...")
+
+    values = np.array(
+        [np.nan if known.get(k) is None else known[k] for k in unique], dtype=np.float64
+    )
+    return values[inverse.ravel()], sorted(failures, key=lambda f: f["batch"])
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Add elevation_meters to the city dataset.")
+    parser.add_argument("--input", default=INPUT_FILE)
+    parser.add_argument("--output", default=OUTPUT_FILE)
+    parser.add_argument("--cache", default=CACHE_FILE, help="SQLite coordinate cache")
+    parser.add_argument("--report", default=REPORT_FILE, help="per-batch failure report (JSON)")
+    parser.add_argument("--api-url", default=API_URL)
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY)
+    parser.add_argument("--rate", type=float, default=RATE_PER_SECOND,
+                        help="max requests per second")
+    parser.add_argument("--burst", type=int, default=BURST,
+                        help="requests allowed back to back before --rate applies")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--dem-dir", default=None,
+                        help="read elevations offline from local .hgt/.tif tiles instead of the API")
+    add_profiling_arguments(parser)
+    return parser.parse_args(argv)
+
+
+async def main(argv=None):
+    args = parse_args(argv)
+    with session("elevation", args.trace, args.profile):
+        await run(args)
+
+
+async def run(args):
+    with stage("read") as s:
+        df = pd.read_csv(args.input)
+        s.items = len(df)
 
     start_time = time.time()
 
-    async with aiohttp.ClientSession() as session:
-        for idx, batch in enumerate(batches):
-            data = await fetch_batch(session, batch)
+    if args.dem_dir:
+        with stage("dem lookup", items=len(df)):
+            add_elevation_column(df, args.dem_dir)
+        print(f"Done in {time.time() - start_time:.2f} seconds (offline DEM).")
+        with stage("write", items=len(df)):
+            df.to_csv(args.output, index=False)
+        print(f"Saved to {args.output}")
+        return
 
-            if data and "results" in data:
-                # Assign elevations back to the dataframe
-                elevations = [r.get("elevation") for r in data["results"]]
-                df.loc[batch.index, "elevation_meters"] = elevations
+    cache = ElevationCache(args.cache)
+    try:
+        with stage("fetch", items=len(df)):
+            elevations, failures = await fetch_elevations(
+                df["lat"].to_numpy(), df["lng"].to_numpy(), cache,
+                api_url=args.api_url, batch_size=args.batch_size,
+                concurrency=args.concurrency, rate=args.rate, burst=args.burst,
+            )
+    finally:
+        cache.close()
 
-            if idx % 20 == 0:
-                print(f"Processed {idx}/{total_batches} batches...")
+    df["elevation_meters"] = elevations
 
     elapsed = time.time() - start_time
     print(f"Done in {elapsed:.2f} seconds.")
 
-    df.to_csv(OUTPUT_FILE, index=False)
-    print(f"Saved to {OUTPUT_FILE}")
+    with open(args.report, "w") as f:
+        json.dump({"failed_batches": len(failures), "batches": failures}, f, indent=2)
+    if failures:
+        print(f"{len(failures)} batches failed, see {args.report}; rerun to retry them.")
+
+    with stage("write", items=len(df)):
+        df.to_csv(args.output, index=False)
+    print(f"Saved to {args.output}")
 
 
 if __name__ == "__main__":
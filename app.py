@@ -1,17 +1,70 @@
+import io
 import os
-import numpy as np
-import pandas as pd
-import streamlit as st
-import matplotlib.pyplot as plt
+import sys
+
+from src.profiling import RECENT, enabled as tracing_enabled, format_summary, stage, summarize, traced
+from src.startup import StartupProfile
+
+# UNFELT_TIME_STARTUP_PROFILE=1 prints and shows a per-phase startup report;
+# UNFELT_TIME_TRACE=<path> also records every phase, tab run and chart render
+startup = StartupProfile()
+
+with startup.phase("import numpy, streamlit"):
+    import numpy as np
+    import streamlit as st
+
+with startup.phase("import src modules"):
+    from src.city_index import CityIndex
+    from src.dataset import CITY_DATASET, compact_table, load_dataset, source_hash
+    from src.dilation_raster import DilationRaster
+    from src.dilation import add_dilation_columns
+    from src.pairwise import PairwiseEngine
+    from src.rank_index import RankIndex, load_or_build as load_or_build_ranks, sidecar_path
+    from src.shared_store import arrays_to_frame, frame_to_arrays, publish_or_attach
+    from src.spatial_index import CitySpatialIndex, load_or_build
+
+
+def pyplot():
+    # matplotlib costs ~0.5 s to import; only pay it when a chart is drawn
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    return plt
 
 # -------------------------------------------------------
 # Load Time Dilation Dataset
 # -------------------------------------------------------
 
+# Compact mode (default) keeps only the fields the UI uses, with float32
+# coordinates/elevation/population; UNFELT_TIME_COMPACT_TABLE=0 loads every column.
+COMPACT_TABLE = os.environ.get("UNFELT_TIME_COMPACT_TABLE", "1") != "0"
+APP_COLUMNS = ["city_ascii", "country", "lat", "lng", "elevation_meters"]
+OPTIONAL_APP_COLUMNS = ["admin_name", "population", "continent_guess",
+                        "aging_factor", "microseconds_difference_per_year"]
+FLOAT32_COLUMNS = ["lat", "lng", "elevation_meters", "population"]
+
+# Several app processes on one host: UNFELT_TIME_SHARED=1 publishes the city
+# table and the array parts of every index (city names, spatial, pairwise,
+# rank) once into shared memory (src/shared_store.py) and every process
+# attaches read-only instead of holding its own copy. What stays per process
+# is the cKDTree's node/index arrays (~1.5 MB for 48k cities) and the
+# Python objects wrapping the views.
+SHARED = os.environ.get("UNFELT_TIME_SHARED", "0") == "1"
+
+
 @st.cache_data
 def load_city_data():
-    path = "data/processed/worldcities_time_dilation_w_elevation.csv"
-    df = pd.read_csv(path)
+    # Memory-mapped from the typed columnar cache after the first run
+    if COMPACT_TABLE:
+        df = load_dataset(CITY_DATASET, APP_COLUMNS, OPTIONAL_APP_COLUMNS)
+    else:
+        df = load_dataset(CITY_DATASET)
+
+    # Gazetteers without precomputed dilation get it from the shared kernel
+    # (from the full-precision elevations, before any float32 downcast)
+    df = add_dilation_columns(df, altitude_col="elevation_meters")
+    if COMPACT_TABLE:
+        df = compact_table(df, FLOAT32_COLUMNS, ["city_ascii", "admin_name", "country"])
 
     # Ensure no missing core fields
     df = df.dropna(
@@ -27,7 +80,86 @@ def load_city_data():
     return df
 
 
-df = load_city_data()
+def shared_key():
+    return f"{source_hash(CITY_DATASET)}:compact={COMPACT_TABLE}"
+
+
+@st.cache_resource
+def load_shared_city_data():
+    # cache_resource hands every session the same attached frame, no copies
+    arrays, meta = publish_or_attach("city_table", shared_key(),
+                                     lambda: frame_to_arrays(load_city_data()))
+    return arrays_to_frame(arrays, meta)
+
+
+def shared_arrays(name, build):
+    # build() -> an object with .arrays; published once, attached everywhere
+    arrays, _ = publish_or_attach(name, shared_key(), lambda: (build().arrays, {}))
+    return arrays
+
+
+@st.cache_resource
+def load_city_index(_df):
+    # Built once per server process and shared by every session
+    if SHARED:
+        return CityIndex.from_arrays(shared_arrays("city_index", lambda: CityIndex(_df)))
+    return CityIndex(_df)
+
+
+SPATIAL_INDEX_PATH = "data/processed/city_spatial_index.pkl"
+
+
+@st.cache_resource
+def load_spatial_index(_df):
+    # Saved next to the dataset so it is not rebuilt at every app start
+    if SHARED:
+        return CitySpatialIndex.from_arrays(
+            shared_arrays("spatial_index", lambda: load_or_build(_df, SPATIAL_INDEX_PATH)))
+    return load_or_build(_df, SPATIAL_INDEX_PATH)
+
+
+@st.cache_resource
+def load_pairwise_engine(_df):
+    if SHARED:
+        return PairwiseEngine.from_arrays(
+            shared_arrays("pairwise", lambda: PairwiseEngine.from_dataframe(_df)))
+    return PairwiseEngine.from_dataframe(_df)
+
+
+@st.cache_resource
+def load_rank_index(_df):
+    # Sidecar written next to the dataset; rebuilt only if the rows changed
+    if SHARED:
+        arrays, _ = publish_or_attach(
+            "rank_index", shared_key(),
+            lambda: (load_or_build_ranks(_df, sidecar_path(CITY_DATASET)).arrays, {}))
+        return RankIndex(arrays)
+    return load_or_build_ranks(_df, sidecar_path(CITY_DATASET))
+
+
+RASTER_DIR = "data/processed/dilation_raster"
+
+
+@st.cache_resource
+def load_dilation_raster():
+    # Optional: baked with python -m src.dilation_raster
+    if os.path.exists(os.path.join(RASTER_DIR, "meta.json")):
+        return DilationRaster(RASTER_DIR)
+    return None
+
+
+with startup.phase("load city table"):
+    df = load_shared_city_data() if SHARED else load_city_data()
+with startup.phase("city name index"):
+    city_index = load_city_index(df)
+with startup.phase("spatial index"):
+    spatial_index = load_spatial_index(df)
+with startup.phase("pairwise engine"):
+    pairwise_engine = load_pairwise_engine(df)
+with startup.phase("rank index"):
+    rank_index = load_rank_index(df)
+with startup.phase("dilation raster"):
+    dilation_raster = load_dilation_raster()
 
 
 # -------------------------------------------------------
@@ -39,10 +171,26 @@ def format_microseconds(us):
     return f"{abs(us):.3f} microseconds {sign} per year"
 
 
+def format_rank(position):
+    rank, total = rank_index.rank(position)
+    percentile = rank_index.percentile(rank_index.values[position])
+    text = f"Global rank: #{rank:,} of {total:,} (clock faster than {percentile:.1f}% of cities)"
+    if "country" in rank_index.group_columns:
+        national, size, country = rank_index.group_rank(position, "country")
+        text += f" · National rank: #{national:,} of {size:,} in {country}"
+    return text
+
+
 # -------------------------------------------------------
 # Physics + Perception Simulations
 # -------------------------------------------------------
 
+# st.cache_data is shared by every session on the server and evicts the
+# least recently used entry once max_entries is reached
+SIM_CACHE_ENTRIES = 32
+RENDER_CACHE_ENTRIES = 32
+
+@st.cache_data(max_entries=SIM_CACHE_ENTRIES, show_spinner=False)
 def simulate_proper_time(total_time=10, velocity_fraction=0.8, steps=1000):
     """
     Simulates proper time vs coordinate time under special relativity.
@@ -57,6 +205,7 @@ def simulate_proper_time(total_time=10, velocity_fraction=0.8, steps=1000):
     return t, proper
 
 
+@st.cache_data(max_entries=SIM_CACHE_ENTRIES, show_spinner=False)
 def simulate_brain_sampling(total_time=2.0, real_fps=1000, brain_fps=20):
     """
     Real time is continuous (1000 Hz), but the brain samples the world
@@ -67,166 +216,263 @@ def simulate_brain_sampling(total_time=2.0, real_fps=1000, brain_fps=20):
     return real_t, perceived
 
 
-def spacetime_worldlines():
+@st.cache_data(max_entries=SIM_CACHE_ENTRIES, show_spinner=False)
+def spacetime_worldlines(total_time=10, velocity=0.6, steps=300):
     """
-    Creates two simple worldlines: one stationary, one moving.
+    Stationary and moving observers as src.worldline.Worldline objects;
+    the moving one experiences less proper time.
     """
-    x = np.linspace(0, 10, 300)
-    ct_stationary = np.linspace(0, 10, 300)
-    ct_moving = 0.6 * ct_stationary  # moving observer experiences less proper time
-    return x, ct_stationary, ct_moving
+    # Imported here: src.simulations pulls in matplotlib
+    from src.simulations import spacetime_worldlines as worldlines
+    return worldlines(total_time, velocity, steps)
 
 
 # -------------------------------------------------------
-# Streamlit UI
+# Cached Chart Rendering
 # -------------------------------------------------------
 
-st.set_page_config(
-    page_title="Unfelt Time",
-    layout="wide"
-)
+def figure_png(fig):
+    """
+    Render a figure to PNG bytes and close it so figures never pile up
+    across reruns.
+    """
+    buf = io.BytesIO()
+    fig.savefig(buf, format="png", dpi=100, bbox_inches="tight")
+    pyplot().close(fig)
+    return buf.getvalue()
 
-st.title("Unfelt Time: A Study of Time Dilation and Human Perception")
 
-tab1, tab2 = st.tabs(["City Time Dilation Explorer", "Why Humans Cannot Feel Time"])
+@st.cache_data(max_entries=RENDER_CACHE_ENTRIES, show_spinner=False)
+@traced("render/proper time")
+def render_proper_time(total_time=10, velocity_fraction=0.8, steps=1000):
+    t, proper = simulate_proper_time(total_time, velocity_fraction, steps)
 
-# -------------------------------------------------------
-# TAB 1: CITY-TO-CITY TIME DIFFERENCE
-# -------------------------------------------------------
-
-with tab1:
-    st.header("City Time Dilation Explorer")
-    st.write(
-        """
-        This tool compares how many microseconds of proper time you gain or lose per year
-        depending on your city’s latitude and elevation.
-        These effects are extremely small, but measurable using precise atomic clocks.
-        """
-    )
+    fig1, ax1 = pyplot().subplots(figsize=(7, 4))
+    ax1.plot(t, t, label="Coordinate Time (Stationary)")
+    ax1.plot(t, proper, label="Proper Time (Moving)")
+    ax1.set_xlabel("Seconds")
+    ax1.set_ylabel("Time Experienced")
+    ax1.legend()
+    return figure_png(fig1)
 
-    cities = df["city_ascii"].sort_values().unique()
 
-    colA, colB = st.columns(2)
+@st.cache_data(max_entries=RENDER_CACHE_ENTRIES, show_spinner=False)
+@traced("render/brain sampling")
+def render_brain_sampling(total_time=2.0, real_fps=1000, brain_fps=20):
+    real_t, perceived_t = simulate_brain_sampling(total_time, real_fps, brain_fps)
 
-    with colA:
-        city_a = st.selectbox("Select City A", cities, index=0)
+    fig2, ax2 = pyplot().subplots(figsize=(7, 4))
+    ax2.plot(real_t, np.zeros_like(real_t), alpha=0.6, label="Real Continuous Time")
+    ax2.scatter(perceived_t, np.zeros_like(perceived_t), color="red", label="Brain Frames")
+    ax2.set_yticks([])
+    ax2.set_xlabel("Seconds")
+    ax2.legend()
+    return figure_png(fig2)
 
-    with colB:
-        city_b = st.selectbox("Select City B", cities, index=1)
 
-    row_a = df[df["city_ascii"] == city_a].iloc[0]
-    row_b = df[df["city_ascii"] == city_b].iloc[0]
+@st.cache_data(max_entries=RENDER_CACHE_ENTRIES, show_spinner=False)
+@traced("render/spacetime worldlines")
+def render_spacetime_worldlines():
+    stationary, moving = spacetime_worldlines()
 
-    # Display metrics
-    colA2, colB2 = st.columns(2)
+    fig3, ax3 = pyplot().subplots(figsize=(6, 5))
+    ax3.plot(stationary.x, stationary.t, label="Stationary Worldline")
+    ax3.plot(moving.x, moving.t, label="Moving Worldline")
+    ax3.set_xlabel("Space")
+    ax3.set_ylabel("ct (Time × Speed of Light)")
+    ax3.legend()
+    return figure_png(fig3)
 
-    with colA2:
-        st.subheader(f"{row_a['city_ascii']} ({row_a['country']})")
-        st.write(f"Latitude: {row_a['lat']:.2f}°")
-        st.write(f"Elevation: {row_a['elevation_meters']:.1f} m")
-        st.write(f"Aging factor: {row_a['aging_factor']:.12f}")
-        st.write("Time shift: " + format_microseconds(row_a["microseconds_difference_per_year"]))
 
-    with colB2:
-        st.subheader(f"{row_b['city_ascii']} ({row_b['country']})")
-        st.write(f"Latitude: {row_b['lat']:.2f}°")
-        st.write(f"Elevation: {row_b['elevation_meters']:.1f} m")
-        st.write(f"Aging factor: {row_b['aging_factor']:.12f}")
-        st.write("Time shift: " + format_microseconds(row_b["microseconds_difference_per_year"]))
+# -------------------------------------------------------
+# Streamlit UI
+# -------------------------------------------------------
 
-    diff = row_a["microseconds_difference_per_year"] - row_b["microseconds_difference_per_year"]
+st.set_page_config(
+    page_title="Unfelt Time",
+    layout="wide"
+)
 
-    st.markdown("---")
-    st.subheader("Relative Difference")
+st.title("Unfelt Time: A Study of Time Dilation and Human Perception")
 
-    st.write(
-        f"Living in **{city_a}** instead of **{city_b}** changes your clock rate by "
-        f"**{abs(diff):.3f} microseconds per year**."
-    )
+# Lazy tabs: only the selected tab's body runs on each rerun
+tab1, tab2 = st.tabs(
+    ["City Time Dilation Explorer", "Why Humans Cannot Feel Time"],
+    key="active_tab",
+    on_change="rerun",
+)
 
-    st.info(
-        """
-        These changes come from two effects:
-        1. Higher elevation has weaker gravity, so clocks tick slightly faster.
-        2. Higher latitude rotates slower with Earth, so clocks tick slightly faster.
+# -------------------------------------------------------
+# TAB 1: CITY-TO-CITY TIME DIFFERENCE
+# -------------------------------------------------------
 
-        Both effects are real, measurable, and predicted by relativity, but far too small to feel.
-        """
-    )
+if tab1.open:
+    with tab1, stage("tab/city explorer"):
+        st.header("City Time Dilation Explorer")
+        st.write(
+            """
+            This tool compares how many microseconds of proper time you gain or lose per year
+            depending on your city’s latitude and elevation.
+            These effects are extremely small, but measurable using precise atomic clocks.
+            """
+        )
+
+        colA, colB = st.columns(2)
+
+        with colA:
+            query_a = st.text_input("Search City A", value="")
+            options_a = city_index.search(query_a, limit=50)
+            city_a = st.selectbox("Select City A", options_a, index=0)
+
+        with colB:
+            query_b = st.text_input("Search City B", value="")
+            options_b = city_index.search(query_b, limit=50)
+            city_b = st.selectbox("Select City B", options_b, index=min(1, len(options_b) - 1))
+
+        if city_a is None or city_b is None:
+            st.warning("No city matches that search.")
+            st.stop()
+
+        row_a = df.iloc[city_index.position(city_a)]
+        row_b = df.iloc[city_index.position(city_b)]
+
+        # Display metrics
+        colA2, colB2 = st.columns(2)
+
+        with colA2:
+            st.subheader(city_a)
+            st.write(f"Latitude: {row_a['lat']:.2f}°")
+            st.write(f"Elevation: {row_a['elevation_meters']:.1f} m")
+            st.write(f"Aging factor: {row_a['aging_factor']:.12f}")
+            st.write("Time shift: " + format_microseconds(row_a["microseconds_difference_per_year"]))
+            st.caption(format_rank(city_index.position(city_a)))
+
+        with colB2:
+            st.subheader(city_b)
+            st.write(f"Latitude: {row_b['lat']:.2f}°")
+            st.write(f"Elevation: {row_b['elevation_meters']:.1f} m")
+            st.write(f"Aging factor: {row_b['aging_factor']:.12f}")
+            st.write("Time shift: " + format_microseconds(row_b["microseconds_difference_per_year"]))
+            st.caption(format_rank(city_index.position(city_b)))
+
+        diff = row_a["microseconds_difference_per_year"] - row_b["microseconds_difference_per_year"]
+
+        st.markdown("---")
+        st.subheader("Relative Difference")
+
+        st.write(
+            f"Living in **{city_a}** instead of **{city_b}** changes your clock rate by "
+            f"**{abs(diff):.3f} microseconds per year**."
+        )
+
+        with st.expander(f"Cities with the closest clock rate to {city_a}"):
+            similar, _ = pairwise_engine.nearest_to_city(city_index.position(city_a), k=100)
+            st.dataframe(
+                df.iloc[similar][["city_ascii", "country", "microseconds_difference_per_year"]],
+                hide_index=True,
+            )
+
+        st.info(
+            """
+            These changes come from two effects:
+            1. Higher elevation has weaker gravity, so clocks tick slightly faster.
+            2. Higher latitude rotates slower with Earth, so clocks tick slightly faster.
+
+            Both effects are real, measurable, and predicted by relativity, but far too small to feel.
+            """
+        )
+
+        st.markdown("---")
+        st.subheader("Dilation Anywhere")
+
+        colP1, colP2 = st.columns(2)
+        with colP1:
+            point_lat = st.number_input("Latitude", min_value=-90.0, max_value=90.0, value=float(row_a["lat"]))
+        with colP2:
+            point_lng = st.number_input("Longitude", min_value=-180.0, max_value=180.0, value=float(row_a["lng"]))
+
+        estimate = spatial_index.interpolate([point_lat], [point_lng])[0]
+        dist_km, nearest, _ = spatial_index.query([point_lat], [point_lng], k=5)
+
+        st.write("Estimated time shift here: " + format_microseconds(estimate))
+        if dilation_raster is not None:
+            physics = dilation_raster.point([point_lat], [point_lng])[0]
+            st.write("Physics at this point (raster): " + format_microseconds(physics))
+
+        neighbours = df.iloc[nearest[0]][["city_ascii", "country", "microseconds_difference_per_year"]].copy()
+        neighbours["distance_km"] = dist_km[0]
+        st.dataframe(neighbours, hide_index=True)
 
 
 # -------------------------------------------------------
 # TAB 2: WHY HUMANS CANNOT FEEL TIME
 # -------------------------------------------------------
 
-with tab2:
-    st.header("Why Humans Cannot Feel Time")
-
-    st.write(
-        """
-        Humans cannot directly feel the passage of time.  
-        These visualizations explain the physics and neuroscience behind why.
-        """
-    )
-
-    # 1. Special Relativity
-    st.subheader("1. Special Relativity: Proper Time vs Coordinate Time")
-    t, proper = simulate_proper_time()
-
-    fig1, ax1 = plt.subplots(figsize=(7, 4))
-    ax1.plot(t, t, label="Coordinate Time (Stationary)")
-    ax1.plot(t, proper, label="Proper Time (Moving)")
-    ax1.set_xlabel("Seconds")
-    ax1.set_ylabel("Time Experienced")
-    ax1.legend()
-    st.pyplot(fig1)
-
-    st.write(
-        """
-        Motion reduces experienced time.  
-        A fast moving observer experiences less time passing but never notices this difference
-        because biological perception operates at a much larger scale.
-        """
-    )
+if tab2.open:
+    with tab2, stage("tab/why humans cannot feel time"):
+        st.header("Why Humans Cannot Feel Time")
+
+        st.write(
+            """
+            Humans cannot directly feel the passage of time.  
+            These visualizations explain the physics and neuroscience behind why.
+            """
+        )
+
+        # 1. Special Relativity
+        st.subheader("1. Special Relativity: Proper Time vs Coordinate Time")
+        st.image(render_proper_time())
+
+        st.write(
+            """
+            Motion reduces experienced time.  
+            A fast moving observer experiences less time passing but never notices this difference
+            because biological perception operates at a much larger scale.
+            """
+        )
+
+        # 2. Brain Sampling
+        st.subheader("2. Human Perception: The Brain Samples Reality")
+        st.image(render_brain_sampling())
+
+        st.write(
+            """
+            The brain takes snapshots of the world around 20 times per second.  
+            Because perception is discrete, time never feels continuous.
+            We only feel change, not time itself.
+            """
+        )
+
+        # 3. Spacetime Diagram
+        st.subheader("3. Spacetime Diagram: Why We Cannot Move Through Time at Will")
+        st.image(render_spacetime_worldlines())
+
+        st.write(
+            """
+            In spacetime, motion defines your worldline.  
+            But you cannot change your velocity through time like you can through space.
+            You are locked to a single forward direction, so you cannot feel or control time flow.
+            """
+        )
+
+        st.success("The theory section is complete and demonstrates the physics and neuroscience clearly.")
 
-    # 2. Brain Sampling
-    st.subheader("2. Human Perception: The Brain Samples Reality")
-    real_t, perceived_t = simulate_brain_sampling()
 
-    fig2, ax2 = plt.subplots(figsize=(7, 4))
-    ax2.plot(real_t, np.zeros_like(real_t), alpha=0.6, label="Real Continuous Time")
-    ax2.scatter(perceived_t, np.zeros_like(perceived_t), color="red", label="Brain Frames")
-    ax2.set_yticks([])
-    ax2.set_xlabel("Seconds")
-    ax2.legend()
-    st.pyplot(fig2)
-
-    st.write(
-        """
-        The brain takes snapshots of the world around 20 times per second.  
-        Because perception is discrete, time never feels continuous.
-        We only feel change, not time itself.
-        """
-    )
+# -------------------------------------------------------
+# Startup profile
+# -------------------------------------------------------
 
-    # 3. Spacetime Diagram
-    st.subheader("3. Spacetime Diagram: Why We Cannot Move Through Time at Will")
-    x, ct_stat, ct_mov = spacetime_worldlines()
+if os.environ.get("UNFELT_TIME_STARTUP_PROFILE"):
+    report = startup.format()
+    if not StartupProfile.printed:
+        # The first run of a server process is the cold start
+        print(report, file=sys.stderr)
+        StartupProfile.printed = True
+    with st.sidebar.expander("Startup profile"):
+        st.code(report)
 
-    fig3, ax3 = plt.subplots(figsize=(6, 5))
-    ax3.plot(x, ct_stat, label="Stationary Worldline")
-    ax3.plot(x, ct_mov, label="Moving Worldline")
-    ax3.set_xlabel("Space")
-    ax3.set_ylabel("ct (Time × Speed of Light)")
-    ax3.legend()
-    st.pyplot(fig3)
-
-    st.write(
-        """
-        In spacetime, motion defines your worldline.  
-        But you cannot change your velocity through time like you can through space.
-        You are locked to a single forward direction, so you cannot feel or control time flow.
-        """
-    )
 
-    st.success("The theory section is complete and demonstrates the physics and neuroscience clearly.")
+if tracing_enabled():
+    # Stage totals over the most recent stages of this server process (all sessions)
+    with st.sidebar.expander("Stage trace"):
+        st.code(format_summary(summarize(list(RECENT))))
@@ -0,0 +1,622 @@
+"""
+Benchmark suite for every pipeline stage.
+
+Each benchmark takes a row count n, builds synthetic inputs (not timed) and
+returns a zero-argument callable that runs the stage once. Wall time is the
+median of several repeats (the best is kept alongside); peak memory is
+measured in a separate run under tracemalloc (NumPy allocations included).
+
+Timings are only comparable on the same kind of host: --compare skips the
+gate with a warning when the baseline was recorded on a machine with
+another architecture or CPU count (--force-compare checks anyway).
+
+Usage (from the repository root):
+    python benchmarks/run_benchmarks.py                      # 1k..100k rows
+    python benchmarks/run_benchmarks.py --max-rows 10000000  # up to 10M
+    python benchmarks/run_benchmarks.py --only physics --output out.json
+    python benchmarks/run_benchmarks.py --compare benchmarks/baseline.json --threshold 0.25
+    (exits 1 on any regression past the threshold)
+    python benchmarks/run_benchmarks.py --update-baseline
+"""
+import argparse
+import asyncio
+import gc
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+import matplotlib
+matplotlib.use("Agg")
+
+import numpy as np
+import pandas as pd
+
+BASELINE_FILE = os.path.join("benchmarks", "baseline.json")
+SIZES = [1_000, 10_000, 100_000, 1_000_000, 10_000_000]
+DEFAULT_MAX_ROWS = 100_000
+REPEATS = 7
+THRESHOLD = 0.25
+MIN_DELTA = 0.010  # seconds; slowdowns smaller than this are scheduler noise
+HOST_FIELDS = ("machine", "cpus")  # baseline meta that must match to compare
+
+BENCHMARKS = {}
+
+
+def benchmark(name, max_rows=None):
+    """
+    Register fn(n) -> callable under name. max_rows caps the sizes for
+    stages that are inherently slow (HTTP, training, rendering).
+    """
+    def register(fn):
+        BENCHMARKS[name] = (fn, max_rows)
+        return fn
+    return register
+
+
+# -------------------------------------------------------------------
+# Synthetic inputs
+# -------------------------------------------------------------------
+
+COUNTRIES = np.array(["United States", "China", "France", "Brazil", "Kenya",
+                      "Australia", "India", "Fiji"])
+
+
+def synthetic_cities(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "city": [f"City{i}" for i in range(n)],
+        "city_ascii": [f"City{i % max(n // 3, 1)}" for i in range(n)],
+        "lat": np.degrees(np.arcsin(rng.uniform(-0.95, 0.95, n))),
+        "lng": rng.uniform(-180, 180, n),
+        "country": rng.choice(COUNTRIES, n),
+        "admin_name": rng.choice(["North", "South", "East", "West"], n),
+        "population": rng.lognormal(10, 2, n),
+        "id": np.arange(n),
+    })
+
+
+def synthetic_dataset(n, seed=0):
+    from generate_city_time_dataset import process_chunk
+
+    df = process_chunk(synthetic_cities(n, seed))
+    df["elevation_meters"] = df["altitude_m"]
+    return df
+
+
+# -------------------------------------------------------------------
+# Stages
+# -------------------------------------------------------------------
+
+@benchmark("generate/process_chunk")
+def bench_generate(n):
+    from generate_city_time_dataset import process_chunk
+
+    df = synthetic_cities(n)
+    return lambda: process_chunk(df.copy())
+
+
+class _StubElevationHandler(BaseHTTPRequestHandler):
+    # Mimics the OpenTopoData `results` response
+    def do_GET(self):
+        query = parse_qs(urlparse(self.path).query)
+        locations = query["locations"][0].split("|")
+        body = json.dumps({
+            "status": "OK",
+            "results": [{"elevation": float(loc.split(",")[0])} for loc in locations],
+        }).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+_stub_server = None
+
+
+def stub_elevation_url():
+    global _stub_server
+    if _stub_server is None:
+        _stub_server = ThreadingHTTPServer(("127.0.0.1", 0), _StubElevationHandler)
+        threading.Thread(target=_stub_server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{_stub_server.server_address[1]}/v1/stub"
+
+
+@benchmark("elevation/fetch_stub", max_rows=100_000)
+def bench_elevation(n):
+    from add_elevation_fast import ElevationCache, fetch_elevations
+
+    df = synthetic_cities(n)
+    url = stub_elevation_url()
+    tmp = tempfile.mkdtemp()
+
+    def run():
+        # Fresh cache every run so every point goes over HTTP
+        cache = ElevationCache(os.path.join(tmp, f"{time.perf_counter_ns()}.sqlite"))
+        asyncio.run(fetch_elevations(df["lat"].to_numpy(), df["lng"].to_numpy(), cache,
+                                     api_url=url, concurrency=16, rate=1e6,
+                                     progress_every=0))
+        cache.close()
+
+    return run
+
+
+@benchmark("train/epoch", max_rows=1_000_000)
+def bench_train_epoch(n):
+    import ml_model
+
+    df = synthetic_dataset(n)
+    X = df[ml_model.FEATURES].to_numpy(dtype=np.float32)
+    y = df[ml_model.TARGET].to_numpy(dtype=np.float32)
+    idx = np.arange(n)
+    scaler = ml_model.fit_scaler_streaming(X, idx)
+    model = ml_model.build_model()
+    ds, _ = ml_model.make_dataset(X, y, idx, scaler, batch_size=ml_model.BATCH_SIZE)
+
+    return lambda: model.fit(ds, epochs=1, verbose=0)
+
+
+@benchmark("predict/single", max_rows=1_000)
+def bench_predict_single(n):
+    from predict_time import predict_time_dilation
+
+    df = synthetic_dataset(n)
+    rows = df[["lat", "lng", "elevation_meters"]].to_numpy()
+
+    def run():
+        for lat, lng, elev in rows:
+            predict_time_dilation(lat, lng, elev)
+
+    return run
+
+
+@benchmark("predict/batched")
+def bench_predict_batched(n):
+    from predict_time import predict_many
+
+    df = synthetic_dataset(n)
+    return lambda: predict_many(df)
+
+
+@benchmark("physics/time_dilation_sequence")
+def bench_physics(n):
+    from src.physics import time_dilation_sequence
+
+    return lambda: time_dilation_sequence(10.0, 0.8 * 299_792_458, steps=n)
+
+
+@benchmark("physics/dilation_offsets")
+def bench_dilation_kernel(n):
+    from src.dilation import dilation_offsets
+
+    rng = np.random.default_rng(0)
+    lat = rng.uniform(-90, 90, n)
+    alt = rng.uniform(-50, 4500, n)
+    return lambda: dilation_offsets(lat, alt)
+
+
+@benchmark("simulations/brain_sampling")
+def bench_brain_sampling(n):
+    from src.simulations import simulation_brain_sampling
+
+    # n real-time samples at 1000 fps
+    return lambda: simulation_brain_sampling(total_time=n / 1000, real_fps=1000, brain_fps=20)
+
+
+@benchmark("simulations/spacetime_ticks")
+def bench_spacetime_ticks(n):
+    from src.simulations import spacetime_ticks
+
+    t = np.linspace(0, 10, n)
+    tau = t * 0.6
+    return lambda: spacetime_ticks(t, tau, num_ticks=100)
+
+
+@benchmark("app/city_lookup")
+def bench_city_lookup(n):
+    from src.city_index import CityIndex
+
+    df = synthetic_cities(n)
+    index = CityIndex(df)
+    prefixes = [f"City{i}" for i in range(0, n, max(n // 100, 1))]
+
+    def run():
+        for prefix in prefixes:
+            for label in index.search(prefix, limit=5):
+                df.iloc[index.position(label)]
+
+    return run
+
+
+@benchmark("app/city_index_build")
+def bench_city_index_build(n):
+    from src.city_index import CityIndex
+
+    df = synthetic_cities(n)
+    return lambda: CityIndex(df)
+
+
+@benchmark("plots/city_time_agg", max_rows=1_000_000)
+def bench_plot_city_time(n):
+    import src.dataset as dataset
+    import src.render as render
+    from plots_city_time import plot_altitude_vs_aging
+
+    tmp = tempfile.mkdtemp()
+    csv_path = os.path.join(tmp, "cities.csv")
+    synthetic_dataset(n).to_csv(csv_path, index=False)
+    cache_dir = os.path.join(tmp, "cache")
+
+    def run():
+        # Cold render every time, into scratch caches so the real ones and
+        # later benchmarks are untouched
+        saved = render.CACHE_DIR, dataset.CACHE_DIR
+        render.CACHE_DIR, dataset.CACHE_DIR = cache_dir, os.path.join(tmp, "datasets")
+        try:
+            shutil.rmtree(cache_dir, ignore_errors=True)
+            plot_altitude_vs_aging(csv_path, show=False)
+        finally:
+            render.CACHE_DIR, dataset.CACHE_DIR = saved
+
+    return run
+
+
+@benchmark("plots/bin_grid")
+def bench_bin_grid(n):
+    from src.render import bin_grid
+
+    rng = np.random.default_rng(0)
+    x = rng.uniform(-180, 180, n)
+    y = rng.uniform(-90, 90, n)
+    v = rng.normal(size=n)
+    return lambda: bin_grid(x, y, v, stat="mean")
+
+
+@benchmark("physics/proper_time_batch")
+def bench_proper_time_batch(n):
+    from src.physics import proper_time_batch
+
+    # 100 observers sharing n // 100 samples
+    rng = np.random.default_rng(0)
+    velocities = rng.uniform(0, 0.9 * 299_792_458, (100, max(n // 100, 1)))
+    return lambda: proper_time_batch(velocities, 0.01)
+
+
+@benchmark("worldline/ticks_and_boost")
+def bench_worldline(n):
+    from src.worldline import Worldline
+
+    line = Worldline.inertial(np.linspace(0, 10, n), 0.6)
+
+    def run():
+        line.ticks(100)
+        line.boost(0.3)
+
+    return run
+
+
+@benchmark("perception/summary")
+def bench_perception(n):
+    from src.perception import perception_summary
+
+    # n frames at 20 fps
+    return lambda: perception_summary(n / 20, rate=20.0, seed=0)
+
+
+@benchmark("perceptibility/simulate_batch")
+def bench_perceptibility(n):
+    from src.perceptibility import simulate_batch
+
+    return lambda: simulate_batch(np.random.default_rng(0), n, 1e-9)
+
+
+@benchmark("trajectory/integrate_flights", max_rows=100_000)
+def bench_trajectory(n):
+    from src.trajectory import GreatCircleFlight, integrate_proper_time
+
+    # One flight per 100 rows, between random cities
+    rng = np.random.default_rng(0)
+    m = max(n // 100, 1)
+    flights = GreatCircleFlight(rng.uniform(-60, 60, m), rng.uniform(-180, 180, m),
+                                rng.uniform(-60, 60, m), rng.uniform(-180, 180, m))
+    return lambda: integrate_proper_time(flights)
+
+
+@benchmark("pairwise/top_pairs")
+def bench_pairwise_top(n):
+    from src.pairwise import PairwiseEngine
+
+    engine = PairwiseEngine.from_dataframe(synthetic_dataset(n))
+
+    def run():
+        engine.top_pairs(k=100)
+        engine.nearest_rate(engine.values[0], k=100)
+        engine.pair_histogram(bins=50)
+
+    return run
+
+
+@benchmark("pairwise/scan_pairs", max_rows=10_000)
+def bench_pairwise_scan(n):
+    from src.pairwise import PairwiseEngine
+
+    engine = PairwiseEngine.from_dataframe(synthetic_dataset(n))
+    return lambda: engine.scan_pairs(k=100, max_km=500, workers=1)
+
+
+@benchmark("rank_index/build")
+def bench_rank_build(n):
+    from src.rank_index import RankIndex
+
+    df = synthetic_dataset(n)
+    return lambda: RankIndex.from_dataframe(df)
+
+
+@benchmark("rank_index/query")
+def bench_rank_query(n):
+    from src.rank_index import RankIndex
+
+    index = RankIndex.from_dataframe(synthetic_dataset(n))
+    positions = np.arange(0, n, max(n // 1000, 1))
+
+    def run():
+        for position in positions:
+            index.rank(position)
+            index.group_rank(position)
+        index.percentile(index.values[positions])
+
+    return run
+
+
+@benchmark("dataset/convert", max_rows=1_000_000)
+def bench_dataset_convert(n):
+    from src.dataset import load_columns
+
+    tmp = tempfile.mkdtemp()
+    csv_path = os.path.join(tmp, "cities.csv")
+    synthetic_dataset(n).to_csv(csv_path, index=False)
+    cache_dir = os.path.join(tmp, "cache")
+
+    def run():
+        # Cold conversion every time
+        shutil.rmtree(cache_dir, ignore_errors=True)
+        load_columns(csv_path, cache_dir=cache_dir)
+
+    return run
+
+
+@benchmark("dataset/load_cached", max_rows=1_000_000)
+def bench_dataset_load(n):
+    from src.dataset import load_dataset
+
+    tmp = tempfile.mkdtemp()
+    csv_path = os.path.join(tmp, "cities.csv")
+    synthetic_dataset(n).to_csv(csv_path, index=False)
+    cache_dir = os.path.join(tmp, "cache")
+    load_dataset(csv_path, cache_dir=cache_dir)
+
+    return lambda: load_dataset(csv_path, cache_dir=cache_dir)
+
+
+@benchmark("dataset/compact_table")
+def bench_compact_table(n):
+    from src.dataset import compact_table
+
+    df = synthetic_dataset(n)
+    return lambda: compact_table(df, float32_columns=("lat", "lng", "population"),
+                                 category_columns=("country", "admin_name"))
+
+
+@benchmark("shared_store/publish_attach")
+def bench_shared_store(n):
+    from src.shared_store import attach, cleanup, frame_to_arrays, publish
+
+    arrays, meta = frame_to_arrays(synthetic_dataset(n))
+    tmp = tempfile.mkdtemp()
+
+    def run():
+        publish("bench", arrays, "bench", meta, directory=tmp)
+        attach("bench", directory=tmp)
+        cleanup("bench", directory=tmp)
+
+    return run
+
+
+@benchmark("search/cv_folds")
+def bench_cv_folds(n):
+    from ml_search import cv_folds
+
+    return lambda: cv_folds(n)
+
+
+@benchmark("profiling/stage_overhead")
+def bench_profiling(n):
+    import src.profiling as profiling
+
+    trace = os.path.join(tempfile.mkdtemp(), "trace.ndjson")
+    calls = max(n // 100, 1)
+
+    def run():
+        # Tracing on for this run only: n // 100 stages, each writing a record
+        saved, profiling._TRACE_PATH = profiling._TRACE_PATH, trace
+        try:
+            for _ in range(calls):
+                with profiling.stage("bench", items=1):
+                    pass
+        finally:
+            profiling._TRACE_PATH = saved
+
+    return run
+
+
+# -------------------------------------------------------------------
+# Runner
+# -------------------------------------------------------------------
+
+def measure(fn, n, repeats):
+    """
+    Returns {"seconds": median wall time, "best_seconds": fastest run,
+    "repeats": runs timed, "peak_mb": tracemalloc peak}.
+    """
+    run = fn(n)
+    run()  # warm-up: imports, caches, JIT-free first-touch costs
+
+    times = []
+    for _ in range(repeats):
+        gc.collect()
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+
+    gc.collect()
+    tracemalloc.start()
+    run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {"seconds": float(np.median(times)), "best_seconds": min(times),
+            "repeats": len(times), "peak_mb": peak / 2**20}
+
+
+def run_suite(sizes, only=None, repeats=REPEATS):
+    results = {}
+    for name, (fn, cap) in BENCHMARKS.items():
+        if only and not any(name.startswith(prefix) for prefix in only):
+            continue
+
+        for n in sizes:
+            if cap is not None and n > cap:
+                continue
+
+            key = f"{name}/{n}"
+            try:
+                results[key] = measure(fn, n, repeats if n < 1_000_000 else min(repeats, 3))
+            except ImportError as e:
+                results[key] = {"skipped": f"missing dependency: {e.name}"}
+                print(f"{key:50s} skipped ({e.name} not installed)")
+                break
+
+            r = results[key]
+            print(f"{key:50s} {r['seconds'] * 1000:10.2f} ms {r['peak_mb']:9.1f} MB")
+
+    return results
+
+
+def compare(results, baseline, threshold, min_delta=MIN_DELTA):
+    """
+    Entries whose time regressed by more than threshold (fraction) and by
+    more than min_delta seconds vs the baseline. Entries missing on either
+    side or skipped are ignored.
+    """
+    regressions = []
+    for key, base in baseline.get("results", {}).items():
+        new = results.get(key)
+        if not new or "seconds" not in new or "seconds" not in base:
+            continue
+
+        ratio = new["seconds"] / base["seconds"]
+        if ratio > 1 + threshold and new["seconds"] - base["seconds"] > min_delta:
+            regressions.append((key, base["seconds"], new["seconds"], ratio))
+    return regressions
+
+
+def host_meta():
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+
+def host_mismatch(baseline_meta, meta):
+    """
+    HOST_FIELDS on which the baseline's host differs from this one, as
+    (field, baseline value, current value).
+    """
+    return [(field, baseline_meta.get(field), meta.get(field)) for field in HOST_FIELDS
+            if baseline_meta.get(field) != meta.get(field)]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark every pipeline stage.")
+    parser.add_argument("--max-rows", type=int, default=DEFAULT_MAX_ROWS,
+                        help="largest synthetic size (sizes are 1k, 10k, ... up to this)")
+    parser.add_argument("--only", nargs="*", help="benchmark name prefixes to run")
+    parser.add_argument("--repeats", type=int, default=REPEATS,
+                        help="timed runs per entry; the median is reported")
+    parser.add_argument("--output", default=None, help="write results JSON here")
+    parser.add_argument("--compare", default=None, metavar="BASELINE",
+                        help="fail if any stage regresses past --threshold vs this JSON")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD,
+                        help="allowed slowdown as a fraction (0.25 = 25%%)")
+    parser.add_argument("--min-delta", type=float, default=MIN_DELTA,
+                        help="ignore slowdowns smaller than this many seconds")
+    parser.add_argument("--force-compare", action="store_true",
+                        help="compare even if the baseline comes from another kind of host")
+    parser.add_argument("--update-baseline", action="store_true",
+                        help=f"overwrite {BASELINE_FILE} with these results")
+    parser.add_argument("--list", action="store_true", help="list benchmarks and exit")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    if args.list:
+        for name, (_, cap) in BENCHMARKS.items():
+            print(name if cap is None else f"{name} (max {cap:,} rows)")
+        return 0
+
+    sizes = [n for n in SIZES if n <= args.max_rows]
+    results = run_suite(sizes, args.only, args.repeats)
+
+    report = {"meta": host_meta(), "results": results}
+
+    for path in filter(None, [args.output, BASELINE_FILE if args.update_baseline else None]):
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+        print(f"Saved {path}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+        mismatch = host_mismatch(baseline.get("meta", {}), report["meta"])
+        if mismatch:
+            details = ", ".join(f"{field} {old} vs {new}" for field, old, new in mismatch)
+            print(f"WARNING: baseline was recorded on another host ({details}).")
+            if not args.force_compare:
+                print("Skipping the regression check; rerun with --update-baseline on "
+                      "this host or pass --force-compare.")
+                return 0
+
+        regressions = compare(results, baseline, args.threshold, args.min_delta)
+        for key, old, new, ratio in regressions:
+            print(f"REGRESSION {key}: {old * 1000:.2f} ms -> {new * 1000:.2f} ms ({ratio:.2f}x)")
+
+        if regressions:
+            return 1
+        print(f"No regressions beyond {args.threshold:.0%}.")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,20 +1,29 @@
+import argparse
+import json
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
 import pandas as pd
 import numpy as np
 
-# Physical constants
-G = 6.67430e-11                    # gravitational constant
-M = 5.972e24                       # mass of Earth
-R = 6_371_000                      # radius of Earth (meters)
-c = 299_792_458                    # speed of light
-omega = 7.292115e-5                # Earth's rotation rad/s
+from src.dataset import BASE_DATASET, RAW_DATASET
+from src.dilation import SECONDS_PER_YEAR, dilation_offsets
+from src.profiling import add_arguments as add_profiling_arguments, session, stage, traced
+from src.rank_index import GROUP_COLUMNS, VALUE_COLUMN, RankIndex, sidecar_path
+
+INPUT_FILE = RAW_DATASET
+OUTPUT_FILE = BASE_DATASET
+
+ALTITUDE_SEED = 42
 
 # -------------------------------------------------------------------
 # 1. Load the dataset
 # -------------------------------------------------------------------
-df = pd.read_csv("data/worldcities.csv")
 
-# Keep only rows with coordinates
-df = df[df["lat"].notnull() & df["lng"].notnull()].copy()
+def drop_missing_coordinates(df):
+    # Keep only rows with coordinates
+    return df[df["lat"].notnull() & df["lng"].notnull()].copy()
 
 # -------------------------------------------------------------------
 # 2. Generate realistic synthetic altitudes
@@ -30,77 +39,375 @@ continent_alt = {
     "Antarctica": 1000
 }
 
+# Basic country -> continent mapping for synthetic altitudes
+country_continent = {
+    "United States": "North America",
+    "Canada": "North America",
+    "Mexico": "North America",
+    "Brazil": "South America",
+    "Argentina": "South America",
+    "Chile": "South America",
+    "Peru": "South America",
+    "Colombia": "South America",
+    "Kenya": "Africa",
+    "Egypt": "Africa",
+    "Nigeria": "Africa",
+    "South Africa": "Africa",
+    "China": "Asia",
+    "India": "Asia",
+    "Japan": "Asia",
+    "Russia": "Asia",
+    "France": "Europe",
+    "Germany": "Europe",
+    "UK": "Europe",
+    "Italy": "Europe",
+    "Spain": "Europe",
+    "Australia": "Oceania",
+    "New Zealand": "Oceania",
+}
+
 def guess_continent(country):
-    # Basic mapping for synthetic altitudes
-    if country in ["United States", "Canada", "Mexico"]:
-        return "North America"
-    if country in ["Brazil", "Argentina", "Chile", "Peru", "Colombia"]:
-        return "South America"
-    if country in ["Kenya", "Egypt", "Nigeria", "South Africa"]:
-        return "Africa"
-    if country in ["China", "India", "Japan", "Russia"]:
-        return "Asia"
-    if country in ["France", "Germany", "UK", "Italy", "Spain"]:
-        return "Europe"
-    if country in ["Australia", "New Zealand"]:
-        return "Oceania"
-    return "Europe"  # default
-
-# Assign continent
-df["continent_guess"] = df["country"].apply(guess_continent)
-
-# Generate synthetic altitude:
-# Base + noise + small variation based on density
-np.random.seed(42)
-df["altitude_m"] = (
-    df["continent_guess"].map(continent_alt)
-    + np.random.normal(0, 80, size=len(df))     # random terrain variation
-    + (df["population"].fillna(0) / 1e6) * 5    # slight bump for megacities
-)
-
-# Clamp altitudes to real-world range
-df["altitude_m"] = df["altitude_m"].clip(lower=-50, upper=4500)
+    """
+    Vectorized continent lookup: accepts a Series of countries (one hash map
+    lookup per row) or a single country name. Unknown countries -> Europe.
+    """
+    if isinstance(country, pd.Series):
+        return country.map(country_continent).fillna("Europe")
+    return country_continent.get(country, "Europe")
+
+
+def _splitmix64(x):
+    x = x + np.uint64(0x9E3779B97F4A7C15)
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+
+def row_normal(row_ids, seed=ALTITUDE_SEED, scale=1.0):
+    """
+    Normal noise that depends only on (seed, input row number), so the
+    synthetic altitudes are identical however the input is chunked.
+    Counter-based: two hashed uniforms per row, then Box-Muller.
+    """
+    ids = np.asarray(row_ids, dtype=np.uint64)
+    with np.errstate(over="ignore"):
+        key = _splitmix64(np.full(ids.shape, seed, dtype=np.uint64))
+        h1 = _splitmix64(key ^ (ids * np.uint64(2)))
+        h2 = _splitmix64(key ^ (ids * np.uint64(2) + np.uint64(1)))
+
+    # 53-bit uniforms; u1 in (0, 1] so the log is finite
+    u1 = ((h1 >> np.uint64(11)).astype(np.float64) + 1.0) / 2.0**53
+    u2 = (h2 >> np.uint64(11)).astype(np.float64) / 2.0**53
+
+    return scale * np.sqrt(-2.0 * np.log(u1)) * np.cos(2.0 * np.pi * u2)
+
+
+def add_synthetic_altitude(df, row_ids, seed=ALTITUDE_SEED):
+    # Assign continent
+    df["continent_guess"] = guess_continent(df["country"])
+
+    # Generate synthetic altitude:
+    # Base + noise + small variation based on density
+    df["altitude_m"] = (
+        df["continent_guess"].map(continent_alt)
+        + row_normal(row_ids, seed, scale=80)      # random terrain variation
+        + (df["population"].fillna(0) / 1e6) * 5   # slight bump for megacities
+    )
+
+    # Clamp altitudes to real-world range
+    df["altitude_m"] = df["altitude_m"].clip(lower=-50, upper=4500)
+    return df
 
 # -------------------------------------------------------------------
 # 3. Compute gravitational + rotational aging factors
 # -------------------------------------------------------------------
 
-def aging_factor(lat_deg, altitude_m):
-    lat = np.radians(lat_deg)
-    r = R + altitude_m
-
-    # gravitational potential term
-    grav = 2 * G * M / (r * c**2)
+def add_aging_columns(df):
+    # One vectorized pass over the whole lat/altitude arrays
+    factor, microseconds = dilation_offsets(
+        df["lat"].to_numpy(), df["altitude_m"].to_numpy()
+    )
+    df["aging_factor"] = factor
 
-    # rotational velocity term
-    v = omega * r * np.cos(lat)
-    rot = (v**2) / (c**2)
+    # human experienced time per year
+    df["experienced_seconds_per_year"] = df["aging_factor"] * SECONDS_PER_YEAR
 
-    # total dilation factor (1 - small terms)
-    factor = np.sqrt(1 - grav - rot)
-    return factor
+    # difference from ideal sea level (0 m, equator), from the small-term expansion
+    df["microseconds_difference_per_year"] = microseconds
+    return df
 
-df["aging_factor"] = df.apply(
-    lambda row: aging_factor(row["lat"], row["altitude_m"]), axis=1
-)
 
-# human experienced time per year
-SECONDS_PER_YEAR = 31_557_600
-df["experienced_seconds_per_year"] = df["aging_factor"] * SECONDS_PER_YEAR
+def process_chunk(df, start_row=0, seed=ALTITUDE_SEED):
+    """
+    Full pipeline for one block of input rows. start_row is the position of
+    the block's first row in the input file and keys the altitude noise.
+    """
+    row_ids = np.arange(start_row, start_row + len(df))
+    keep = (df["lat"].notnull() & df["lng"].notnull()).to_numpy()
 
-# difference from ideal sea level (0 m, equator)
-ideal_factor = aging_factor(0, 0)
-ideal_time = ideal_factor * SECONDS_PER_YEAR
-
-df["microseconds_difference_per_year"] = (
-    (df["experienced_seconds_per_year"] - ideal_time) * 1e6
-)
+    df = drop_missing_coordinates(df)
+    df = add_synthetic_altitude(df, row_ids[keep], seed)
+    return add_aging_columns(df)
 
 # -------------------------------------------------------------------
 # 4. Save final dataset
 # -------------------------------------------------------------------
-df.to_csv("worldcities_time_dilation.csv", index=False)
 
-print("Saved worldcities_time_dilation.csv")
-print(df[["city", "country", "lat", "lng", "altitude_m",
-          "aging_factor", "microseconds_difference_per_year"]].head())
+class ParquetPartitionWriter:
+    """
+    Writes each processed chunk as out_dir/part-00000.parquet, part-00001, ...
+    """
+
+    def __init__(self, out_dir):
+        self.out_dir = out_dir
+        self.parts = 0
+        os.makedirs(out_dir, exist_ok=True)
+
+    def write(self, df):
+        path = os.path.join(self.out_dir, f"part-{self.parts:05d}.parquet")
+        df.to_parquet(path, index=False)
+        self.parts += 1
+
+    def close(self):
+        pass
+
+
+class MemmapColumnWriter:
+    """
+    Appends every numeric column to out_dir/<column>.bin as raw little-endian
+    values and records dtypes and row count in out_dir/meta.json, so each
+    column can be reopened with np.memmap (see open_memmap_columns).
+
+    schema (column -> dtype) fixes the output columns up front; without it
+    the numeric columns of the first chunk are used, with integer columns
+    widened to float64 because a later chunk may hold NaN there (the input
+    is sorted by population, so early chunks are often complete). Every
+    chunk is checked against the schema: a missing column, a non-numeric
+    column or NaN headed for an integer column raises instead of writing
+    garbage.
+    """
+
+    def __init__(self, out_dir, schema=None):
+        self.out_dir = out_dir
+        self.rows = 0
+        self.dtypes = None if schema is None else {
+            col: np.dtype(dtype).newbyteorder("<").str for col, dtype in schema.items()
+        }
+        self.files = {}
+        os.makedirs(out_dir, exist_ok=True)
+
+    @staticmethod
+    def infer_schema(df):
+        schema = {}
+        for col in df.select_dtypes(include=["number", "bool"]).columns:
+            dtype = df[col].dtype
+            schema[col] = np.dtype(np.float64) if dtype.kind in "iu" else dtype
+        return schema
+
+    def _check(self, df):
+        missing = [col for col in self.dtypes if col not in df]
+        if missing:
+            raise ValueError(f"chunk at row {self.rows} is missing columns {missing}")
+
+        for col, dtype in self.dtypes.items():
+            series = df[col]
+            if not (pd.api.types.is_numeric_dtype(series) or pd.api.types.is_bool_dtype(series)):
+                raise TypeError(f"column {col!r} is {series.dtype} in the chunk at row "
+                                f"{self.rows}, expected {dtype}")
+            if np.dtype(dtype).kind in "iub" and series.isna().any():
+                raise ValueError(f"column {col!r} has missing values in the chunk at row "
+                                 f"{self.rows} but is stored as {dtype}")
+
+    def write(self, df):
+        if self.dtypes is None:
+            self.dtypes = {col: dtype.newbyteorder("<").str
+                           for col, dtype in self.infer_schema(df).items()}
+        if not self.files:
+            self.files = {
+                col: open(os.path.join(self.out_dir, f"{col}.bin"), "wb")
+                for col in self.dtypes
+            }
+
+        self._check(df)
+        for col, dtype in self.dtypes.items():
+            df[col].to_numpy(dtype=dtype).tofile(self.files[col])
+        self.rows += len(df)
+
+    def close(self):
+        for f in self.files.values():
+            f.close()
+
+        meta = {"rows": self.rows, "columns": self.dtypes or {}}
+        with open(os.path.join(self.out_dir, "meta.json"), "w") as f:
+            json.dump(meta, f, indent=2)
+
+
+def open_memmap_columns(out_dir, columns=None):
+    """
+    Open columns written by MemmapColumnWriter as read-only memmaps.
+    """
+    with open(os.path.join(out_dir, "meta.json")) as f:
+        meta = json.load(f)
+
+    names = columns or list(meta["columns"])
+    return {
+        col: np.memmap(os.path.join(out_dir, f"{col}.bin"),
+                       dtype=meta["columns"][col], mode="r",
+                       shape=(meta["rows"],))
+        for col in names
+    }
+
+
+WRITERS = {
+    "parquet": ParquetPartitionWriter,
+    "npy": MemmapColumnWriter,
+}
+
+
+class RankColumns:
+    """
+    What the rank index needs from every written chunk, kept compact: the
+    float64 values and int32 codes of each group column against a
+    vocabulary that grows as new names appear (~16 bytes per row instead
+    of a row of Python strings).
+    """
+
+    def __init__(self, value_col=VALUE_COLUMN, group_cols=GROUP_COLUMNS):
+        self.value_col = value_col
+        self.group_cols = group_cols
+        self.values = []
+        self.codes = {col: [] for col in group_cols}
+        self.vocab = {col: {} for col in group_cols}
+
+    def append(self, df):
+        self.values.append(df[self.value_col].to_numpy(dtype=np.float64))
+        for col in self.group_cols:
+            if col not in df:
+                continue
+            vocab = self.vocab[col]
+            names, inverse = np.unique(df[col].astype(str).to_numpy(), return_inverse=True)
+            ids = np.array([vocab.setdefault(name, len(vocab)) for name in names], dtype=np.int32)
+            self.codes[col].append(ids[inverse.ravel()])
+
+    def build(self):
+        values = np.concatenate(self.values)
+        groups = {
+            col: pd.Categorical.from_codes(np.concatenate(self.codes[col]),
+                                           categories=list(self.vocab[col]))
+            for col in self.group_cols if self.codes[col]
+        }
+        return RankIndex.build(values, groups)
+
+
+@traced("generate/block", items=len)
+def _process_block(args):
+    df, start_row, seed = args
+    return process_chunk(df, start_row, seed)
+
+
+def generate_streaming(input_path, output_dir, chunk_size=500_000, workers=None,
+                       fmt="parquet", seed=ALTITUDE_SEED):
+    """
+    Out-of-core version of the pipeline: reads the input in blocks of
+    chunk_size rows, processes blocks in a process pool and writes them in
+    input order. At most 2 * workers blocks are in flight, so peak memory
+    is set by chunk_size and not by the input size (plus ~16 bytes per row
+    kept for the rank index sidecar, see RankColumns).
+    Returns the number of rows written.
+    """
+    workers = workers or os.cpu_count() or 1
+    writer = WRITERS[fmt](output_dir)
+    max_pending = 2 * workers
+    pending = deque()
+    rows = 0
+    rank_columns = RankColumns()
+
+    def write(result):
+        with stage("write", items=len(result)):
+            writer.write(result)
+        rank_columns.append(result)
+        return len(result)
+
+    reader = pd.read_csv(input_path, chunksize=chunk_size)
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        start_row = 0
+        for block in reader:
+            pending.append(pool.submit(_process_block, (block, start_row, seed)))
+            start_row += len(block)
+
+            # Drain in submission order to keep row order
+            while len(pending) >= max_pending:
+                rows += write(pending.popleft().result())
+
+        while pending:
+            rows += write(pending.popleft().result())
+
+    writer.close()
+    if rows:
+        with stage("rank index", items=rows):
+            rank_columns.build().save(sidecar_path(output_dir))
+    return rows
+
+
+def generate(input_path=INPUT_FILE, output_path=OUTPUT_FILE, seed=ALTITUDE_SEED):
+    """
+    In-memory pipeline: whole input in, one CSV out, plus its rank index
+    sidecar (see src/rank_index.py).
+    """
+    with stage("read") as s:
+        df = pd.read_csv(input_path)
+        s.items = len(df)
+    with stage("process", items=len(df)):
+        df = process_chunk(df, seed=seed)
+    with stage("write", items=len(df)):
+        os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+        df.to_csv(output_path, index=False)
+    with stage("rank index", items=len(df)):
+        RankIndex.from_dataframe(df).save(sidecar_path(output_path))
+    return df
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Generate the city time dilation dataset."
+    )
+    parser.add_argument("--input", default=INPUT_FILE, help="input gazetteer CSV")
+    parser.add_argument("--output", default=None,
+                        help="output CSV, or output directory in streaming mode")
+    parser.add_argument("--chunk-size", type=int, default=None,
+                        help="rows per block; enables streaming mode")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="worker processes in streaming mode (default: all cores)")
+    parser.add_argument("--format", choices=sorted(WRITERS), default="parquet",
+                        help="streaming output format")
+    parser.add_argument("--seed", type=int, default=ALTITUDE_SEED,
+                        help="seed for synthetic altitudes")
+    add_profiling_arguments(parser)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    with session("generate", args.trace, args.profile):
+        run(args)
+
+
+def run(args):
+    if args.chunk_size:
+        output = args.output or "worldcities_time_dilation"
+        rows = generate_streaming(args.input, output, args.chunk_size,
+                                  args.workers, args.format, args.seed)
+        print(f"Saved {rows} rows to {output}/ ({args.format})")
+        return
+
+    output = args.output or OUTPUT_FILE
+    df = generate(args.input, output, args.seed)
+
+    print(f"Saved {output}")
+    print(df[["city", "country", "lat", "lng", "altitude_m",
+              "aging_factor", "microseconds_difference_per_year"]].head())
+
+
+if __name__ == "__main__":
+    main()
@@ -1,61 +1,311 @@
-import pandas as pd
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import time
+
 import numpy as np
-from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import StandardScaler
 import tensorflow as tf
 import joblib
 
-INPUT_FILE = "data/processed/worldcities_time_dilation_with_elevation.csv"
+from src.dataset import CITY_DATASET, load_columns
+from src.nn_engine import export_npz
+from src.profiling import add_arguments as add_profiling_arguments, session, stage
 
-def train_neural_model():
-    # Load dataset
-    df = pd.read_csv(INPUT_FILE)
+INPUT_FILE = CITY_DATASET
+ARRAY_DIR = "data/processed/training_arrays"
+MODEL_PATH = "model/time_dilation_nn.h5"
+SCALER_PATH = "model/scaler.pkl"
+BACKUP_DIR = "model/training_backup"
 
-    # Drop rows missing elevation
-    df = df.dropna(subset=["elevation_meters"])
+FEATURES = ["lat", "lng", "elevation_meters"]
+TARGET = "microseconds_difference_per_year"
 
-    # Feature matrix (lat, lng, elevation)
-    X = df[["lat", "lng", "elevation_meters"]].values
+HIDDEN = (64, 64, 32)
+EPOCHS = 50
+BATCH_SIZE = 64
+TEST_SIZE = 0.2
+SEED = 42
 
-    # Target: microseconds of difference per year
-    y = df["microseconds_difference_per_year"].values
 
-    # Train-test split
-    X_train, X_test, y_train, y_test = train_test_split(
-        X, y, test_size=0.2, random_state=42
-    )
+# -------------------------------------------------------------------
+# 1. Preprocess: CSV -> memory-mapped float32 arrays (done once)
+# -------------------------------------------------------------------
+
+def preprocess_to_memmap(csv_path=INPUT_FILE, out_dir=ARRAY_DIR, chunk_size=1_000_000):
+    """
+    Copy the enriched dataset's columns (memory-mapped from the shared
+    columnar cache, see src/dataset.py) in chunks into out_dir/X.f32
+    (N x 3) and out_dir/y.f32 (N), dropping rows missing elevation. Memory
+    is bounded by chunk_size. Returns the number of rows written.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    columns = load_columns(csv_path, FEATURES + [TARGET])
+    total = len(columns[TARGET])
+    rows = 0
+
+    with open(os.path.join(out_dir, "X.f32"), "wb") as fx, \
+            open(os.path.join(out_dir, "y.f32"), "wb") as fy:
+        for start in range(0, total, chunk_size):
+            chunk = {col: np.asarray(arr[start:start + chunk_size], dtype=np.float32)
+                     for col, arr in columns.items()}
+            # Drop rows missing elevation
+            keep = ~np.isnan(chunk["elevation_meters"])
+            np.stack([chunk[col][keep] for col in FEATURES], axis=1).tofile(fx)
+            chunk[TARGET][keep].tofile(fy)
+            rows += int(keep.sum())
+
+    stat = os.stat(csv_path)
+    meta = {"rows": rows, "features": FEATURES, "target": TARGET, "source": csv_path,
+            "source_size": stat.st_size, "source_mtime": stat.st_mtime}
+    with open(os.path.join(out_dir, "meta.json"), "w") as f:
+        json.dump(meta, f, indent=2)
+    return rows
+
+
+def arrays_stale(csv_path=INPUT_FILE, out_dir=ARRAY_DIR):
+    """
+    True if the memmaps are missing or were built from another file, or
+    from an older version of csv_path (size or mtime differ).
+    """
+    try:
+        with open(os.path.join(out_dir, "meta.json")) as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return True
+
+    stat = os.stat(csv_path)
+    return (os.path.abspath(meta.get("source", "")) != os.path.abspath(csv_path)
+            or meta.get("source_size") != stat.st_size
+            or meta.get("source_mtime") != stat.st_mtime
+            or meta.get("features") != FEATURES)
+
+
+def backup_dir(array_dir=ARRAY_DIR, hidden=HIDDEN, batch_size=BATCH_SIZE, warm_start=False,
+               root=BACKUP_DIR):
+    """
+    Per-epoch backup directory for one training setup, keyed on the arrays'
+    meta.json, the architecture, the batch size and, for warm starts, the
+    model being continued. A backup from another setup is never restored.
+    """
+    with open(os.path.join(array_dir, "meta.json"), "rb") as f:
+        h = hashlib.sha1(f.read())
+    setup = {"hidden": list(hidden), "batch_size": batch_size, "warm_start": warm_start}
+    if warm_start:
+        stat = os.stat(MODEL_PATH)
+        setup["model"] = [os.path.abspath(MODEL_PATH), stat.st_size, stat.st_mtime]
+    h.update(json.dumps(setup, sort_keys=True).encode())
+    return os.path.join(root, h.hexdigest()[:12])
+
+
+def clear_other_backups(keep, root=BACKUP_DIR):
+    """
+    Remove backups left by runs with another setup (see backup_dir).
+    """
+    if not os.path.isdir(root):
+        return
+    for name in os.listdir(root):
+        path = os.path.join(root, name)
+        if path != keep and os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
 
-    # Standardize features
+
+def open_arrays(out_dir=ARRAY_DIR):
+    with open(os.path.join(out_dir, "meta.json")) as f:
+        rows = json.load(f)["rows"]
+
+    X = np.memmap(os.path.join(out_dir, "X.f32"), dtype=np.float32, mode="r",
+                  shape=(rows, len(FEATURES)))
+    y = np.memmap(os.path.join(out_dir, "y.f32"), dtype=np.float32, mode="r", shape=(rows,))
+    return X, y
+
+
+def train_test_indices(n, test_size=TEST_SIZE, seed=SEED):
+    perm = np.random.default_rng(seed).permutation(n)
+    n_test = int(round(n * test_size))
+    return np.sort(perm[n_test:]), np.sort(perm[:n_test])
+
+
+def fit_scaler_streaming(X, train_idx, chunk_size=1_000_000):
+    """
+    Fit the StandardScaler in one streaming pass over the training rows.
+    """
     scaler = StandardScaler()
-    X_train_scaled = scaler.fit_transform(X_train)
-    X_test_scaled = scaler.transform(X_test)
+    for start in range(0, len(train_idx), chunk_size):
+        scaler.partial_fit(X[train_idx[start:start + chunk_size]].astype(np.float64))
+    return scaler
+
+
+# -------------------------------------------------------------------
+# 2. Input pipeline: shuffled mini-batches streamed from the memmaps
+# -------------------------------------------------------------------
+
+def make_dataset(X, y, indices, scaler, batch_size=BATCH_SIZE, shuffle=True, seed=SEED):
+    """
+    tf.data pipeline that gathers, scales and prefetches mini-batches from
+    the memmaps. The index order is reshuffled every epoch; rows inside a
+    batch are read in sorted order for locality.
+
+    The gather is a tf.numpy_function, which holds the GIL, so the parallel
+    map does not scale across cores: what it buys is overlap of page faults
+    and batch assembly with the training step through prefetching.
+    """
+    mean = scaler.mean_.astype(np.float32)
+    scale = scaler.scale_.astype(np.float32)
+    n_batches = int(np.ceil(len(indices) / batch_size))
+    epoch = [0]
+
+    def batch_ids():
+        order = indices
+        if shuffle:
+            order = np.random.default_rng(seed + epoch[0]).permutation(indices)
+            epoch[0] += 1
+        for b in range(n_batches):
+            yield np.sort(order[b * batch_size:(b + 1) * batch_size])
 
+    def gather(idx):
+        return (X[idx] - mean) / scale, y[idx]
+
+    ds = tf.data.Dataset.from_generator(
+        batch_ids, output_signature=tf.TensorSpec(shape=(None,), dtype=tf.int64)
+    )
+    ds = ds.map(
+        lambda idx: tf.numpy_function(gather, [idx], (tf.float32, tf.float32)),
+        num_parallel_calls=tf.data.AUTOTUNE,
+        deterministic=True,
+    )
+    ds = ds.map(lambda xb, yb: (tf.ensure_shape(xb, (None, len(FEATURES))),
+                                tf.ensure_shape(yb, (None,))))
+    return ds.prefetch(tf.data.AUTOTUNE), n_batches
+
+
+class ThroughputLogger(tf.keras.callbacks.Callback):
+    """
+    Reports training throughput in samples per second for each epoch.
+    """
+
+    def __init__(self, samples_per_epoch):
+        super().__init__()
+        self.samples_per_epoch = samples_per_epoch
+        self.history = []
+
+    def on_epoch_begin(self, epoch, logs=None):
+        self.start = time.perf_counter()
+
+    def on_epoch_end(self, epoch, logs=None):
+        rate = self.samples_per_epoch / (time.perf_counter() - self.start)
+        self.history.append(rate)
+        if logs is not None:
+            logs["samples_per_sec"] = rate
+        print(f"Epoch {epoch + 1}: {rate:,.0f} samples/sec")
+
+
+# -------------------------------------------------------------------
+# 3. Model + training
+# -------------------------------------------------------------------
+
+def build_model(hidden=HIDDEN, learning_rate=None):
+    """
+    Dense ReLU network with the given hidden layer widths. learning_rate
+    None keeps Adam's default.
+    """
     # Build neural network
-    model = tf.keras.Sequential([
-        tf.keras.layers.Dense(64, activation="relu", input_shape=(3,)),
-        tf.keras.layers.Dense(64, activation="relu"),
-        tf.keras.layers.Dense(32, activation="relu"),
-        tf.keras.layers.Dense(1)  # predicting a continuous value
-    ])
+    model = tf.keras.Sequential(
+        [tf.keras.layers.Dense(hidden[0], activation="relu", input_shape=(len(FEATURES),))]
+        + [tf.keras.layers.Dense(units, activation="relu") for units in hidden[1:]]
+        + [tf.keras.layers.Dense(1)]  # predicting a continuous value
+    )
+
+    optimizer = "adam" if learning_rate is None else tf.keras.optimizers.Adam(learning_rate)
+    model.compile(optimizer=optimizer, loss="mse")
+    return model
+
+
+def train_neural_model(csv_path=INPUT_FILE, array_dir=ARRAY_DIR, epochs=EPOCHS,
+                       batch_size=BATCH_SIZE, warm_start=False, resume=True,
+                       reprocess=False):
+    """
+    Train from memory-mapped arrays (built from csv_path on first use, and
+    rebuilt whenever csv_path changes) with a streaming input pipeline.
+
+    warm_start: continue from the saved model and keep its scaler, so the
+        inputs it was trained on are scaled the same way.
+    resume: checkpoint every epoch under BACKUP_DIR and pick up from there
+        if a previous run with the same data, architecture and starting
+        model was interrupted (see backup_dir).
+    """
+    if reprocess or arrays_stale(csv_path, array_dir):
+        with stage("preprocess") as s:
+            s.items = preprocess_to_memmap(csv_path, array_dir)
+
+    X, y = open_arrays(array_dir)
+    train_idx, test_idx = train_test_indices(len(y))
 
-    model.compile(optimizer="adam", loss="mse")
+    if warm_start:
+        scaler = joblib.load(SCALER_PATH)
+        model = tf.keras.models.load_model(MODEL_PATH, compile=False)
+        model.compile(optimizer="adam", loss="mse")
+    else:
+        # Standardize features
+        with stage("fit scaler", items=len(train_idx)):
+            scaler = fit_scaler_streaming(X, train_idx)
+        model = build_model()
+
+    train_ds, _ = make_dataset(X, y, train_idx, scaler, batch_size, shuffle=True)
+    val_ds, _ = make_dataset(X, y, test_idx, scaler, batch_size=max(batch_size, 8192),
+                             shuffle=False)
+
+    throughput = ThroughputLogger(len(train_idx))
+    callbacks = [throughput]
+    if resume:
+        backup = backup_dir(array_dir, HIDDEN, batch_size, warm_start)
+        clear_other_backups(backup)
+        callbacks.append(tf.keras.callbacks.BackupAndRestore(backup))
 
     # Train
-    history = model.fit(
-        X_train_scaled, y_train,
-        validation_data=(X_test_scaled, y_test),
-        epochs=50,
-        batch_size=64,
-        verbose=1
-    )
+    with stage("fit") as s:
+        history = model.fit(
+            train_ds,
+            validation_data=val_ds,
+            epochs=epochs,
+            callbacks=callbacks,
+            verbose=1
+        )
+        s.items = len(train_idx) * len(history.history["loss"])
 
-    # Save model + scaler
-    model.save("model/time_dilation_nn.h5")
-    joblib.dump(scaler, "model/scaler.pkl")
+    # Save model + scaler, and refresh the NumPy engine weights
+    with stage("save"):
+        model.save(MODEL_PATH)
+        joblib.dump(scaler, SCALER_PATH)
+        export_npz(MODEL_PATH, SCALER_PATH)
 
     print("Model + scaler saved.")
     print("Final validation loss:", history.history["val_loss"][-1])
+    print(f"Mean throughput: {np.mean(throughput.history):,.0f} samples/sec")
+    return history
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Train the time dilation neural model.")
+    parser.add_argument("--input", default=INPUT_FILE)
+    parser.add_argument("--arrays", default=ARRAY_DIR, help="memmap feature/target directory")
+    parser.add_argument("--epochs", type=int, default=EPOCHS)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--warm-start", action="store_true",
+                        help=f"continue training {MODEL_PATH} with its scaler")
+    parser.add_argument("--no-resume", action="store_true",
+                        help="ignore and do not write per-epoch backups")
+    parser.add_argument("--reprocess", action="store_true",
+                        help="rebuild the memmap arrays even if the CSV is unchanged")
+    add_profiling_arguments(parser)
+    return parser.parse_args(argv)
 
 
 if __name__ == "__main__":
-    train_neural_model()
+    args = parse_args()
+    with session("train", args.trace, args.profile):
+        train_neural_model(args.input, args.arrays, args.epochs, args.batch_size,
+                           warm_start=args.warm_start, resume=not args.no_resume,
+                           reprocess=args.reprocess)
@@ -0,0 +1,398 @@
+"""
+Hyperparameter and cross-validation search for the time dilation model.
+
+Every configuration (hidden layers x batch size x learning rate, as a
+full grid or a random sample) is trained with k-fold cross-validation on
+the training rows of ml_model's split; the held-out test rows are never
+touched. Trials run on a process pool of `workers` processes with
+`threads` CPU threads each, so workers x threads does not exceed the
+cores. Thread limits are set in the environment before the workers
+start, since TensorFlow and BLAS read them only once at import.
+
+Poor trials stop early in two ways: each fold stops when its validation
+loss has not improved for `patience` epochs, and a trial is abandoned
+after any fold whose running mean MAE is worse than prune_ratio x the
+best finished trial so far (shared between workers).
+
+Validation errors and latencies are measured with the NumPy engine
+(src/nn_engine.py) that serves predictions, not with Keras. Finished
+trials are appended to an NDJSON file, so a rerun resumes; the
+leaderboard CSV ranks them by MAE, and pick_model returns the fastest
+configuration within an error budget.
+"""
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from src.profiling import add_arguments as add_profiling_arguments, session, stage
+
+ARRAY_DIR = "data/processed/training_arrays"
+OUTPUT_DIR = "model/search"
+
+SEARCH_SPACE = {
+    "hidden": [(32,), (64, 32), (64, 64, 32), (128, 64, 32), (128, 128, 64)],
+    "batch_size": [64, 256, 1024],
+    "learning_rate": [3e-4, 1e-3, 3e-3],
+}
+
+FOLDS = 5
+EPOCHS = 30
+PATIENCE = 3
+PRUNE_RATIO = 2.0
+THREADS = 2
+SEED = 42
+
+LATENCY_ROWS = 100_000
+THREAD_VARS = ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS",
+               "TF_NUM_INTRAOP_THREADS", "TF_NUM_INTEROP_THREADS")
+
+
+# -------------------------------------------------------------------
+# Configurations and folds
+# -------------------------------------------------------------------
+
+def config_name(config):
+    hidden = "-".join(str(units) for units in config["hidden"])
+    return f"{hidden}/b{config['batch_size']}/lr{config['learning_rate']:g}"
+
+
+def grid_configs(space=SEARCH_SPACE):
+    keys = list(space)
+    return [dict(zip(keys, values)) for values in itertools.product(*space.values())]
+
+
+def random_configs(space=SEARCH_SPACE, n=20, seed=SEED):
+    """
+    n distinct configurations drawn uniformly from the grid.
+    """
+    grid = grid_configs(space)
+    picks = np.random.default_rng(seed).permutation(len(grid))[:n]
+    return [grid[i] for i in sorted(picks)]
+
+
+def cv_folds(n, folds=FOLDS, max_rows=None, seed=SEED):
+    """
+    k disjoint, sorted validation blocks of the training rows of ml_model's
+    train/test split, optionally subsampled to max_rows first.
+    """
+    from ml_model import train_test_indices
+
+    train_idx, _ = train_test_indices(n)
+    perm = np.random.default_rng(seed).permutation(train_idx)
+    if max_rows is not None:
+        perm = perm[:max_rows]
+    return [np.sort(block) for block in np.array_split(perm, folds)]
+
+
+# -------------------------------------------------------------------
+# One trial, inside a worker
+# -------------------------------------------------------------------
+
+_WORKER = {}
+
+
+def _init_worker(threads, best):
+    """
+    Cap TensorFlow's thread pools (the environment variables already cap
+    BLAS/OpenMP) and keep the shared best-MAE value for pruning.
+    """
+    _WORKER["best"] = best
+    if threads:
+        import tensorflow as tf
+        try:
+            tf.config.threading.set_intra_op_parallelism_threads(threads)
+            tf.config.threading.set_inter_op_parallelism_threads(1)
+        except RuntimeError:  # TensorFlow already initialized in this process
+            pass
+
+
+def _latency(engine, X, repeats=3, single_repeats=200):
+    """
+    (microseconds per row on a large batch, microseconds for one row),
+    best of a few repeats.
+    """
+    engine.predict(X[:1024])
+    batch = np.inf
+    for _ in range(repeats):
+        start = time.perf_counter()
+        engine.predict(X)
+        batch = min(batch, time.perf_counter() - start)
+
+    row = X[:1]
+    single = np.inf
+    for _ in range(single_repeats):
+        start = time.perf_counter()
+        engine.predict(row)
+        single = min(single, time.perf_counter() - start)
+    return 1e6 * batch / len(X), 1e6 * single
+
+
+def _run_trial(args):
+    with stage("search/trial", config=config_name(args[0])):
+        return _cross_validate(*args)
+
+
+def _cross_validate(config, array_dir, folds, epochs, patience, prune_ratio, max_rows, seed):
+    import tensorflow as tf
+    from ml_model import build_model, fit_scaler_streaming, make_dataset, open_arrays
+    from src.nn_engine import NumpyMLP
+
+    X, y = open_arrays(array_dir)
+    blocks = cv_folds(len(y), folds, max_rows, seed)
+    best = _WORKER.get("best")
+
+    maes, rmses, epochs_run = [], [], []
+    train_seconds = 0.0
+    pruned = False
+
+    for f, val_idx in enumerate(blocks):
+        train_idx = np.sort(np.concatenate([b for i, b in enumerate(blocks) if i != f]))
+        tf.keras.utils.set_random_seed(seed + f)
+
+        start = time.perf_counter()
+        scaler = fit_scaler_streaming(X, train_idx)
+        model = build_model(tuple(config["hidden"]), config["learning_rate"])
+        train_ds, _ = make_dataset(X, y, train_idx, scaler, config["batch_size"],
+                                   shuffle=True, seed=seed + f)
+        val_ds, _ = make_dataset(X, y, val_idx, scaler, batch_size=8192, shuffle=False)
+        stop = tf.keras.callbacks.EarlyStopping(patience=patience, restore_best_weights=True)
+        history = model.fit(train_ds, validation_data=val_ds, epochs=epochs,
+                            callbacks=[stop], verbose=0)
+        train_seconds += time.perf_counter() - start
+        epochs_run.append(len(history.history["loss"]))
+
+        engine = NumpyMLP.from_keras(model, scaler)
+        error = engine.predict(X[val_idx]).astype(np.float64) - y[val_idx]
+        maes.append(float(np.abs(error).mean()))
+        rmses.append(float(np.sqrt(np.mean(error ** 2))))
+
+        limit = best.value if best is not None else np.inf
+        if f + 1 < len(blocks) and np.mean(maes) > prune_ratio * limit:
+            pruned = True
+            break
+
+    X_latency = np.asarray(X[blocks[-1][:LATENCY_ROWS]])
+    per_row_us, single_us = _latency(engine, X_latency)
+    tf.keras.backend.clear_session()
+
+    return {
+        "name": config_name(config),
+        "hidden": list(config["hidden"]),
+        "batch_size": config["batch_size"],
+        "learning_rate": config["learning_rate"],
+        "folds_run": len(maes),
+        "pruned": pruned,
+        "mae": float(np.mean(maes)),
+        "mae_std": float(np.std(maes)),
+        "rmse": float(np.mean(rmses)),
+        "epochs_mean": float(np.mean(epochs_run)),
+        "train_seconds": train_seconds,
+        "train_seconds_per_fold": train_seconds / len(maes),
+        "latency_us_per_row": per_row_us,
+        "latency_us_single": single_us,
+        "parameters": int(sum(w.size + b.size for w, b in zip(engine.weights, engine.biases))),
+    }
+
+
+# -------------------------------------------------------------------
+# Search driver
+# -------------------------------------------------------------------
+
+def _read_results(path, settings):
+    """
+    Finished trials from an NDJSON results file written with the same
+    settings; a partial last line (interrupted write) is dropped.
+    """
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return {}
+    with open(path, "r+") as f:
+        lines = f.read().split("\n")
+        complete = lines[:-1]
+        if lines[-1]:
+            f.truncate(sum(len(line) + 1 for line in complete))
+
+    if not complete or json.loads(complete[0]).get("settings") != settings:
+        raise ValueError(f"{path} was written with different search settings")
+    return {r["name"]: r for r in map(json.loads, complete[1:])}
+
+
+def _thread_env(threads):
+    saved = {var: os.environ.get(var) for var in THREAD_VARS}
+    for var in THREAD_VARS:
+        os.environ[var] = str(1 if var == "TF_NUM_INTEROP_THREADS" else threads)
+    return saved
+
+
+def _restore_env(saved):
+    for var, value in saved.items():
+        if value is None:
+            os.environ.pop(var, None)
+        else:
+            os.environ[var] = value
+
+
+def run_search(configs, array_dir=ARRAY_DIR, folds=FOLDS, epochs=EPOCHS, patience=PATIENCE,
+               prune_ratio=PRUNE_RATIO, max_rows=None, workers=None, threads=THREADS,
+               seed=SEED, output=None):
+    """
+    Cross-validate every configuration; returns the leaderboard DataFrame
+    sorted by MAE (pruned trials last). If output is given, finished
+    trials are appended there and a rerun skips them.
+    """
+    # Everything that changes a trial's outcome, pruning included
+    settings = {"array_dir": array_dir, "folds": folds, "epochs": epochs, "patience": patience,
+                "prune_ratio": prune_ratio, "max_rows": max_rows, "seed": seed}
+    done = _read_results(output, settings) if output else {}
+    if output:
+        if not os.path.exists(output) or os.path.getsize(output) == 0:
+            os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+            with open(output, "w") as f:
+                f.write(json.dumps({"settings": settings}) + "\n")
+        log = open(output, "a")
+
+    workers = workers or max((os.cpu_count() or 1) // threads, 1)
+    # spawn: fresh interpreters that read the thread limits at import
+    context = multiprocessing.get_context("spawn")
+    finished = [r["mae"] for r in done.values() if not r["pruned"]]
+    best = context.Value("d", min(finished, default=np.inf))
+
+    tasks = [(config, array_dir, folds, epochs, patience, prune_ratio, max_rows, seed)
+             for config in configs if config_name(config) not in done]
+
+    def record(result):
+        done[result["name"]] = result
+        if not result["pruned"]:
+            with best.get_lock():
+                best.value = min(best.value, result["mae"])
+        if output:
+            log.write(json.dumps(result) + "\n")
+            log.flush()
+        status = "pruned" if result["pruned"] else "done"
+        print(f"{result['name']:<28} MAE {result['mae']:10.3f}  "
+              f"train {result['train_seconds']:7.1f} s  {status}")
+
+    saved = _thread_env(threads)
+    try:
+        if workers == 1:
+            _init_worker(threads, best)
+            for task in tasks:
+                record(_run_trial(task))
+        else:
+            pending = deque()
+            with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                                     initializer=_init_worker,
+                                     initargs=(threads, best)) as pool:
+                for task in tasks:
+                    pending.append(pool.submit(_run_trial, task))
+                    while len(pending) >= workers:
+                        record(pending.popleft().result())
+                while pending:
+                    record(pending.popleft().result())
+    finally:
+        _restore_env(saved)
+        if output:
+            log.close()
+
+    return leaderboard(done.values())
+
+
+def leaderboard(results):
+    board = pd.DataFrame(list(results))
+    if board.empty:
+        return board
+    board["hidden"] = board["hidden"].map(lambda h: "-".join(str(u) for u in h))
+    return board.sort_values(["pruned", "mae", "latency_us_per_row"]).reset_index(drop=True)
+
+
+def pick_model(board, max_mae, latency="latency_us_per_row"):
+    """
+    The fastest fully cross-validated configuration with MAE <= max_mae
+    (microseconds/year), or None if nothing meets the budget.
+    """
+    eligible = board[~board["pruned"] & (board["mae"] <= max_mae)]
+    if eligible.empty:
+        return None
+    return eligible.sort_values([latency, "mae"]).iloc[0]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Cross-validated hyperparameter search.")
+    parser.add_argument("--arrays", default=ARRAY_DIR,
+                        help="memmap feature/target directory (see ml_model.py)")
+    parser.add_argument("--input", default=None,
+                        help="rebuild the memmap arrays from this CSV first")
+    parser.add_argument("--random", type=int, default=None, metavar="N",
+                        help="evaluate N random configurations instead of the full grid")
+    parser.add_argument("--hidden", nargs="*", default=None, metavar="W-W-W",
+                        help="hidden layer widths to search, e.g. 64-32 128-64-32")
+    parser.add_argument("--batch-sizes", type=int, nargs="*", default=None)
+    parser.add_argument("--learning-rates", type=float, nargs="*", default=None)
+    parser.add_argument("--folds", type=int, default=FOLDS)
+    parser.add_argument("--epochs", type=int, default=EPOCHS)
+    parser.add_argument("--patience", type=int, default=PATIENCE)
+    parser.add_argument("--prune-ratio", type=float, default=PRUNE_RATIO,
+                        help="abandon a trial whose MAE exceeds this x the best so far")
+    parser.add_argument("--max-rows", type=int, default=None,
+                        help="cross-validate on a random subset of the training rows")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--threads", type=int, default=THREADS, help="CPU threads per worker")
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--output", default=os.path.join(OUTPUT_DIR, "trials.ndjson"),
+                        help="NDJSON results file; rerun to resume")
+    parser.add_argument("--max-mae", type=float, default=None,
+                        help="error budget (microseconds/year) for picking the fastest model")
+    add_profiling_arguments(parser)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    with session("search", args.trace, args.profile):
+        run(args)
+
+
+def run(args):
+    if args.input:
+        from ml_model import preprocess_to_memmap
+        preprocess_to_memmap(args.input, args.arrays)
+
+    space = dict(SEARCH_SPACE)
+    if args.hidden:
+        space["hidden"] = [tuple(int(u) for u in h.split("-")) for h in args.hidden]
+    if args.batch_sizes:
+        space["batch_size"] = args.batch_sizes
+    if args.learning_rates:
+        space["learning_rate"] = args.learning_rates
+    configs = grid_configs(space) if args.random is None else random_configs(space, args.random, args.seed)
+
+    board = run_search(configs, args.arrays, args.folds, args.epochs, args.patience,
+                       args.prune_ratio, args.max_rows, args.workers, args.threads,
+                       args.seed, args.output)
+
+    path = os.path.join(os.path.dirname(args.output) or ".", "leaderboard.csv")
+    board.to_csv(path, index=False)
+    columns = ["name", "folds_run", "pruned", "mae", "mae_std", "rmse", "train_seconds",
+               "latency_us_per_row", "latency_us_single", "parameters"]
+    with pd.option_context("display.width", 160, "display.max_columns", None):
+        print(board[columns].to_string(index=False))
+    print(f"Leaderboard saved to {path}")
+
+    if args.max_mae is not None:
+        choice = pick_model(board, args.max_mae)
+        if choice is None:
+            print(f"No configuration meets MAE <= {args.max_mae}")
+        else:
+            print(f"Fastest within MAE <= {args.max_mae}: {choice['name']} "
+                  f"(MAE {choice['mae']:.3f}, {choice['latency_us_per_row']:.3f} us/row)")
+
+
+if __name__ == "__main__":
+    main()
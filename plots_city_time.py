@@ -1,27 +1,58 @@
-import pandas as pd
+import numpy as np
 import matplotlib.pyplot as plt
+from matplotlib.colors import LogNorm
 
-def plot_altitude_vs_aging(csv_path="worldcities_time_dilation.csv"):
-    df = pd.read_csv(csv_path)
+from src.dataset import CITY_DATASET, load_dataset
+from src.dilation import add_dilation_columns
+from src.render import bin_grid, cached_png, dataset_fingerprint, show_png
 
-    plt.figure(figsize=(10, 6))
-    plt.scatter(df["altitude_m"], df["microseconds_difference_per_year"], alpha=0.4)
+CSV_PATH = CITY_DATASET
 
-    plt.xlabel("Altitude (meters)")
-    plt.ylabel("Microseconds Gained/Lost per Year")
-    plt.title("Effect of Altitude on Aging Rate (Relativistic Time Dilation)")
-    plt.grid(True)
-    plt.show()
 
+def _binned_scatter(csv_path, x_col, xlabel, title, bins, show):
+    """
+    Density image of x_col vs microseconds per year: points are counted
+    into a bins grid instead of drawn one by one, and the PNG is cached
+    on disk keyed by dataset hash and plot parameters.
+    """
+    key = {"plot": "city_time", "x": x_col, "data": dataset_fingerprint(csv_path),
+           "bins": list(bins)}
 
-def plot_latitude_vs_aging(csv_path="worldcities_time_dilation.csv"):
-    df = pd.read_csv(csv_path)
+    def draw():
+        cols = ["lat", x_col, "microseconds_difference_per_year", "altitude_m"]
+        df = load_dataset(csv_path, columns=[], optional_columns=list(dict.fromkeys(cols)))
+        df = add_dilation_columns(df)
 
-    plt.figure(figsize=(10, 6))
-    plt.scatter(df["lat"], df["microseconds_difference_per_year"], alpha=0.4)
+        x = df[x_col].to_numpy()
+        y = df["microseconds_difference_per_year"].to_numpy()
+        extent = (np.nanmin(x), np.nanmax(x), np.nanmin(y), np.nanmax(y))
+        counts = bin_grid(x, y, bins=bins, extent=extent, stat="count")
 
-    plt.xlabel("Latitude (degrees)")
-    plt.ylabel("Microseconds Gained/Lost per Year")
-    plt.title("Effect of Earth's Rotation (Latitude) on Aging Rate")
-    plt.grid(True)
-    plt.show()
+        fig, ax = plt.subplots(figsize=(10, 6))
+        image = ax.imshow(np.ma.masked_equal(counts, 0), extent=extent, origin="upper",
+                          aspect="auto", cmap="viridis", norm=LogNorm(),
+                          interpolation="nearest")
+        fig.colorbar(image, ax=ax, label="Cities")
+
+        ax.set_xlabel(xlabel)
+        ax.set_ylabel("Microseconds Gained/Lost per Year")
+        ax.set_title(title)
+        ax.grid(True)
+        return fig
+
+    path = cached_png(key, draw)
+    if show:
+        show_png(path, figsize=(10, 6))
+    return path
+
+
+def plot_altitude_vs_aging(csv_path=CSV_PATH, bins=(200, 300), show=True):
+    return _binned_scatter(csv_path, "altitude_m", "Altitude (meters)",
+                           "Effect of Altitude on Aging Rate (Relativistic Time Dilation)",
+                           bins, show)
+
+
+def plot_latitude_vs_aging(csv_path=CSV_PATH, bins=(200, 300), show=True):
+    return _binned_scatter(csv_path, "lat", "Latitude (degrees)",
+                           "Effect of Earth's Rotation (Latitude) on Aging Rate",
+                           bins, show)
@@ -1,32 +1,68 @@
-import pandas as pd
-import geopandas as gpd
 import matplotlib.pyplot as plt
 
-def plot_world_time_heatmap():
-    # Load world shapefile
-    world = gpd.read_file("data/world_shapefile/ne_110m_admin_0_countries.shp")
+from src.dataset import CITY_DATASET, load_columns
+from src.render import bin_grid, cached_png, dataset_fingerprint, draw_basemap, load_basemap, show_png
 
-    # Load processed city dataset
-    df = pd.read_csv("data/processed/worldcities_time_dilation.csv")
+SHAPEFILE = "data/world_shapefile/ne_110m_admin_0_countries.shp"
+CSV_PATH = CITY_DATASET
 
-    # Convert to GeoDataFrame
-    gdf = gpd.GeoDataFrame(
-        df,
-        geometry=gpd.points_from_xy(df.lng, df.lat),
-        crs="EPSG:4326"
-    )
 
-    # Plot
-    fig, ax = plt.subplots(figsize=(16, 10))
-    world.plot(ax=ax, color="lightgray", edgecolor="white")
+def plot_world_time_heatmap(csv_path=CSV_PATH, shapefile=SHAPEFILE,
+                            bins=(360, 720), stat="mean", show=True):
+    """
+    Binned world map of microseconds_difference_per_year: points are
+    aggregated into a lat/lng grid (count/mean/min/max per cell) and drawn
+    as one image over the cached country outlines, so render time barely
+    depends on the point count. The PNG is cached on disk, keyed by the
+    dataset hash and plot parameters. Returns the PNG path.
+    """
+    key = {
+        "plot": "world_time_heatmap",
+        "data": dataset_fingerprint(csv_path),
+        "basemap": dataset_fingerprint(shapefile),
+        "bins": list(bins),
+        "stat": stat,
+    }
+
+    def draw():
+        # Load processed city dataset (only the columns we draw)
+        cols = load_columns(csv_path, ["lat", "lng", "microseconds_difference_per_year"])
+        grid = bin_grid(cols["lng"], cols["lat"], cols["microseconds_difference_per_year"],
+                        bins=bins, stat=stat)
+
+        fig, ax = plt.subplots(figsize=(16, 10))
+        draw_basemap(ax, load_basemap(shapefile))
+
+        image = ax.imshow(grid, extent=(-180, 180, -90, 90), origin="upper",
+                          cmap="viridis", interpolation="nearest", zorder=1)
+        fig.colorbar(image, ax=ax, label="Microseconds per Year" if stat != "count" else "Cities")
+        ax.set_xlim(-180, 180)
+        ax.set_ylim(-90, 90)
+
+        ax.set_title("Relative Aging Difference by City (Microseconds per Year)")
+        return fig
 
-    gdf.plot(
-        ax=ax,
-        column="microseconds_difference_per_year",
-        cmap="viridis",
-        markersize=2,
-        legend=True
-    )
+    path = cached_png(key, draw)
+    if show:
+        show_png(path)
+    return path
+
+
+def plot_world_dilation_raster(raster_dir="data/processed/dilation_raster",
+                               lat_min=-90, lat_max=90, lng_min=-180, lng_max=180,
+                               max_cells=1_000_000):
+    """
+    Draw a baked dilation raster (see src/dilation_raster.py) for a bounding
+    box, reading only the array slice at a suitable level of detail.
+    """
+    from src.dilation_raster import DilationRaster
+
+    raster = DilationRaster(raster_dir)
+    values, extent = raster.window(lat_min, lat_max, lng_min, lng_max, max_cells=max_cells)
+
+    fig, ax = plt.subplots(figsize=(16, 10))
+    image = ax.imshow(values, extent=extent, origin="upper", cmap="viridis", aspect="auto")
+    fig.colorbar(image, ax=ax, label="Microseconds per Year")
 
-    plt.title("Relative Aging Difference by City (Microseconds per Year)")
+    plt.title("Relative Aging Difference (Microseconds per Year)")
     plt.show()
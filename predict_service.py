@@ -0,0 +1,161 @@
+import asyncio
+import time
+from collections import deque
+
+import numpy as np
+
+from src.profiling import session
+
+MAX_BATCH_SIZE = 256
+MAX_WAIT_MS = 5.0
+
+
+class BatchingPredictor:
+    """
+    Asyncio micro-batching front end for predict_many. Single-point requests
+    are queued and flushed as one batch once MAX_BATCH_SIZE requests are
+    waiting or the oldest has waited MAX_WAIT_MS; each caller gets its own
+    result back.
+
+    Usage:
+        predictor = BatchingPredictor()
+        await predictor.start()
+        value = await predictor.predict(41.88, -87.63, 181)
+        await predictor.stop()
+    """
+
+    def __init__(self, predict_fn=None, max_batch_size=MAX_BATCH_SIZE,
+                 max_wait_ms=MAX_WAIT_MS, latency_window=1000):
+        if predict_fn is None:
+            from predict_time import predict_many as predict_fn
+
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.queue = None
+        self.worker = None
+        self.in_flight = []  # requests taken off the queue, not yet answered
+
+        self.requests = 0
+        self.batches = 0
+        self.last_batch_size = 0
+        self.batch_sizes = deque(maxlen=latency_window)
+        self.latencies = deque(maxlen=latency_window)
+
+    async def start(self):
+        self.queue = asyncio.Queue()
+        self.worker = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """
+        Stop the worker. Requests still queued or in flight fail with
+        RuntimeError instead of leaving their callers waiting forever.
+        """
+        if self.worker is not None:
+            self.worker.cancel()
+            try:
+                await self.worker
+            except asyncio.CancelledError:
+                pass
+            self.worker = None
+
+        pending = [item[-1] for item in self.in_flight]
+        self.in_flight = []
+        if self.queue is not None:
+            while not self.queue.empty():
+                pending.append(self.queue.get_nowait()[-1])
+            self.queue = None
+
+        for future in pending:
+            if not future.done():
+                future.set_exception(RuntimeError("BatchingPredictor stopped before answering"))
+
+    async def predict(self, lat, lng, elevation):
+        if self.worker is None:
+            raise RuntimeError("BatchingPredictor is not running; await start() first")
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((lat, lng, elevation, time.perf_counter(), future))
+        return await future
+
+    async def _next_batch(self):
+        # Collected in self.in_flight so stop() can fail them if cancelled here
+        batch = self.in_flight = [await self.queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.perf_counter()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+
+        while True:
+            batch = await self._next_batch()
+            lat, lng, elevation, started, futures = zip(*batch)
+
+            try:
+                # Run the model off the event loop so new requests keep queueing
+                preds = await loop.run_in_executor(None, self.predict_fn, lat, lng, elevation)
+            except Exception as e:
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            now = time.perf_counter()
+            for future, pred, t0 in zip(futures, preds, started):
+                if not future.done():
+                    future.set_result(float(pred))
+                self.latencies.append(now - t0)
+
+            self.in_flight = []
+            self.requests += len(batch)
+            self.batches += 1
+            self.last_batch_size = len(batch)
+            self.batch_sizes.append(len(batch))
+
+    def metrics(self):
+        """
+        Snapshot of queue depth, batch sizes and request latency (ms)
+        over the most recent requests.
+        """
+        latencies = np.array(self.latencies) * 1000
+        return {
+            "queue_depth": self.queue.qsize() if self.queue is not None else 0,
+            "requests": self.requests,
+            "batches": self.batches,
+            "last_batch_size": self.last_batch_size,
+            "mean_batch_size": float(np.mean(self.batch_sizes)) if self.batch_sizes else 0.0,
+            "latency_ms_p50": float(np.percentile(latencies, 50)) if len(latencies) else 0.0,
+            "latency_ms_p95": float(np.percentile(latencies, 95)) if len(latencies) else 0.0,
+            "latency_ms_max": float(latencies.max()) if len(latencies) else 0.0,
+        }
+
+
+async def _demo(n=1000):
+    predictor = BatchingPredictor()
+    await predictor.start()
+
+    rng = np.random.default_rng(0)
+    lat = rng.uniform(-60, 70, n)
+    lng = rng.uniform(-180, 180, n)
+    elev = rng.uniform(0, 3000, n)
+
+    preds = await asyncio.gather(*(
+        predictor.predict(a, b, e) for a, b, e in zip(lat, lng, elev)
+    ))
+    await predictor.stop()
+
+    print(f"Scored {len(preds)} concurrent requests")
+    print(predictor.metrics())
+
+
+if __name__ == "__main__":
+    with session("predict_service"):
+        asyncio.run(_demo())
@@ -1,25 +1,77 @@
+import os
+
 import numpy as np
-import joblib
-import tensorflow as tf
 
-scaler = joblib.load("model/scaler.pkl")
+from src.nn_engine import NPZ_PATH, NumpyMLP, export_npz
+from src.profiling import session, traced
+
+# "numpy" (default): TensorFlow-free engine on model/time_dilation_nn.npz
+# "keras": the original Keras model + scaler
+ENGINE = os.environ.get("UNFELT_TIME_ENGINE", "numpy")
+
+# UNFELT_TIME_SHARED=1: attach the NumPy weights from shared memory
+# (published by the first process) instead of loading a private copy
+SHARED = os.environ.get("UNFELT_TIME_SHARED", "0") == "1"
+
+PREDICT_BATCH_SIZE = 8192
+
+if ENGINE == "keras":
+    import joblib
+    import tensorflow as tf
+
+    scaler = joblib.load("model/scaler.pkl")
+
+    # Load WITHOUT compiling
+    model = tf.keras.models.load_model(
+        "model/time_dilation_nn.h5",
+        compile=False
+    )
+else:
+    if not os.path.exists(NPZ_PATH):
+        export_npz()
+    engine = NumpyMLP.load_shared(NPZ_PATH) if SHARED else NumpyMLP.load(NPZ_PATH)
+
+
+def feature_matrix(lat, lng=None, elevation=None):
+    """
+    (N, 3) float array of [lat, lng, elevation] from three array-likes or
+    from a DataFrame with lat, lng and elevation_meters columns.
+    """
+    if lng is None and elevation is None:
+        df = lat
+        return df[["lat", "lng", "elevation_meters"]].to_numpy(dtype=float)
+
+    return np.column_stack([
+        np.asarray(lat, dtype=float).ravel(),
+        np.asarray(lng, dtype=float).ravel(),
+        np.asarray(elevation, dtype=float).ravel(),
+    ])
+
+
+@traced("predict/many", items=len)
+def predict_many(lat, lng=None, elevation=None):
+    """
+    Vectorized prediction: one batched forward pass for all points.
+    Accepts arrays (lat, lng, elevation) or a DataFrame.
+    Returns a float array of predicted microseconds per year.
+    """
+    X = feature_matrix(lat, lng, elevation)
+
+    if ENGINE == "keras":
+        pred = model.predict(scaler.transform(X), batch_size=PREDICT_BATCH_SIZE, verbose=0)
+        return pred[:, 0].astype(float)
+
+    return engine.predict(X).astype(float)
 
-# Load WITHOUT compiling
-model = tf.keras.models.load_model(
-    "model/time_dilation_nn.h5",
-    compile=False
-)
 
 def predict_time_dilation(lat, lng, elevation):
-    X = np.array([[lat, lng, elevation]], dtype=float)
-    X_scaled = scaler.transform(X)
-    pred = model.predict(X_scaled)[0][0]
-    return float(pred)
+    return float(predict_many([lat], [lng], [elevation])[0])
 
 if __name__ == "__main__":
     chicago_lat = 41.8781
     chicago_lng = -87.6298
     chicago_elev = 181
 
-    pred = predict_time_dilation(chicago_lat, chicago_lng, chicago_elev)
+    with session("predict"):
+        pred = predict_time_dilation(chicago_lat, chicago_lng, chicago_elev)
     print("Predicted microseconds per year:", pred)
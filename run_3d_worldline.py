@@ -1,13 +1,11 @@
 import sys, os
 sys.path.append(os.path.abspath("src"))
 
-from simulations import simulation_3d_worldline
+from simulations import worldline_3d
 from plots import plot_3d_worldline
+from src.profiling import session
 
-result = simulation_3d_worldline(total_time=5, velocity=0.5)
+with session("run_3d_worldline"):
+    worldline = worldline_3d(total_time=5, velocity=0.5)
 
-plot_3d_worldline(
-    result["t"],
-    result["x"],
-    result["y"]
-)
+    plot_3d_worldline(worldline)
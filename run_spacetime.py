@@ -1,13 +1,11 @@
 import sys, os
 sys.path.append(os.path.abspath("src"))
 
-from simulations import simulation_spacetime
+from simulations import spacetime_worldlines
 from plots import plot_spacetime_diagram
+from src.profiling import session
 
-result = simulation_spacetime(total_time=10, velocity=0.8)
+with session("run_spacetime"):
+    stationary, moving = spacetime_worldlines(total_time=10, velocity=0.8)
 
-plot_spacetime_diagram(
-    result["t"],
-    result["x_stationary"],
-    result["x_moving"]
-)
+    plot_spacetime_diagram(stationary, moving)
@@ -0,0 +1,129 @@
+import numpy as np
+
+
+def city_label(name, admin, country):
+    """
+    Display key for a city: "Springfield, Illinois, United States".
+    """
+    parts = [str(p) for p in (name, admin, country) if isinstance(p, str) and p]
+    return ", ".join(parts)
+
+
+class CityIndex:
+    """
+    Lookup structures over the city table, built once at load:
+      - labels: unique "name, admin, country" key per row
+      - sorted labels with their row positions, for selection by label
+        (binary search)
+      - a sorted lowercase name array for prefix search (binary search),
+        with matches ranked by population
+    Same-named cities that also share admin and country get " (2)", " (3)"...
+
+    Everything lives in NumPy arrays (self.arrays), so one process can
+    publish the index into shared memory and others attach to it
+    (from_arrays) without building their own copy.
+    """
+
+    def __init__(self, df, name_col="city_ascii", admin_col="admin_name",
+                 country_col="country", population_col="population"):
+        names = df[name_col].astype(str).to_numpy()
+        admins = df[admin_col].to_numpy() if admin_col in df else [None] * len(df)
+        countries = df[country_col].to_numpy()
+
+        seen = set()
+        labels = []
+        for name, admin, country in zip(names, admins, countries):
+            label = city_label(name, admin, country)
+            if label in seen:
+                n = 2
+                while f"{label} ({n})" in seen:
+                    n += 1
+                label = f"{label} ({n})"
+            seen.add(label)
+            labels.append(label)
+        labels = np.array(labels, dtype=str)
+
+        if population_col in df:
+            population = df[population_col].fillna(0).to_numpy(dtype=np.float64)
+        else:
+            population = np.zeros(len(df))
+
+        lowered = np.char.lower(names.astype(str))
+        label_order = np.argsort(labels, kind="stable")
+        name_order = np.argsort(lowered, kind="stable")
+        self._set_arrays({
+            "labels": labels,
+            "sorted_labels": labels[label_order],
+            "label_positions": label_order,
+            "population": population,
+            "name_order": name_order,
+            "sorted_names": lowered[name_order],
+            "by_population": np.argsort(-population, kind="stable"),
+        })
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        """
+        Index over arrays of another CityIndex (e.g. attached from a
+        shared store), without rebuilding anything.
+        """
+        index = cls.__new__(cls)
+        index._set_arrays(arrays)
+        return index
+
+    def _set_arrays(self, arrays):
+        self.arrays = arrays
+        self.labels = arrays["labels"]
+        self.sorted_labels = arrays["sorted_labels"]
+        self.label_positions = arrays["label_positions"]
+        self.population = arrays["population"]
+        self.name_order = arrays["name_order"]
+        self.sorted_names = arrays["sorted_names"]
+        self.by_population = arrays["by_population"]
+
+    def __len__(self):
+        return len(self.labels)
+
+    def _find(self, label):
+        i = int(np.searchsorted(self.sorted_labels, label))
+        if i < len(self.sorted_labels) and self.sorted_labels[i] == label:
+            return i
+        return None
+
+    def __contains__(self, label):
+        return self._find(label) is not None
+
+    def position(self, label):
+        i = self._find(label)
+        if i is None:
+            raise KeyError(label)
+        return int(self.label_positions[i])
+
+    def prefix_range(self, prefix):
+        """
+        [lo, hi) slice of sorted_names starting with prefix.
+        """
+        prefix = prefix.lower()
+        lo = np.searchsorted(self.sorted_names, prefix, side="left")
+        hi = np.searchsorted(self.sorted_names, prefix + "\uffff", side="left")
+        return lo, hi
+
+    def search(self, prefix="", limit=20):
+        """
+        Labels of up to `limit` cities whose name starts with prefix
+        (case-insensitive), most populous first. Empty prefix -> the most
+        populous cities overall.
+        """
+        prefix = prefix.strip()
+        if not prefix:
+            return self.labels[self.by_population[:limit]].tolist()
+
+        lo, hi = self.prefix_range(prefix)
+        matches = self.name_order[lo:hi]
+
+        if len(matches) > limit:
+            top = np.argpartition(-self.population[matches], limit - 1)[:limit]
+            matches = matches[top]
+
+        ranked = matches[np.argsort(-self.population[matches], kind="stable")]
+        return self.labels[ranked].tolist()
@@ -0,0 +1,214 @@
+"""
+One access layer for the processed city dataset.
+
+The first load of a CSV converts it into a typed columnar cache under
+CACHE_DIR: one .npy file per column (numeric columns keep their dtype,
+text columns become int32 category codes plus a categories array), with
+a meta.json recording the source's size, mtime and SHA-1. Later loads
+memory-map only the columns a caller asks for.
+
+The cache is rebuilt automatically when the source changes: size/mtime
+are checked first, and when only the mtime moved the SHA-1 decides, so a
+touched but identical file is not reconverted. Conversion happens under
+a file lock in a pid-unique temporary directory, so several processes
+starting at once convert only once and never remove each other's work.
+"""
+import hashlib
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+try:
+    import fcntl
+except ImportError:  # Windows: conversions are not serialized between processes
+    fcntl = None
+
+# Pipeline files: generate_city_time_dataset -> add_elevation_fast -> app/training/plots
+RAW_DATASET = "data/worldcities.csv"
+BASE_DATASET = "data/processed/worldcities_time_dilation.csv"
+CITY_DATASET = "data/processed/worldcities_time_dilation_with_elevation.csv"
+
+CACHE_DIR = "data/cache/datasets"
+CACHE_VERSION = 1
+
+
+def file_sha1(path, block_size=1 << 20):
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def cache_path(source, cache_dir=None):
+    """
+    Cache directory of one source file, keyed by its absolute path.
+    """
+    source = os.path.abspath(source)
+    stem = os.path.splitext(os.path.basename(source))[0]
+    digest = hashlib.sha1(source.encode()).hexdigest()[:10]
+    return os.path.join(cache_dir or CACHE_DIR, f"{stem}-{digest}")
+
+
+def _read_meta(directory):
+    try:
+        with open(os.path.join(directory, "meta.json")) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_meta(directory, meta):
+    tmp = os.path.join(directory, f"meta.json.{os.getpid()}.tmp")
+    with open(tmp, "w") as f:
+        json.dump(meta, f, indent=2)
+    os.replace(tmp, os.path.join(directory, "meta.json"))
+
+
+def _is_fresh(meta, source):
+    """
+    True if the cache still matches the source; refreshes the stored mtime
+    when only the timestamp changed.
+    """
+    if meta is None or meta.get("version") != CACHE_VERSION:
+        return False
+
+    stat = os.stat(source)
+    if stat.st_size != meta["size"]:
+        return False
+    if stat.st_mtime == meta["mtime"]:
+        return True
+    return file_sha1(source) == meta["sha1"]
+
+
+def convert(source, directory):
+    """
+    Parse the CSV once and write its columnar cache to directory.
+    """
+    df = pd.read_csv(source)
+    tmp = f"{directory}.{os.getpid()}.tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+
+    columns = {}
+    for col in df.columns:
+        series = df[col]
+        if pd.api.types.is_numeric_dtype(series) or pd.api.types.is_bool_dtype(series):
+            np.save(os.path.join(tmp, f"{col}.npy"), series.to_numpy())
+            columns[col] = {"kind": "numeric"}
+        else:
+            cat = pd.Categorical(series.astype("string").astype(object))
+            np.save(os.path.join(tmp, f"{col}.codes.npy"), cat.codes.astype(np.int32))
+            np.save(os.path.join(tmp, f"{col}.categories.npy"),
+                    np.asarray(cat.categories, dtype=str))
+            columns[col] = {"kind": "category"}
+
+    stat = os.stat(source)
+    _write_meta(tmp, {
+        "version": CACHE_VERSION,
+        "source": os.path.abspath(source),
+        "size": stat.st_size,
+        "mtime": stat.st_mtime,
+        "sha1": file_sha1(source),
+        "rows": len(df),
+        "columns": columns,
+    })
+
+    shutil.rmtree(directory, ignore_errors=True)
+    os.replace(tmp, directory)
+
+
+def ensure_cache(source=CITY_DATASET, cache_dir=None):
+    """
+    Cache directory for source, converting it first if missing or stale.
+    """
+    directory = cache_path(source, cache_dir)
+    meta = _read_meta(directory)
+    if _is_fresh(meta, source) and meta["mtime"] == os.stat(source).st_mtime:
+        return directory
+
+    os.makedirs(os.path.dirname(directory), exist_ok=True)
+    with open(f"{directory}.lock", "w") as lock:
+        if fcntl is not None:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            # Another process may have converted while we waited
+            meta = _read_meta(directory)
+            if not _is_fresh(meta, source):
+                convert(source, directory)
+            elif meta["mtime"] != os.stat(source).st_mtime:
+                meta["mtime"] = os.stat(source).st_mtime
+                _write_meta(directory, meta)
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+    return directory
+
+
+def _select(meta, columns, optional_columns):
+    available = meta["columns"]
+    if columns is None:
+        names = list(available)
+    else:
+        missing = [c for c in columns if c not in available]
+        if missing:
+            raise KeyError(f"columns not in dataset: {missing}")
+        names = list(columns)
+    names += [c for c in optional_columns if c in available and c not in names]
+    return names
+
+
+def load_columns(source=CITY_DATASET, columns=None, optional_columns=(), cache_dir=None):
+    """
+    Dict of column -> read-only array, memory-mapped from the cache.
+    Text columns come back as pd.Categorical.
+    columns: required columns (all if None); optional_columns: loaded only
+    if the dataset has them.
+    """
+    directory = ensure_cache(source, cache_dir)
+    meta = _read_meta(directory)
+
+    out = {}
+    for col in _select(meta, columns, optional_columns):
+        if meta["columns"][col]["kind"] == "numeric":
+            out[col] = np.load(os.path.join(directory, f"{col}.npy"), mmap_mode="r")
+        else:
+            codes = np.load(os.path.join(directory, f"{col}.codes.npy"), mmap_mode="r")
+            categories = np.load(os.path.join(directory, f"{col}.categories.npy"))
+            out[col] = pd.Categorical.from_codes(codes, categories=categories)
+    return out
+
+
+def load_dataset(source=CITY_DATASET, columns=None, optional_columns=(), cache_dir=None):
+    """
+    DataFrame of the requested columns, loaded from the columnar cache.
+    """
+    return pd.DataFrame(load_columns(source, columns, optional_columns, cache_dir))
+
+
+def compact_table(df, float32_columns=(), category_columns=()):
+    """
+    Smaller copy of a city table: float32 for columns that do not
+    need double precision (coordinates, elevation, population) and
+    categoricals for repeated strings. Keep float64 for anything that
+    resolves 1e-10 differences, such as aging_factor.
+    """
+    out = {}
+    for col in df.columns:
+        series = df[col]
+        if col in float32_columns:
+            series = series.astype(np.float32)
+        elif col in category_columns and not isinstance(series.dtype, pd.CategoricalDtype):
+            series = series.astype("category")
+        out[col] = series
+    return pd.DataFrame(out, index=df.index)
+
+
+def source_hash(source=CITY_DATASET, cache_dir=None):
+    """
+    SHA-1 of the source file, as recorded by its (fresh) cache.
+    """
+    return _read_meta(ensure_cache(source, cache_dir))["sha1"]
@@ -0,0 +1,158 @@
+import os
+from collections import OrderedDict
+
+import numpy as np
+
+SRTM_VOID = -32768
+
+
+def tile_name(lat_floor, lng_floor):
+    """
+    SRTM tile name for the 1x1 degree cell whose south-west corner is
+    (lat_floor, lng_floor), e.g. (41, -88) -> N41W088.
+    """
+    ns = "N" if lat_floor >= 0 else "S"
+    ew = "E" if lng_floor >= 0 else "W"
+    return f"{ns}{abs(lat_floor):02d}{ew}{abs(lng_floor):03d}"
+
+
+def _open_hgt(path):
+    # .hgt: square grid of big-endian int16, row 0 = north edge
+    size = int(round(np.sqrt(os.path.getsize(path) // 2)))
+    return np.memmap(path, dtype=">i2", mode="r", shape=(size, size))
+
+
+def _open_tif(path):
+    try:
+        import tifffile
+    except ImportError as e:
+        raise ImportError("Reading GeoTIFF DEM tiles requires tifffile "
+                          "(pip install tifffile); .hgt tiles need nothing extra") from e
+
+    # Only uncompressed, contiguous tiles can be memory-mapped; compressed
+    # ones are decoded into memory
+    try:
+        return tifffile.memmap(path, mode="r")
+    except ValueError:
+        return tifffile.imread(path)
+
+
+TILE_READERS = {
+    ".hgt": _open_hgt,
+    ".tif": _open_tif,
+    ".tiff": _open_tif,
+}
+
+
+class DEMTiles:
+    """
+    Offline elevation lookup over a directory of 1x1 degree SRTM-style tiles
+    (N41W088.hgt or N41W088.tif). Tiles are memory-mapped lazily and at most
+    `max_open` stay mapped at once (least recently used is dropped first).
+    """
+
+    def __init__(self, tile_dir, max_open=16, missing_value=np.nan):
+        self.tile_dir = tile_dir
+        self.max_open = max_open
+        self.missing_value = missing_value
+        self._open = OrderedDict()
+
+    def _find(self, name):
+        for ext, reader in TILE_READERS.items():
+            path = os.path.join(self.tile_dir, name + ext)
+            if os.path.exists(path):
+                return path, reader
+        return None, None
+
+    def tile(self, lat_floor, lng_floor):
+        """
+        Memory-mapped grid for one tile, or None if the tile is absent
+        (SRTM has no tiles over open ocean).
+        """
+        name = tile_name(lat_floor, lng_floor)
+        if name in self._open:
+            self._open.move_to_end(name)
+            return self._open[name]
+
+        path, reader = self._find(name)
+        grid = reader(path) if path else None
+
+        self._open[name] = grid
+        if len(self._open) > self.max_open:
+            self._open.popitem(last=False)
+        return grid
+
+    def lookup(self, lat, lng):
+        """
+        Bilinearly interpolated elevations (meters) for arrays of lat/lng.
+        Points are grouped by tile so each tile is mapped and read once.
+        Voids and missing tiles give missing_value.
+        """
+        lat = np.asarray(lat, dtype=np.float64)
+        lng = np.asarray(lng, dtype=np.float64)
+        out = np.full(lat.shape, self.missing_value, dtype=np.float64)
+
+        lat_floor = np.floor(lat).astype(np.int64)
+        lng_floor = np.floor(lng).astype(np.int64)
+        cells = np.stack([lat_floor.ravel(), lng_floor.ravel()], axis=1)
+        tiles, inverse = np.unique(cells, axis=0, return_inverse=True)
+
+        inverse = inverse.ravel()
+        order = np.argsort(inverse, kind="stable")
+        bounds = np.searchsorted(inverse[order], np.arange(len(tiles) + 1))
+
+        flat_lat = lat.ravel()
+        flat_lng = lng.ravel()
+        flat_out = out.reshape(-1)
+
+        for t, (tile_lat, tile_lng) in enumerate(tiles.tolist()):
+            grid = self.tile(tile_lat, tile_lng)
+            if grid is None:
+                continue
+
+            idx = order[bounds[t]:bounds[t + 1]]
+            flat_out[idx] = bilinear(grid, tile_lat, tile_lng, flat_lat[idx], flat_lng[idx],
+                                     self.missing_value)
+
+        return out
+
+    def close(self):
+        self._open.clear()
+
+
+def bilinear(grid, tile_lat, tile_lng, lat, lng, missing_value=np.nan):
+    """
+    Vectorized bilinear interpolation inside one tile whose south-west
+    corner is (tile_lat, tile_lng) and whose row 0 is the north edge.
+    """
+    rows, cols = grid.shape
+    r = (tile_lat + 1 - lat) * (rows - 1)
+    c = (lng - tile_lng) * (cols - 1)
+
+    r0 = np.clip(np.floor(r).astype(np.int64), 0, rows - 2)
+    c0 = np.clip(np.floor(c).astype(np.int64), 0, cols - 2)
+    fr = r - r0
+    fc = c - c0
+
+    z00 = grid[r0, c0].astype(np.float64)
+    z01 = grid[r0, c0 + 1].astype(np.float64)
+    z10 = grid[r0 + 1, c0].astype(np.float64)
+    z11 = grid[r0 + 1, c0 + 1].astype(np.float64)
+
+    z = (z00 * (1 - fr) * (1 - fc) + z01 * (1 - fr) * fc
+         + z10 * fr * (1 - fc) + z11 * fr * fc)
+
+    void = (z00 == SRTM_VOID) | (z01 == SRTM_VOID) | (z10 == SRTM_VOID) | (z11 == SRTM_VOID)
+    z[void] = missing_value
+    return z
+
+
+def add_elevation_column(df, tile_dir, max_open=16):
+    """
+    Fill df["elevation_meters"] from local DEM tiles, matching the schema
+    produced by the OpenTopoData fetcher.
+    """
+    dem = DEMTiles(tile_dir, max_open=max_open)
+    df["elevation_meters"] = dem.lookup(df["lat"].to_numpy(), df["lng"].to_numpy())
+    dem.close()
+    return df
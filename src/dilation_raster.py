@@ -0,0 +1,192 @@
+import json
+import os
+
+import numpy as np
+
+from src.dilation import microseconds_difference_per_year
+
+META_FILE = "meta.json"
+
+
+def _level_path(raster_dir, level):
+    return os.path.join(raster_dir, f"level_{level}.f32")
+
+
+def cell_centers(n_rows, n_cols):
+    """
+    Cell-center latitudes (row 0 = north) and longitudes (col 0 = -180)
+    of a global equal-angle grid.
+    """
+    lat = 90 - (np.arange(n_rows) + 0.5) * (180 / n_rows)
+    lng = -180 + (np.arange(n_cols) + 0.5) * (360 / n_cols)
+    return lat, lng
+
+
+def grid_altitude(altitude_grid):
+    """
+    Altitude lookup from a global (H, W) grid in the same layout
+    (row 0 = north, col 0 = -180), nearest cell.
+    """
+    grid = np.asarray(altitude_grid)
+    rows, cols = grid.shape
+
+    def lookup(lat, lng):
+        r = np.clip(((90 - lat) / 180 * rows).astype(np.int64), 0, rows - 1)
+        c = np.clip(((lng + 180) / 360 * cols).astype(np.int64), 0, cols - 1)
+        return grid[r, c]
+
+    return lookup
+
+
+def dem_altitude(tile_dir, max_open=16):
+    """
+    Altitude lookup from local DEM tiles; ocean and voids count as sea level.
+    """
+    from src.dem import DEMTiles
+
+    dem = DEMTiles(tile_dir, max_open=max_open, missing_value=0.0)
+    return dem.lookup
+
+
+def bake_raster(raster_dir, resolution_deg=0.1, levels=5, altitude=None, band_rows=256):
+    """
+    Bake microseconds_difference_per_year on a global grid into a pyramid of
+    float32 memmaps: level 0 at resolution_deg, each next level 2x coarser
+    (mean of 2x2 blocks). Level 0 is filled in bands of band_rows rows, so
+    memory stays bounded for any resolution.
+
+    altitude: callable (lat, lng) -> meters for arrays (see grid_altitude and
+    dem_altitude), or None for sea level everywhere.
+    """
+    os.makedirs(raster_dir, exist_ok=True)
+
+    n_rows = int(round(180 / resolution_deg))
+    n_cols = int(round(360 / resolution_deg))
+    lat, lng = cell_centers(n_rows, n_cols)
+
+    base = np.memmap(_level_path(raster_dir, 0), dtype=np.float32, mode="w+",
+                     shape=(n_rows, n_cols))
+
+    for start in range(0, n_rows, band_rows):
+        band_lat, band_lng = np.meshgrid(lat[start:start + band_rows], lng, indexing="ij")
+        alt = 0.0 if altitude is None else altitude(band_lat.ravel(), band_lng.ravel())
+        alt = np.broadcast_to(alt, band_lat.size).reshape(band_lat.shape)
+        base[start:start + band_rows] = microseconds_difference_per_year(
+            band_lat, alt, dtype=np.float32
+        )
+    base.flush()
+
+    shapes = [(n_rows, n_cols)]
+    prev = base
+    for level in range(1, levels):
+        rows, cols = prev.shape[0] // 2, prev.shape[1] // 2
+        if rows == 0 or cols == 0:
+            break
+
+        out = np.memmap(_level_path(raster_dir, level), dtype=np.float32, mode="w+",
+                        shape=(rows, cols))
+        for start in range(0, rows, band_rows):
+            # An odd trailing row or column of the finer level is dropped
+            stop = min(start + band_rows, rows)
+            block = prev[2 * start:2 * stop, :2 * cols]
+            out[start:stop] = block.reshape(stop - start, 2, cols, 2).mean(axis=(1, 3))
+        out.flush()
+
+        shapes.append((rows, cols))
+        prev = out
+
+    meta = {"resolution_deg": resolution_deg, "levels": [list(s) for s in shapes],
+            "value": "microseconds_difference_per_year", "dtype": "float32"}
+    with open(os.path.join(raster_dir, META_FILE), "w") as f:
+        json.dump(meta, f, indent=2)
+    return raster_dir
+
+
+class DilationRaster:
+    """
+    Read-only access to a baked raster pyramid. Levels are memory-mapped on
+    first use; point and window reads touch only the cells they need.
+    """
+
+    def __init__(self, raster_dir):
+        self.raster_dir = raster_dir
+        with open(os.path.join(raster_dir, META_FILE)) as f:
+            self.meta = json.load(f)
+        self.shapes = [tuple(s) for s in self.meta["levels"]]
+        self._levels = {}
+
+    def __len__(self):
+        return len(self.shapes)
+
+    def level(self, level=0):
+        if level not in self._levels:
+            self._levels[level] = np.memmap(_level_path(self.raster_dir, level),
+                                            dtype=np.float32, mode="r",
+                                            shape=self.shapes[level])
+        return self._levels[level]
+
+    def choose_level(self, lat_span, lng_span, max_cells=1_000_000):
+        """
+        Finest level at which a lat_span x lng_span window has at most
+        max_cells cells.
+        """
+        for level, (rows, cols) in enumerate(self.shapes):
+            cells = (lat_span / 180 * rows) * (lng_span / 360 * cols)
+            if cells <= max_cells:
+                return level
+        return len(self.shapes) - 1
+
+    def point(self, lat, lng, level=0):
+        """
+        Values at arrays of points (nearest cell), O(1) per point.
+        """
+        grid = self.level(level)
+        rows, cols = grid.shape
+        lat = np.asarray(lat, dtype=np.float64)
+        lng = np.asarray(lng, dtype=np.float64)
+
+        r = np.clip(((90 - lat) / 180 * rows).astype(np.int64), 0, rows - 1)
+        c = np.clip(((lng + 180) / 360 * cols).astype(np.int64), 0, cols - 1)
+        return grid[r, c]
+
+    def window(self, lat_min, lat_max, lng_min, lng_max, level=None, max_cells=1_000_000):
+        """
+        Sub-grid covering a bounding box, read as an array slice.
+        level=None picks the finest level within max_cells.
+        Returns (values, extent) with extent = [lng_min, lng_max, lat_min, lat_max]
+        of the returned cells, ready for imshow.
+        """
+        if level is None:
+            level = self.choose_level(lat_max - lat_min, lng_max - lng_min, max_cells)
+
+        grid = self.level(level)
+        rows, cols = grid.shape
+
+        r0 = int(np.clip(np.floor((90 - lat_max) / 180 * rows), 0, rows - 1))
+        r1 = int(np.clip(np.ceil((90 - lat_min) / 180 * rows), r0 + 1, rows))
+        c0 = int(np.clip(np.floor((lng_min + 180) / 360 * cols), 0, cols - 1))
+        c1 = int(np.clip(np.ceil((lng_max + 180) / 360 * cols), c0 + 1, cols))
+
+        extent = [-180 + c0 * 360 / cols, -180 + c1 * 360 / cols,
+                  90 - r1 * 180 / rows, 90 - r0 * 180 / rows]
+        return np.asarray(grid[r0:r1, c0:c1]), extent
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Bake a global dilation raster pyramid.")
+    parser.add_argument("--out", default="data/processed/dilation_raster")
+    parser.add_argument("--resolution", type=float, default=0.1, help="level 0 cell size (degrees)")
+    parser.add_argument("--levels", type=int, default=5)
+    parser.add_argument("--dem-dir", default=None, help="DEM tiles for altitude (default: sea level)")
+    parser.add_argument("--altitude-npy", default=None, help="global (H, W) altitude grid .npy")
+    args = parser.parse_args()
+
+    altitude = None
+    if args.dem_dir:
+        altitude = dem_altitude(args.dem_dir)
+    elif args.altitude_npy:
+        altitude = grid_altitude(np.load(args.altitude_npy, mmap_mode="r"))
+
+    print("Saved", bake_raster(args.out, args.resolution, args.levels, altitude))
@@ -0,0 +1,194 @@
+import json
+import os
+
+import numpy as np
+
+H5_PATH = "model/time_dilation_nn.h5"
+SCALER_PATH = "model/scaler.pkl"
+NPZ_PATH = "model/time_dilation_nn.npz"
+
+# Agreement with Keras on the shipped model, checked over 200k random
+# points inside the training range (predictions reach ~5e4):
+#   float32 weights: max abs difference below FLOAT32_ATOL us/year
+#   int8 weights:    max abs difference below INT8_RTOL * max |prediction|
+FLOAT32_ATOL = 0.05
+INT8_RTOL = 0.01
+
+ACTIVATIONS = {
+    "relu": lambda x: np.maximum(x, 0, out=x),
+    "linear": lambda x: x,
+}
+
+
+def _dense_layers(h5_path):
+    """
+    [(kernel, bias, activation)] for each Dense layer of a Keras .h5 file,
+    read with h5py only (no TensorFlow import).
+    """
+    import h5py
+
+    with h5py.File(h5_path, "r") as f:
+        config = json.loads(f.attrs["model_config"])
+        activations = {
+            layer["config"]["name"]: layer["config"].get("activation", "linear")
+            for layer in config["config"]["layers"]
+            if layer["class_name"] == "Dense"
+        }
+
+        group = f["model_weights"]
+        layers = []
+        for name in group.attrs["layer_names"]:
+            name = name.decode() if isinstance(name, bytes) else name
+            weights = {}
+
+            def collect(key, obj):
+                if isinstance(obj, h5py.Dataset):
+                    weights[key.split("/")[-1].split(":")[0]] = obj[()]
+
+            group[name].visititems(collect)
+            if "kernel" in weights:
+                layers.append((weights["kernel"], weights["bias"], activations[name]))
+
+    return layers
+
+
+def _quantize_int8(w):
+    # Symmetric per-output-column scales
+    scale = np.abs(w).max(axis=0) / 127
+    scale[scale == 0] = 1
+    return np.round(w / scale).astype(np.int8), scale.astype(np.float32)
+
+
+def fold_scaler(layers, mean, scale):
+    """
+    [(kernel, bias, activation)] in float64 with a StandardScaler folded
+    into the first layer:
+        ((x - mean) / scale) @ W + b  ==  x @ (W / scale[:, None]) + (b - (mean / scale) @ W)
+    """
+    mean = np.asarray(mean, dtype=np.float64)
+    scale = np.asarray(scale, dtype=np.float64)
+
+    folded = []
+    for i, (w, b, act) in enumerate(layers):
+        w = np.asarray(w, dtype=np.float64)
+        b = np.asarray(b, dtype=np.float64)
+        if i == 0:
+            b = b - (mean / scale) @ w
+            w = w / scale[:, None]
+        folded.append((w, b, act))
+    return folded
+
+
+def export_npz(h5_path=H5_PATH, scaler_path=SCALER_PATH, out_path=NPZ_PATH, int8=False):
+    """
+    Export the Keras model and StandardScaler to a compact .npz, with the
+    scaler folded into the first layer (see fold_scaler).
+    With int8=True all layers but the first (3 inputs, kept float32 because
+    the folded rows differ in magnitude by orders) are stored as int8.
+    """
+    import joblib
+
+    scaler = joblib.load(scaler_path)
+    layers = fold_scaler(_dense_layers(h5_path), scaler.mean_, scaler.scale_)
+    arrays = {"activations": np.array([act for _, _, act in layers])}
+
+    for i, (w, b, _) in enumerate(layers):
+        if int8 and i > 0:
+            arrays[f"W{i}_q"], arrays[f"W{i}_scale"] = _quantize_int8(w)
+        else:
+            arrays[f"W{i}"] = w.astype(np.float32)
+        arrays[f"b{i}"] = b.astype(np.float32)
+
+    np.savez(out_path, **arrays)
+    return out_path
+
+
+class NumpyMLP:
+    """
+    Pure-NumPy forward pass for the exported dense ReLU network. Takes raw
+    [lat, lng, elevation] rows, since the scaler is folded into layer 0.
+    int8 weights are dequantized once at load. Weights already in dtype
+    are used without copying (e.g. views into a shared store).
+    """
+
+    def __init__(self, weights, biases, activations, dtype=np.float32):
+        self.dtype = np.dtype(dtype)
+        self.weights = [w.astype(self.dtype, copy=False) for w in weights]
+        self.biases = [b.astype(self.dtype, copy=False) for b in biases]
+        self.activation_names = [str(a) for a in activations]
+        self.activations = [ACTIVATIONS[a] for a in self.activation_names]
+
+    @classmethod
+    def load(cls, path=NPZ_PATH, dtype=np.float32):
+        data = np.load(path)
+        activations = [str(a) for a in data["activations"]]
+
+        weights, biases = [], []
+        for i in range(len(activations)):
+            if f"W{i}" in data:
+                weights.append(data[f"W{i}"])
+            else:
+                weights.append(data[f"W{i}_q"].astype(np.float32) * data[f"W{i}_scale"])
+            biases.append(data[f"b{i}"])
+
+        return cls(weights, biases, activations, dtype)
+
+    @classmethod
+    def from_keras(cls, model, scaler, dtype=np.float32):
+        """
+        Engine for an in-memory Keras Sequential of Dense layers and its
+        StandardScaler, without saving either (used to time candidate
+        models during a hyperparameter search).
+        """
+        layers = [(layer.kernel.numpy(), layer.bias.numpy(), layer.activation.__name__)
+                  for layer in model.layers if hasattr(layer, "kernel")]
+        layers = fold_scaler(layers, scaler.mean_, scaler.scale_)
+        return cls([w for w, _, _ in layers], [b for _, b, _ in layers],
+                   [act for _, _, act in layers], dtype)
+
+    @classmethod
+    def load_shared(cls, path=NPZ_PATH, dtype=np.float32, name="time_dilation_nn"):
+        """
+        Weights published once into a shared store (src.shared_store) by the
+        first process and attached read-only by every other one.
+        """
+        from src.shared_store import model_to_arrays, publish_or_attach
+
+        stat = os.stat(path)
+        key = f"{os.path.abspath(path)}:{stat.st_size}:{stat.st_mtime}:{np.dtype(dtype).str}"
+        arrays, meta = publish_or_attach(name, key, lambda: model_to_arrays(cls.load(path, dtype)))
+
+        n = len(meta["activations"])
+        return cls([arrays[f"W{i}"] for i in range(n)], [arrays[f"b{i}"] for i in range(n)],
+                   meta["activations"], meta["dtype"])
+
+    def predict(self, X, batch_size=65536):
+        """
+        (N, 3) raw features -> (N,) predictions, evaluated in batches so the
+        hidden activations stay a few MB regardless of N.
+        """
+        X = np.asarray(X, dtype=self.dtype)
+        out = np.empty(len(X), dtype=self.dtype)
+
+        for start in range(0, len(X), batch_size):
+            h = X[start:start + batch_size]
+            for w, b, act in zip(self.weights, self.biases, self.activations):
+                h = h @ w
+                h += b
+                h = act(h)
+            out[start:start + len(h)] = h[:, 0]
+
+        return out
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Export the Keras model to a NumPy .npz.")
+    parser.add_argument("--h5", default=H5_PATH)
+    parser.add_argument("--scaler", default=SCALER_PATH)
+    parser.add_argument("--out", default=NPZ_PATH)
+    parser.add_argument("--int8", action="store_true", help="store hidden layers as int8")
+    args = parser.parse_args()
+
+    print("Saved", export_npz(args.h5, args.scaler, args.out, args.int8))
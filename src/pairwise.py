@@ -0,0 +1,301 @@
+"""
+All-pairs city comparisons without the n x n matrix.
+
+The pairwise difference v_i - v_j of microseconds/year is separable, so
+most questions are answered from the sorted values alone:
+  - nearest_rate: the k cities closest in clock rate, O(log n + k)
+  - top_pairs: the k most (or least) different pairs, O((n + k) log n)
+  - pair_histogram: histogram of |v_i - v_j| by binary search per bin
+    edge, O(bins * n log n)
+
+scan_pairs is the general path for questions that are not separable
+(e.g. "which cities less than 100 km apart differ most?"): it streams the
+upper triangle in tile x tile blocks on a process pool, keeping a bounded
+top-k and a histogram per block, so memory is O(tile^2) per worker.
+"""
+import heapq
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from src.spatial_index import EARTH_RADIUS_KM, VALUE_COLUMN, lat_lng_to_xyz
+
+TILE = 512  # 512 x 512 float64 = 2 MB per block
+
+
+class PairwiseEngine:
+    """
+    Sorted view of the city values (microseconds/year). positions maps the
+    engine's rows back to rows of the original table, so subsets (a
+    country, a continent) report original row positions.
+
+    All state is in NumPy arrays (self.arrays), so the engine can be
+    published into shared memory once and attached elsewhere (from_arrays).
+    """
+
+    def __init__(self, values, lat=None, lng=None, groups=None, positions=None):
+        self.values = np.asarray(values, dtype=np.float64)
+        self.lat = None if lat is None else np.asarray(lat, dtype=np.float64)
+        self.lng = None if lng is None else np.asarray(lng, dtype=np.float64)
+        self.groups = None if groups is None else np.asarray(groups)
+        self.positions = np.arange(len(self.values)) if positions is None else np.asarray(positions)
+
+        self.order = np.argsort(self.values, kind="stable")
+        self.sorted = self.values[self.order]
+        self.row_of = _inverse(self.positions)
+
+    @property
+    def arrays(self):
+        """
+        The engine's arrays, with group labels as fixed-width strings so
+        they can be shared.
+        """
+        arrays = {"values": self.values, "positions": self.positions,
+                  "order": self.order, "sorted": self.sorted, "row_of": self.row_of}
+        for name in ("lat", "lng"):
+            if getattr(self, name) is not None:
+                arrays[name] = getattr(self, name)
+        if self.groups is not None:
+            arrays["groups"] = self.groups.astype(str)
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        """
+        Engine over the arrays of another one (e.g. attached from a shared
+        store), without sorting again.
+        """
+        engine = cls.__new__(cls)
+        engine.values = arrays["values"]
+        engine.lat = arrays.get("lat")
+        engine.lng = arrays.get("lng")
+        engine.groups = arrays.get("groups")
+        engine.positions = arrays["positions"]
+        engine.order = arrays["order"]
+        engine.sorted = arrays["sorted"]
+        engine.row_of = arrays["row_of"] if "row_of" in arrays else _inverse(engine.positions)
+        return engine
+
+    @classmethod
+    def from_dataframe(cls, df, value_col=VALUE_COLUMN, group_col="country"):
+        groups = df[group_col].to_numpy() if group_col in df else None
+        return cls(df[value_col].to_numpy(), df["lat"].to_numpy(), df["lng"].to_numpy(), groups)
+
+    def __len__(self):
+        return len(self.values)
+
+    def subset(self, rows):
+        """
+        Engine over a subset of rows (boolean mask or row numbers).
+        """
+        rows = np.flatnonzero(rows) if np.asarray(rows).dtype == bool else np.asarray(rows)
+        pick = lambda a: None if a is None else a[rows]
+        return PairwiseEngine(self.values[rows], pick(self.lat), pick(self.lng),
+                              pick(self.groups), self.positions[rows])
+
+    def group(self, name):
+        return self.subset(self.groups == name)
+
+    # ---------------------------------------------------------------
+    # Separable queries on the sorted values
+    # ---------------------------------------------------------------
+
+    def nearest_rate(self, value, k=100, exclude=None):
+        """
+        Original row positions and values of the k cities whose clock rate
+        is closest to `value`, closest first. exclude: a row position to
+        leave out (the query city itself).
+        """
+        extra = 0 if exclude is None else 1
+        pos = np.searchsorted(self.sorted, value)
+
+        # The k nearest values lie within k (+1) places on either side
+        lo = max(pos - k - extra, 0)
+        hi = min(pos + k + extra, len(self.sorted))
+        window = self.order[lo:hi]
+        window = window[np.argsort(np.abs(self.values[window] - value), kind="stable")]
+
+        if exclude is not None:
+            window = window[self.positions[window] != exclude]
+        window = window[:k]
+        return self.positions[window], self.values[window]
+
+    def nearest_to_city(self, position, k=100):
+        row = self.row_of[position] if 0 <= position < len(self.row_of) else -1
+        if row < 0:
+            raise KeyError(f"row position {position} is not in this engine")
+        return self.nearest_rate(self.values[row], k, exclude=position)
+
+    def top_pairs(self, k=100, largest=True):
+        """
+        The k pairs with the largest (or smallest) |v_i - v_j|, as arrays
+        (row_i, row_j, difference) with difference = v_i - v_j >= 0.
+
+        Largest: a best-first search from (lowest, highest) in sorted order.
+        Smallest: every city's closest pair starts at its sorted neighbour,
+        so a heap over neighbour gaps is advanced k times.
+        """
+        s = self.sorted
+        n = len(s)
+        out = []
+
+        if largest:
+            heap = [(-(s[n - 1] - s[0]), 0, n - 1)]
+            seen = {(0, n - 1)}
+            while heap and len(out) < k:
+                neg, a, b = heapq.heappop(heap)
+                if a >= b:
+                    continue
+                out.append((b, a, -neg))
+                for na, nb in ((a + 1, b), (a, b - 1)):
+                    if na < nb and (na, nb) not in seen:
+                        seen.add((na, nb))
+                        heapq.heappush(heap, (-(s[nb] - s[na]), na, nb))
+        else:
+            heap = [(s[a + 1] - s[a], a, a + 1) for a in range(n - 1)]
+            heapq.heapify(heap)
+            while heap and len(out) < k:
+                gap, a, b = heapq.heappop(heap)
+                out.append((b, a, gap))
+                if b + 1 < n:
+                    heapq.heappush(heap, (s[b + 1] - s[a], a, b + 1))
+
+        if not out:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0)
+        hi, lo, diff = (np.array(col) for col in zip(*out))
+        return self.positions[self.order[hi]], self.positions[self.order[lo]], diff.astype(np.float64)
+
+    def pair_histogram(self, bins=50, value_range=None):
+        """
+        Histogram of |v_i - v_j| over all pairs i < j, with np.histogram
+        bin semantics. Pairs with difference < e are counted per city by
+        binary search for v_i + e in the sorted values, so it is exact up
+        to rounding of differences that land exactly on a bin edge.
+        """
+        s = self.sorted
+        n = len(s)
+        if isinstance(bins, int):
+            hi = value_range[1] if value_range else s[-1] - s[0]
+            lo = value_range[0] if value_range else 0.0
+            edges = np.linspace(lo, hi, bins + 1)
+        else:
+            edges = np.asarray(bins, dtype=np.float64)
+
+        after = np.arange(1, n + 1)
+
+        def pairs_below(e, side):
+            # pairs (i < j in sorted order) with s_j - s_i < e (or <= e)
+            return np.maximum(np.searchsorted(s, s + e, side=side) - after, 0).sum()
+
+        below = np.array([pairs_below(e, "left") for e in edges], dtype=np.int64)
+        below[-1] = pairs_below(edges[-1], "right")
+        if edges[-1] >= s[-1] - s[0]:
+            # s_0 + (s_-1 - s_0) can round below s_-1
+            below[-1] = n * (n - 1) // 2
+        return np.diff(below), edges
+
+    # ---------------------------------------------------------------
+    # General tiled scan
+    # ---------------------------------------------------------------
+
+    def scan_pairs(self, k=100, bins=None, min_km=None, max_km=None, largest=True,
+                   tile=TILE, workers=None):
+        """
+        Stream every pair i < j in tile x tile blocks, keeping the top-k by
+        |v_i - v_j| (largest or smallest) and an optional histogram, with
+        an optional great-circle distance filter (needs lat/lng).
+
+        Returns (row_i, row_j, difference, distance_km, histogram); each
+        block's results are integer counts and exact values, so the output
+        does not depend on the number of workers.
+        """
+        if (min_km is not None or max_km is not None) and self.lat is None:
+            raise ValueError("distance filters need lat/lng")
+
+        xyz = lat_lng_to_xyz(self.lat, self.lng) if self.lat is not None else None
+        edges = None if bins is None else np.asarray(bins, dtype=np.float64)
+        config = (k, edges, min_km, max_km, largest, tile)
+        starts = list(range(0, len(self.values), tile))
+        workers = workers or os.cpu_count() or 1
+
+        if workers == 1:
+            _init_scan(self.values, xyz)
+            parts = [_scan_rows((start, config)) for start in starts]
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_scan,
+                                     initargs=(self.values, xyz)) as pool:
+                parts = list(pool.map(_scan_rows, [(start, config) for start in starts]))
+
+        i, j, diff, dist = (np.concatenate([p[c] for p in parts]) for c in range(4))
+        keep = _top_k(diff, i, j, k, largest)
+        hist = None if edges is None else np.sum([p[4] for p in parts], axis=0)
+        return (self.positions[i[keep]], self.positions[j[keep]], diff[keep], dist[keep], hist)
+
+
+def _inverse(positions):
+    # row_of[position] = engine row, -1 for positions outside the engine
+    row_of = np.full(int(positions.max()) + 1 if len(positions) else 0, -1, dtype=np.int64)
+    row_of[positions] = np.arange(len(positions))
+    return row_of
+
+
+def _top_k(diff, i, j, k, largest):
+    # Deterministic: ties broken by (i, j)
+    key = -diff if largest else diff
+    order = np.lexsort((j, i, key))
+    return order[:k]
+
+
+_SCAN = {}
+
+
+def _init_scan(values, xyz):
+    _SCAN["values"] = values
+    _SCAN["xyz"] = xyz
+
+
+def _scan_rows(args):
+    """
+    One row band [start, start + tile) against every column block at or to
+    the right of it.
+    """
+    start, (k, edges, min_km, max_km, largest, tile) = args
+    values, xyz = _SCAN["values"], _SCAN["xyz"]
+    n = len(values)
+    stop = min(start + tile, n)
+    rows = np.arange(start, stop)
+
+    hist = None if edges is None else np.zeros(len(edges) - 1, dtype=np.int64)
+    best = [np.empty(0, dtype=np.int64)] * 2 + [np.empty(0)] * 2
+
+    for col in range(start, n, tile):
+        cols = np.arange(col, min(col + tile, n))
+        diff = np.abs(values[rows, None] - values[None, cols])
+        mask = rows[:, None] < cols[None, :]
+
+        dist = None
+        if xyz is not None:
+            cos = np.clip(xyz[rows] @ xyz[cols].T, -1, 1)
+            dist = EARTH_RADIUS_KM * np.arccos(cos)
+            if min_km is not None:
+                mask &= dist >= min_km
+            if max_km is not None:
+                mask &= dist <= max_km
+
+        r, q = np.nonzero(mask)
+        d = diff[r, q]
+        if hist is not None:
+            hist += np.histogram(d, bins=edges)[0]
+
+        gi, gj = rows[r], cols[q]
+        gd = dist[r, q] if dist is not None else np.full(len(d), np.nan)
+        i = np.concatenate([best[0], gi])
+        j = np.concatenate([best[1], gj])
+        dd = np.concatenate([best[2], d])
+        dk = np.concatenate([best[3], gd])
+
+        keep = _top_k(dd, i, j, k, largest)
+        best = [i[keep], j[keep], dd[keep], dk[keep]]
+
+    return best + [hist]
@@ -0,0 +1,255 @@
+"""
+Monte Carlo experiment: can anyone actually feel time dilation?
+
+Each simulated observer has a perception rate (frames per second) and a
+Weber fraction for duration judgements. The observer compares an interval
+of `interval` seconds on their own clock with the same interval on a
+reference clock (sea level on the equator, at rest). Both durations are
+perceived as a whole number of frames (random frame phase), then blurred
+by Weber noise; the observer reports a difference when the two estimates
+differ by more than `criterion` standard deviations of that noise.
+
+Cells are a grid of velocities x city gravitational offsets, plus a
+control cell with no dilation at all, so detection rates can be read
+against the false-alarm baseline.
+
+Work is split into (cell, batch) tasks. Each task draws from its own
+np.random.SeedSequence(seed, spawn_key=(cell, batch)) stream and returns
+integer counts, so totals are bit-identical for any number of workers.
+Finished tasks are appended to an NDJSON file; rerunning with the same
+output skips them.
+"""
+import argparse
+import json
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from src.dilation import SECONDS_PER_YEAR, c
+from src.profiling import add_arguments as add_profiling_arguments, session, traced
+
+# Observer population
+RATE_MEAN = 20.0       # perception frames per second
+RATE_SD = 4.0
+RATE_MIN = 5.0
+WEBER_MEDIAN = 0.1     # duration discrimination, fraction of the interval
+WEBER_SIGMA = 0.4      # log-normal spread of the Weber fraction
+
+INTERVAL = 1.0         # seconds being compared
+CRITERION = 1.96       # decision threshold in noise standard deviations
+BATCH_SIZE = 100_000
+SEED = 2024
+
+VELOCITIES = [0.0, 250.0, 7_660.0, 0.01 * c, 0.1 * c, 0.5 * c, 0.9 * c]
+
+
+def relative_rate(velocity, microseconds_per_year):
+    """
+    Clock rate of the observer minus 1, relative to the reference clock:
+    (1 + a)(1 + g) - 1 with a = sqrt(1 - v^2/c^2) - 1 and g the city's
+    gravitational/rotational gain, written to keep tiny values exact.
+    """
+    beta2 = (np.asarray(velocity, dtype=np.float64) / c) ** 2
+    a = -beta2 / (1 + np.sqrt(1 - beta2))
+    g = np.asarray(microseconds_per_year, dtype=np.float64) * 1e-6 / SECONDS_PER_YEAR
+    return a + g + a * g
+
+
+def simulate_batch(rng, size, offset, interval=INTERVAL, criterion=CRITERION):
+    """
+    Simulate `size` observers for one cell with relative clock offset
+    `offset`. Returns the number who report a difference.
+    """
+    rate = np.maximum(rng.normal(RATE_MEAN, RATE_SD, size), RATE_MIN)
+    weber = rng.lognormal(np.log(WEBER_MEDIAN), WEBER_SIGMA, size)
+
+    # Frames perceived in each interval, with independent frame phases
+    frames_ref = np.floor(interval * rate + rng.random(size))
+    frames_obs = np.floor(interval * (1 + offset) * rate + rng.random(size))
+
+    est_ref = frames_ref / rate * (1 + weber * rng.standard_normal(size))
+    est_obs = frames_obs / rate * (1 + weber * rng.standard_normal(size))
+
+    threshold = criterion * weber * interval * np.sqrt(2)
+    return int(np.count_nonzero(np.abs(est_obs - est_ref) > threshold))
+
+
+@traced("perceptibility/batch", items=lambda result: result[2])
+def _run_task(args):
+    cell, batch, size, offset, seed, interval, criterion = args
+    rng = np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(cell, batch)))
+    return cell, batch, size, simulate_batch(rng, size, offset, interval, criterion)
+
+
+def wilson_interval(successes, trials, z=1.96):
+    """
+    Wilson score confidence interval for a binomial proportion.
+    """
+    successes = np.asarray(successes, dtype=np.float64)
+    trials = np.asarray(trials, dtype=np.float64)
+    p = successes / trials
+    denom = 1 + z**2 / trials
+    center = (p + z**2 / (2 * trials)) / denom
+    half = z * np.sqrt(p * (1 - p) / trials + z**2 / (4 * trials**2)) / denom
+    return center - half, center + half
+
+
+def build_cells(velocities, offsets):
+    """
+    Grid of (velocity, city, microseconds_per_year) cells, control first.
+    offsets: dict of city -> microseconds gained per year.
+    """
+    cells = [{"velocity": 0.0, "city": "control", "microseconds_per_year": 0.0, "offset": 0.0}]
+    for v in velocities:
+        for city, us in offsets.items():
+            cells.append({"velocity": float(v), "city": city,
+                          "microseconds_per_year": float(us),
+                          "offset": float(relative_rate(v, us))})
+    return cells
+
+
+def city_offsets(csv_path, cities=None):
+    """
+    Gravitational offsets (microseconds per year) for named cities, or for
+    the lowest, median and highest cities in the dataset.
+    """
+    df = pd.read_csv(csv_path, usecols=["city", "microseconds_difference_per_year"])
+    df = df.dropna().drop_duplicates("city")
+
+    if cities:
+        df = df[df["city"].isin(cities)]
+    else:
+        df = df.sort_values("microseconds_difference_per_year")
+        df = df.iloc[[0, len(df) // 2, len(df) - 1]]
+    return dict(zip(df["city"], df["microseconds_difference_per_year"]))
+
+
+def _read_progress(path, config):
+    done = {}
+    if not os.path.exists(path):
+        return done
+
+    with open(path, "r+") as f:
+        header = json.loads(f.readline())
+        if header.get("config") != config:
+            raise ValueError(f"{path} was written with a different configuration")
+
+        valid = f.tell()
+        for line in iter(f.readline, ""):
+            # A run killed mid-write leaves a partial last line: drop it
+            if not line.endswith("\n"):
+                f.truncate(valid)
+                break
+            rec = json.loads(line)
+            done[(rec["cell"], rec["batch"])] = (rec["size"], rec["detected"])
+            valid = f.tell()
+    return done
+
+
+def run_experiment(velocities=VELOCITIES, offsets=None, observers=1_000_000,
+                   batch_size=BATCH_SIZE, interval=INTERVAL, criterion=CRITERION,
+                   seed=SEED, workers=None, output=None):
+    """
+    Estimate detection probabilities for every cell with `observers`
+    simulated observers each. If output is given, finished batches are
+    appended there and a rerun resumes from it.
+
+    Returns a DataFrame with one row per cell: detection probability, its
+    95% Wilson interval and the excess over the control cell.
+    """
+    offsets = {"sea level": 0.0} if offsets is None else offsets
+    cells = build_cells(velocities, offsets)
+    config = {"cells": cells, "observers": observers, "batch_size": batch_size,
+              "interval": interval, "criterion": criterion, "seed": seed}
+
+    done = _read_progress(output, config) if output else {}
+    if output:
+        if not os.path.exists(output):
+            with open(output, "w") as f:
+                f.write(json.dumps({"config": config}) + "\n")
+        log = open(output, "a")
+
+    tasks = []
+    for i, cell in enumerate(cells):
+        for b, start in enumerate(range(0, observers, batch_size)):
+            if (i, b) not in done:
+                size = min(batch_size, observers - start)
+                tasks.append((i, b, size, cell["offset"], seed, interval, criterion))
+
+    def record(result):
+        i, b, size, detected = result
+        done[(i, b)] = (size, detected)
+        if output:
+            log.write(json.dumps({"cell": i, "batch": b, "size": size,
+                                  "detected": detected}) + "\n")
+            log.flush()
+
+    try:
+        if workers == 1:
+            for task in tasks:
+                record(_run_task(task))
+        else:
+            workers = workers or os.cpu_count() or 1
+            pending = deque()
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                for task in tasks:
+                    pending.append(pool.submit(_run_task, task))
+                    while len(pending) >= 2 * workers:
+                        record(pending.popleft().result())
+                while pending:
+                    record(pending.popleft().result())
+    finally:
+        if output:
+            log.close()
+
+    trials = np.zeros(len(cells), dtype=np.int64)
+    detected = np.zeros(len(cells), dtype=np.int64)
+    for (i, _), (size, hits) in done.items():
+        trials[i] += size
+        detected[i] += hits
+
+    result = pd.DataFrame(cells)
+    result["observers"] = trials
+    result["detected"] = detected
+    result["p_detect"] = detected / trials
+    result["ci_low"], result["ci_high"] = wilson_interval(detected, trials)
+    result["excess_over_control"] = result["p_detect"] - result["p_detect"].iloc[0]
+    return result
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Monte Carlo: is time dilation perceptible?")
+    parser.add_argument("--dataset", default=None,
+                        help="city dataset CSV with microseconds_difference_per_year")
+    parser.add_argument("--cities", nargs="*", default=None,
+                        help="cities to use (default: lowest, median, highest)")
+    parser.add_argument("--velocities", type=float, nargs="*", default=VELOCITIES,
+                        help="observer speeds in m/s")
+    parser.add_argument("--observers", type=int, default=1_000_000, help="observers per cell")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--interval", type=float, default=INTERVAL,
+                        help="seconds of experience being compared")
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--output", default=None,
+                        help="NDJSON progress file; rerun to resume")
+    add_profiling_arguments(parser)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    with session("perceptibility", args.trace, args.profile):
+        offsets = city_offsets(args.dataset, args.cities) if args.dataset else None
+        result = run_experiment(args.velocities, offsets, args.observers, args.batch_size,
+                                args.interval, seed=args.seed, workers=args.workers,
+                                output=args.output)
+    with pd.option_context("display.width", 160, "display.max_columns", None):
+        print(result.drop(columns="offset"))
+
+
+if __name__ == "__main__":
+    main()
@@ -8,3 +8,151 @@ def subjective_time_sampling(real_time, sampling_rate=20):
     interval = 1 / sampling_rate
     subjective_ticks = np.arange(0, real_time[-1], interval)
     return subjective_ticks
+
+
+def jittered_intervals(jitter):
+    """
+    Interval distribution for perception_frames: intervals are
+    1 + jitter * N(0, 1) in units of the nominal interval, floored at 0.1
+    so frames never collapse onto each other.
+    """
+    def draw(rng, size):
+        return np.maximum(1 + jitter * rng.standard_normal(size), 0.1)
+    return draw
+
+
+def perception_frames(duration, rate=20.0, intervals=None, window=60.0,
+                      resolution=1e-3, seed=None):
+    """
+    Lazily yield perception frame times over [0, duration) in chunks, one
+    array per `window` seconds, so memory stays constant for any duration.
+
+    rate: frames per second, either a constant or a callable rate(t) for
+        arrays of times (e.g. attention-dependent sampling).
+    intervals: optional callable (rng, size) -> relative intervals with
+        mean ~1 (see jittered_intervals), for random sampling rates.
+
+    Frames are placed where the accumulated phase (integral of rate dt)
+    crosses successive thresholds spaced by the drawn intervals (all 1 for
+    regular sampling). Time-varying rates are integrated on a grid of
+    `resolution` seconds within each window.
+    """
+    rng = np.random.default_rng(seed)
+    threshold = 0.0  # phase of the next frame
+    phase = 0.0      # phase accumulated up to the start of the window
+
+    for start in np.arange(0.0, duration, window):
+        stop = min(start + window, duration)
+
+        if callable(rate):
+            grid = np.arange(start, stop + resolution, resolution)
+            grid[-1] = stop
+            # A rate(t) that returns a constant still yields one rate per time
+            r = np.broadcast_to(np.asarray(rate(grid), dtype=np.float64), grid.shape)
+            grid_phase = np.empty_like(grid)
+            grid_phase[0] = phase
+            np.cumsum((r[1:] + r[:-1]) / 2 * np.diff(grid), out=grid_phase[1:])
+            grid_phase[1:] += phase
+            end_phase = grid_phase[-1]
+        else:
+            end_phase = rate * stop
+
+        # Draw frame thresholds until they pass the end of the window
+        thresholds = []
+        while threshold < end_phase:
+            expected = int((end_phase - threshold) * 1.1) + 16
+            if intervals is None:
+                steps = np.ones(expected)
+            else:
+                steps = intervals(rng, expected)
+
+            cum = threshold + np.concatenate(([0.0], np.cumsum(steps)))
+            inside = cum[cum < end_phase]
+            thresholds.append(inside)
+            threshold = cum[len(inside)]
+
+        if thresholds:
+            k = np.concatenate(thresholds)
+            if callable(rate):
+                frames = np.interp(k, grid_phase, grid)
+            else:
+                frames = k / rate
+            yield frames
+
+        phase = end_phase
+
+
+class FrameIntervalStats:
+    """
+    Streaming summary of frame intervals: count, mean, std, min, max and a
+    fixed-bin histogram, updated chunk by chunk (the interval across chunk
+    boundaries is included). bins defaults to 40 bins of 5 ms up to 0.2 s.
+    """
+
+    def __init__(self, bins=None):
+        if bins is None:
+            bins = np.linspace(0, 0.2, 41)
+        self.bins = np.asarray(bins, dtype=np.float64)
+        self.hist = np.zeros(len(self.bins) - 1, dtype=np.int64)
+        self.frames = 0
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+        self.last = None
+
+    def update(self, frames):
+        if len(frames) == 0:
+            return self
+
+        if self.last is not None:
+            frames_with_prev = np.concatenate(([self.last], frames))
+        else:
+            frames_with_prev = frames
+        self.last = frames[-1]
+        self.frames += len(frames)
+
+        gaps = np.diff(frames_with_prev)
+        if len(gaps) == 0:
+            return self
+
+        # Chan et al. parallel merge of mean / sum of squared deviations
+        n_b = len(gaps)
+        mean_b = gaps.mean()
+        m2_b = ((gaps - mean_b) ** 2).sum()
+        n = self.count + n_b
+        delta = mean_b - self.mean
+        self.mean += delta * n_b / n
+        self.m2 += m2_b + delta**2 * self.count * n_b / n
+        self.count = n
+
+        self.min = min(self.min, gaps.min())
+        self.max = max(self.max, gaps.max())
+        self.hist += np.histogram(gaps, bins=self.bins)[0]
+        return self
+
+    def summary(self):
+        std = np.sqrt(self.m2 / self.count) if self.count else 0.0
+        return {
+            "frames": self.frames,
+            "intervals": self.count,
+            "mean_interval": self.mean,
+            "std_interval": std,
+            "min_interval": self.min if self.count else 0.0,
+            "max_interval": self.max if self.count else 0.0,
+            "mean_rate": 1 / self.mean if self.mean else 0.0,
+            "histogram": self.hist,
+            "bins": self.bins,
+        }
+
+
+def perception_summary(duration, rate=20.0, intervals=None, bins=None, window=60.0, seed=None):
+    """
+    Streaming frame-interval statistics for a perception session of any
+    length, without ever holding all frames in memory.
+    """
+    stats = FrameIntervalStats(bins)
+    for frames in perception_frames(duration, rate, intervals, window, seed=seed):
+        stats.update(frames)
+    return stats.summary()
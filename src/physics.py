@@ -2,14 +2,28 @@ import numpy as np
 
 c = 299_792_458  # speed of light in m/s
 
-def proper_time_array(dt_array, velocity):
+# Columns per block when accumulating into a float32 output
+BLOCK_SAMPLES = 65_536
+
+
+def inverse_gamma(velocity):
+    """
+    d(tau)/dt = sqrt(1 - v^2 / c^2) for scalar or array velocities (m/s).
+    """
+    beta = np.asarray(velocity, dtype=np.float64) / c
+    return np.sqrt(1 - beta * beta)
+
+
+def proper_time_array(dt_array, velocity, gamma=None):
     """
     Compute proper time increments for each dt.
     dt_array: array of time deltas (length N)
     velocity: scalar velocity (m/s)
+    gamma: precomputed inverse_gamma(velocity), to skip recomputing it
     Returns: array of same length as dt_array
     """
-    gamma = np.sqrt(1 - (velocity**2) / c**2)
+    if gamma is None:
+        gamma = inverse_gamma(velocity)
     return dt_array * gamma
 
 def time_dilation_sequence(total_time, velocity, steps=1000):
@@ -20,14 +34,112 @@ def time_dilation_sequence(total_time, velocity, steps=1000):
     # coordinate time (0 to total_time)
     t = np.linspace(0, total_time, steps)
 
-    # compute dt for each step
-    dt = np.diff(t)               # length 999
-    dt = np.insert(dt, 0, dt[0])  # make length 1000
-
-    # compute proper time increments
-    d_tau = proper_time_array(dt, velocity)  # length 1000
+    # dt for each step, first step repeated (no np.insert copy)
+    dt = np.empty_like(t)
+    np.subtract(t[1:], t[:-1], out=dt[1:])
+    dt[0] = dt[1] if steps > 1 else 0.0
 
-    # integrate
-    tau = np.cumsum(d_tau)  # length 1000
+    # compute proper time increments in place, then integrate
+    d_tau = proper_time_array(dt, velocity)
+    tau = np.cumsum(d_tau, out=d_tau)
 
     return t, tau
+
+
+def proper_time_batch(velocities, dt, out=None, dtype=np.float64):
+    """
+    Integrate proper time for many observers in one vectorized pass.
+
+    velocities: (observers, samples) speeds in m/s
+    dt: scalar, (samples,) or (observers, samples) step lengths in seconds
+    out: optional caller-provided (observers, samples) buffer to write into
+    dtype: output dtype when out is None (float32 halves the memory)
+
+    Returns tau with tau[:, i] = proper time elapsed after sample i.
+    A float64 output is computed in place in `out`; a float32 output is
+    accumulated in float64 over column blocks with a carried running sum,
+    so long profiles do not lose precision.
+    """
+    velocities = np.asarray(velocities)
+    if velocities.ndim == 1:
+        velocities = velocities[None, :]
+    observers, samples = velocities.shape
+
+    if out is None:
+        out = np.empty((observers, samples), dtype=dtype)
+
+    dt = np.asarray(dt, dtype=np.float64)
+    inv_c2 = -1.0 / c**2
+
+    if out.dtype == np.float64:
+        np.multiply(velocities, velocities, out=out)
+        out *= inv_c2
+        out += 1
+        np.sqrt(out, out=out)
+        out *= dt
+        np.cumsum(out, axis=1, out=out)
+        return out
+
+    scratch = np.empty((observers, min(samples, BLOCK_SAMPLES)), dtype=np.float64)
+    carry = np.zeros((observers, 1), dtype=np.float64)
+
+    for start in range(0, samples, BLOCK_SAMPLES):
+        stop = min(start + BLOCK_SAMPLES, samples)
+        block = scratch[:, :stop - start]
+        block_dt = dt[..., start:stop] if dt.ndim else dt
+
+        np.multiply(velocities[:, start:stop], velocities[:, start:stop], out=block)
+        block *= inv_c2
+        block += 1
+        np.sqrt(block, out=block)
+        block *= block_dt
+        np.cumsum(block, axis=1, out=block)
+        block += carry
+
+        carry[:, 0] = block[:, -1]
+        out[:, start:stop] = block
+
+    return out
+
+
+def proper_time_piecewise(velocities, durations, times=None, out=None, dtype=np.float64):
+    """
+    Closed-form proper time for piecewise-constant velocity profiles: cost
+    scales with the number of segments, not the number of samples.
+
+    velocities: (observers, segments) constant speed in each segment (m/s)
+    durations: (segments,) or (observers, segments) segment lengths (s)
+    times: optional (samples,) coordinate times to evaluate at, shared by
+        all observers (requires 1-D durations)
+
+    Returns proper time at the end of each segment (observers, segments),
+    or at each requested time (observers, samples) if times is given.
+    """
+    velocities = np.asarray(velocities, dtype=np.float64)
+    if velocities.ndim == 1:
+        velocities = velocities[None, :]
+
+    rate = inverse_gamma(velocities)
+    durations = np.asarray(durations, dtype=np.float64)
+
+    if times is None:
+        if out is None:
+            out = np.empty(rate.shape, dtype=dtype)
+        np.cumsum(rate * durations, axis=1, out=out)
+        return out
+
+    if durations.ndim != 1:
+        raise ValueError("times requires the same segment durations for every observer")
+
+    times = np.asarray(times, dtype=np.float64)
+    ends = np.cumsum(durations)
+    starts = ends - durations
+    tau_at_start = np.cumsum(rate * durations, axis=1) - rate * durations
+
+    # Segment of each time; times past the last segment stay in it
+    seg = np.clip(np.searchsorted(ends, times, side="right"), 0, len(durations) - 1)
+
+    if out is None:
+        out = np.empty((rate.shape[0], len(times)), dtype=dtype)
+    out[...] = tau_at_start[:, seg] + (times - starts[seg]) * rate[:, seg]
+    return out
@@ -1,7 +1,15 @@
 import numpy as np
 import matplotlib.pyplot as plt
 
-def plot_time_dilation(coordinate_time, proper_time, save=False):
+from src.profiling import traced
+from src.worldline import Worldline
+
+@traced("plot/time dilation")
+def plot_time_dilation(coordinate_time, proper_time=None, save=False):
+    # Accepts (t, tau) arrays or a single Worldline
+    if isinstance(coordinate_time, Worldline):
+        coordinate_time, proper_time = coordinate_time.t, coordinate_time.tau
+
     plt.figure(figsize=(8, 6))
 
     # Both arrays should be same length now
@@ -19,6 +27,7 @@ def plot_time_dilation(coordinate_time, proper_time, save=False):
 
     plt.show()
 
+@traced("plot/brain sampling")
 def plot_brain_sampling(real_time, perceived_time):
     plt.figure(figsize=(8, 6))
     plt.plot(real_time, np.zeros_like(real_time), label="Real Time", alpha=0.6)
@@ -31,10 +40,17 @@ def plot_brain_sampling(real_time, perceived_time):
     plt.show()
 
 
-def plot_spacetime_diagram(t, x_stationary, x_moving):
+@traced("plot/spacetime diagram")
+def plot_spacetime_diagram(t, x_stationary, x_moving=None):
+    # Accepts (t, x_stationary, x_moving) arrays or two Worldlines
+    if isinstance(t, Worldline):
+        stationary, moving = t, x_stationary
+    else:
+        stationary, moving = Worldline(t, x_stationary), Worldline(t, x_moving)
+
     plt.figure(figsize=(7, 7))
-    plt.plot(x_stationary, t, label="Stationary Observer", linewidth=2)
-    plt.plot(x_moving, t, label="Moving Observer", linewidth=2)
+    plt.plot(stationary.x, stationary.t, label="Stationary Observer", linewidth=2)
+    plt.plot(moving.x, moving.t, label="Moving Observer", linewidth=2)
 
     plt.xlabel("Space (x)")
     plt.ylabel("ct (time)")
@@ -43,19 +59,35 @@ def plot_spacetime_diagram(t, x_stationary, x_moving):
     plt.grid(True)
     plt.show()
 
-def plot_spacetime_with_ticks(t, x_stationary, x_moving,
-                              ticks_stationary, ticks_moving,
-                              idx_stationary, idx_moving):
+@traced("plot/spacetime ticks")
+def plot_spacetime_with_ticks(t, x_stationary, x_moving=None,
+                              ticks_stationary=None, ticks_moving=None,
+                              idx_stationary=None, idx_moving=None, num_ticks=10):
+    """
+    Either the original arrays (t, x_stationary, x_moving, tick times and
+    tick indices) or two Worldlines: plot_spacetime_with_ticks(stat, mov),
+    whose ticks are interpolated at num_ticks evenly spaced proper times.
+    """
+    if isinstance(t, Worldline):
+        stationary, moving = t, x_stationary
+        tick_stat = stationary.ticks(num_ticks)
+        tick_mov = moving.ticks(num_ticks)
+        tick_x_stat, ticks_stationary = tick_stat["x"], tick_stat["t"]
+        tick_x_mov, ticks_moving = tick_mov["x"], tick_mov["t"]
+    else:
+        stationary, moving = Worldline(t, x_stationary), Worldline(t, x_moving)
+        tick_x_stat, tick_x_mov = x_stationary[idx_stationary], x_moving[idx_moving]
+
     plt.figure(figsize=(8, 8))
 
     # Worldlines
-    plt.plot(x_stationary, t, label="Stationary Observer", linewidth=2)
-    plt.plot(x_moving, t, label="Moving Observer", linewidth=2)
+    plt.plot(stationary.x, stationary.t, label="Stationary Observer", linewidth=2)
+    plt.plot(moving.x, moving.t, label="Moving Observer", linewidth=2)
 
     # Proper time ticks
-    plt.scatter(x_stationary[idx_stationary], ticks_stationary,
+    plt.scatter(tick_x_stat, ticks_stationary,
                 color="blue", s=40, label="Stationary Proper Time Ticks")
-    plt.scatter(x_moving[idx_moving], ticks_moving,
+    plt.scatter(tick_x_mov, ticks_moving,
                 color="red", s=40, label="Moving Proper Time Ticks")
 
     plt.xlabel("Space (x)")
@@ -67,7 +99,12 @@ def plot_spacetime_with_ticks(t, x_stationary, x_moving,
 
 from mpl_toolkits.mplot3d import Axes3D
 
-def plot_3d_worldline(t, x, y):
+@traced("plot/3d worldline")
+def plot_3d_worldline(t, x=None, y=None):
+    # Accepts (t, x, y) arrays or a Worldline
+    if isinstance(t, Worldline):
+        t, x, y = t.t, t.x, t.y
+
     fig = plt.figure(figsize=(8, 8))
     ax = fig.add_subplot(111, projection='3d')
 
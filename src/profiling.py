@@ -0,0 +1,336 @@
+"""
+Per-stage instrumentation for the pipeline scripts and the app.
+
+    from src.profiling import stage, traced
+
+    with stage("generate/process", items=len(df)) as s:
+        ...
+        s.items = rows_written        # optional, set inside the block
+
+    @traced("predict/many", items=len)  # items: int or f(result) -> int
+    def predict_many(...):
+
+Stages nest (names are joined into a path per thread) and each one
+records wall time, CPU time, resident memory, peak resident memory inside
+the stage and an item count with its rate. Only the standard library is
+used, like src/startup.py.
+
+Peak memory is per process, not per thread: the stage peak is only
+tracked while the process runs a single thread (the scripts, forked
+workers). With other threads alive, resetting the peak would corrupt
+their stages, so peak_rss_mb is then None.
+
+Off by default: stage() then returns one shared no-op object and traced
+functions are called straight through, so instrumented code pays a
+single flag check. Tracing is switched on by UNFELT_TIME_TRACE=<path>
+(or --trace on the scripts): every finished stage appends one JSON line
+to path, from any process, since worker processes inherit the variable.
+UNFELT_TIME_PROFILE=<path> (or --profile) additionally runs the script
+under cProfile and dumps pstats to path for snakeviz/pstats.
+"""
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from src.startup import resident_mb
+
+TRACE_ENV = "UNFELT_TIME_TRACE"
+PROFILE_ENV = "UNFELT_TIME_PROFILE"
+PROFILE_DIR = "profiles"
+
+# Most recent records of this process, for in-app display
+RECENT = deque(maxlen=500)
+
+_TRACE_PATH = os.environ.get(TRACE_ENV) or None
+_LOCAL = threading.local()
+_OUT = {"pid": None, "file": None}
+_LOCK = threading.Lock()
+
+
+def enabled():
+    return _TRACE_PATH is not None
+
+
+def configure(trace=None):
+    """
+    Turn tracing on (trace path) for this process and, through the
+    environment, for processes it starts. None leaves the current setting.
+    """
+    global _TRACE_PATH
+    if trace:
+        _TRACE_PATH = trace
+        os.environ[TRACE_ENV] = trace
+
+
+# -------------------------------------------------------------------
+# Peak memory
+# -------------------------------------------------------------------
+
+def _peak_mb():
+    """
+    Peak resident memory in MB since the last _reset_peak (Linux VmHWM),
+    or for the whole process elsewhere.
+    """
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+
+def _single_threaded():
+    return threading.active_count() == 1
+
+
+def _reset_peak():
+    # Linux >= 4.0: writing 5 resets VmHWM to the current RSS, for the
+    # whole process, so callers only do this while single-threaded
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+# -------------------------------------------------------------------
+# Stages
+# -------------------------------------------------------------------
+
+class _NullStage:
+    """
+    What stage() returns while tracing is off.
+    """
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __setattr__(self, name, value):
+        pass
+
+    items = None
+
+
+_NULL = _NullStage()
+
+
+class Stage:
+    def __init__(self, name, items=None, fields=None):
+        self.name = name
+        self.items = items
+        self.fields = fields or {}
+        self.peak = 0.0
+
+    def __enter__(self):
+        stack = _stack()
+        # A stage whose process ever runs other threads gets no peak
+        self.track_peak = _single_threaded() and all(s.track_peak for s in stack)
+        if stack and self.track_peak:
+            # The reset below would lose the enclosing stage's peak so far
+            stack[-1].peak = max(stack[-1].peak, _peak_mb())
+        parent = stack[-1].path if stack else ""
+        if not parent or self.name.startswith(parent + "/"):
+            # Names that already carry the prefix ("generate/block") read the
+            # same whether they run nested or in a worker process
+            self.path = self.name
+        else:
+            self.path = f"{parent}/{self.name}"
+        self.depth = len(stack)
+        stack.append(self)
+
+        if self.track_peak:
+            _reset_peak()
+        self.started_at = time.time()
+        self.cpu = time.process_time()
+        self.wall = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        wall = time.perf_counter() - self.wall
+        cpu = time.process_time() - self.cpu
+        self.track_peak = self.track_peak and _single_threaded()
+        if self.track_peak:
+            self.peak = max(self.peak, _peak_mb())
+
+        stack = _stack()
+        stack.pop()
+        if stack:
+            if self.track_peak:
+                stack[-1].peak = max(stack[-1].peak, self.peak)
+            else:
+                stack[-1].track_peak = False
+
+        record = {
+            "stage": self.path,
+            "depth": self.depth,
+            "pid": os.getpid(),
+            "thread": threading.current_thread().name,
+            "start": self.started_at,
+            "wall_s": wall,
+            "cpu_s": cpu,
+            "rss_mb": resident_mb(),
+            "peak_rss_mb": self.peak if self.track_peak else None,
+            "items": self.items,
+            "items_per_s": self.items / wall if self.items and wall > 0 else None,
+            "error": None if exc_type is None else exc_type.__name__,
+            **self.fields,
+        }
+        _emit(record)
+        return False
+
+
+def _stack():
+    # A forked worker starts with its own empty stack, not a copy of the parent's
+    if getattr(_LOCAL, "pid", None) != os.getpid():
+        _LOCAL.stack = []
+        _LOCAL.pid = os.getpid()
+    return _LOCAL.stack
+
+
+def _emit(record):
+    RECENT.append(record)
+    line = json.dumps(record, default=str) + "\n"
+    with _LOCK:
+        if _OUT["pid"] != os.getpid():
+            # First record of this (possibly forked) process
+            directory = os.path.dirname(_TRACE_PATH)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            _OUT["file"] = open(_TRACE_PATH, "a", buffering=1)
+            _OUT["pid"] = os.getpid()
+        # One append-mode write per line, so processes do not interleave
+        _OUT["file"].write(line)
+
+
+def stage(name, items=None, **fields):
+    """
+    Context manager timing one stage; extra keyword fields are copied into
+    its trace record.
+    """
+    if _TRACE_PATH is None:
+        return _NULL
+    return Stage(name, items, fields)
+
+
+def traced(name=None, items=None):
+    """
+    Decorator form of stage(). items: an int, or a function of the return
+    value giving the item count (e.g. len).
+    """
+    def decorate(fn):
+        label = name or fn.__qualname__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if _TRACE_PATH is None:
+                return fn(*args, **kwargs)
+            with Stage(label) as s:
+                result = fn(*args, **kwargs)
+                s.items = items(result) if callable(items) else items
+            return result
+
+        return wrapper
+
+    return decorate
+
+
+# -------------------------------------------------------------------
+# Script entry points
+# -------------------------------------------------------------------
+
+def add_arguments(parser):
+    parser.add_argument("--trace", nargs="?", const=os.path.join(PROFILE_DIR, "trace.ndjson"),
+                        default=None, metavar="PATH",
+                        help=f"append per-stage NDJSON records to PATH (or ${TRACE_ENV})")
+    parser.add_argument("--profile", nargs="?", const="", default=None, metavar="PATH",
+                        help=f"dump cProfile stats to PATH (or ${PROFILE_ENV}); "
+                             f"default {PROFILE_DIR}/<script>.pstats")
+
+
+@contextmanager
+def session(name, trace=None, profile=None):
+    """
+    Outermost stage of one script run. trace/profile come from --trace and
+    --profile (see add_arguments); the environment variables are used
+    otherwise. With profiling on, the run is wrapped in cProfile and the
+    hottest functions are printed to stderr.
+    """
+    configure(trace)
+    profile = os.environ.get(PROFILE_ENV) if profile is None else profile
+    if profile is not None and profile in ("", "1"):
+        profile = os.path.join(PROFILE_DIR, f"{name}.pstats")
+
+    profiler = None
+    if profile:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+    try:
+        with stage(name):
+            yield
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            import pstats
+            os.makedirs(os.path.dirname(profile) or ".", exist_ok=True)
+            profiler.dump_stats(profile)
+            pstats.Stats(profiler, stream=sys.stderr).sort_stats("cumulative").print_stats(15)
+            print(f"cProfile stats saved to {profile}", file=sys.stderr)
+
+
+def summarize(records):
+    """
+    Aggregate records by stage path: calls, total/mean wall and CPU time,
+    largest peak RSS (None if never tracked) and total items, slowest first.
+    """
+    rows = {}
+    for r in records:
+        row = rows.setdefault(r["stage"], {"stage": r["stage"], "calls": 0, "wall_s": 0.0,
+                                           "cpu_s": 0.0, "peak_rss_mb": None, "items": 0})
+        row["calls"] += 1
+        row["wall_s"] += r["wall_s"]
+        row["cpu_s"] += r["cpu_s"]
+        if r["peak_rss_mb"] is not None:
+            row["peak_rss_mb"] = max(row["peak_rss_mb"] or 0.0, r["peak_rss_mb"])
+        row["items"] += r["items"] or 0
+    for row in rows.values():
+        row["mean_wall_s"] = row["wall_s"] / row["calls"]
+    return sorted(rows.values(), key=lambda row: -row["wall_s"])
+
+
+def read_trace(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def format_summary(rows):
+    width = max([len(row["stage"]) for row in rows] + [20]) + 2
+    lines = [f"{'stage':<{width}}{'calls':>7}{'wall s':>10}{'cpu s':>10}{'peak MB':>10}{'items':>12}"]
+    for row in rows:
+        peak = "-" if row["peak_rss_mb"] is None else f"{row['peak_rss_mb']:.1f}"
+        lines.append(f"{row['stage']:<{width}}{row['calls']:>7}{row['wall_s']:>10.3f}"
+                     f"{row['cpu_s']:>10.3f}{peak:>10}{row['items']:>12,}")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Summarize an NDJSON stage trace.")
+    parser.add_argument("trace", nargs="?", default=os.path.join(PROFILE_DIR, "trace.ndjson"))
+    args = parser.parse_args()
+    print(format_summary(summarize(read_trace(args.trace))))
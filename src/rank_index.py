@@ -0,0 +1,236 @@
+import hashlib
+import os
+
+import numpy as np
+
+VALUE_COLUMN = "microseconds_difference_per_year"
+GROUP_COLUMNS = ("country", "continent_guess")
+
+SUMMARY_FIELDS = ("count", "mean", "std", "min", "p10", "median", "p90", "max")
+
+
+FINGERPRINT_CHUNK = 1_000_000
+
+
+def _is_categorical(labels):
+    # pd.Categorical (or a categorical Series' .array) without importing pandas
+    return hasattr(labels, "categories") and hasattr(labels, "codes")
+
+
+def _codes(labels):
+    if _is_categorical(labels):
+        # Reuse the codes; names are re-sorted so groups can be found by binary search
+        names = np.asarray(labels.categories).astype(str)
+        order = np.argsort(names, kind="stable")
+        remap = np.empty(len(names), dtype=np.int32)
+        remap[order] = np.arange(len(names))
+        return names[order], remap[np.asarray(labels.codes)]
+
+    names, codes = np.unique(np.asarray(labels).astype(str), return_inverse=True)
+    return names, codes.astype(np.int32)
+
+
+def fingerprint(values, groups):
+    h = hashlib.sha1()
+    h.update(np.ascontiguousarray(values, dtype=np.float64).tobytes())
+    for labels in groups.values():
+        if _is_categorical(labels):
+            # Same digest as the joined strings, decoded a chunk at a time
+            names = np.asarray(labels.categories).astype(str)
+            codes = np.asarray(labels.codes)
+            for start in range(0, len(codes), FINGERPRINT_CHUNK):
+                piece = "\x00".join(names[codes[start:start + FINGERPRINT_CHUNK]])
+                h.update((("\x00" if start else "") + piece).encode())
+        else:
+            h.update("\x00".join(np.asarray(labels).astype(str)).encode())
+    return h.hexdigest()
+
+
+class RankIndex:
+    """
+    Sidecar rank index over one value column (microseconds/year):
+      - order: row positions sorted by value (ascending), and each row's
+        place in it, for O(1) global rank and O(log n) percentiles
+      - per group column (country, continent): rows sorted by (group, value)
+        with offsets of each group's block, each row's rank inside its
+        group, and summary statistics per group
+
+    Ranks are 1 = largest value (fastest-aging clock).
+    """
+
+    def __init__(self, arrays):
+        self.arrays = arrays
+        self.values = arrays["values"]
+        self.order = arrays["order"]
+        self.sorted = self.values[self.order]
+        self.place = arrays["place"]
+        self.group_columns = [str(g) for g in arrays["group_columns"]]
+        self.summary = arrays["summary"]
+
+    @classmethod
+    def build(cls, values, groups=None):
+        """
+        values: (n,) array; groups: dict of column name -> (n,) labels, or a
+        pd.Categorical of them (no per-row strings are materialized).
+        """
+        values = np.asarray(values, dtype=np.float64)
+        groups = groups or {}
+        n = len(values)
+
+        order = np.argsort(values, kind="stable")
+        place = np.empty(n, dtype=np.int64)
+        place[order] = np.arange(n)
+
+        arrays = {
+            "values": values,
+            "order": order,
+            "place": place,
+            "group_columns": np.array(list(groups), dtype=str),
+            "summary": cls._stats(values[order]),
+            "fingerprint": np.array(fingerprint(values, groups)),
+        }
+
+        for col, labels in groups.items():
+            names, codes = _codes(labels)
+            group_order = np.lexsort((values, codes))
+            offsets = np.searchsorted(codes[group_order], np.arange(len(names) + 1))
+
+            group_place = np.empty(n, dtype=np.int64)
+            group_place[group_order] = np.arange(n) - offsets[codes[group_order]]
+
+            arrays[f"{col}/names"] = names
+            arrays[f"{col}/codes"] = codes
+            arrays[f"{col}/order"] = group_order
+            arrays[f"{col}/offsets"] = offsets
+            arrays[f"{col}/place"] = group_place
+            arrays[f"{col}/summary"] = np.stack([
+                cls._stats(values[group_order[lo:hi]])
+                for lo, hi in zip(offsets[:-1], offsets[1:])
+            ]) if len(names) else np.empty((0, len(SUMMARY_FIELDS)))
+
+        return cls(arrays)
+
+    @classmethod
+    def from_dataframe(cls, df, value_col=VALUE_COLUMN, group_cols=GROUP_COLUMNS):
+        groups = {col: df[col].to_numpy() for col in group_cols if col in df}
+        return cls.build(df[value_col].to_numpy(), groups)
+
+    @staticmethod
+    def _stats(sorted_values):
+        """
+        Summary statistics of an already sorted block, in SUMMARY_FIELDS order.
+        """
+        if len(sorted_values) == 0:
+            return np.full(len(SUMMARY_FIELDS), np.nan)
+        p10, median, p90 = np.quantile(sorted_values, [0.1, 0.5, 0.9])
+        return np.array([len(sorted_values), sorted_values.mean(), sorted_values.std(),
+                         sorted_values[0], p10, median, p90, sorted_values[-1]])
+
+    def __len__(self):
+        return len(self.values)
+
+    @property
+    def fingerprint(self):
+        return str(self.arrays["fingerprint"])
+
+    # ---------------------------------------------------------------
+    # Queries
+    # ---------------------------------------------------------------
+
+    def percentile(self, value):
+        """
+        Percent of cities with a smaller value, by binary search.
+        """
+        below = np.searchsorted(self.sorted, value, side="left")
+        return 100.0 * below / len(self.sorted)
+
+    def rank(self, position):
+        """
+        Global rank of a row (1 = largest value) and the number of rows.
+        """
+        return len(self.values) - int(self.place[position]), len(self.values)
+
+    def _group(self, col):
+        if col not in self.group_columns:
+            raise KeyError(f"no group index for column {col!r}")
+        return lambda key: self.arrays[f"{col}/{key}"]
+
+    def group_rank(self, position, col="country"):
+        """
+        Rank of a row within its group (1 = largest value), the group size
+        and the group name.
+        """
+        g = self._group(col)
+        code = g("codes")[position]
+        offsets = g("offsets")
+        size = int(offsets[code + 1] - offsets[code])
+        return size - int(g("place")[position]), size, str(g("names")[code])
+
+    def top(self, k=10, group=None, col="country", largest=True):
+        """
+        Row positions of the k largest (or smallest) values, globally or
+        within one group; O(k).
+        """
+        if group is None:
+            block = self.order
+        else:
+            g = self._group(col)
+            names = g("names")
+            code = np.searchsorted(names, group)
+            if code == len(names) or names[code] != group:
+                return np.empty(0, dtype=np.int64)
+            offsets = g("offsets")
+            block = g("order")[offsets[code]:offsets[code + 1]]
+
+        return block[::-1][:k] if largest else block[:k]
+
+    def group_summary(self, group, col="country"):
+        g = self._group(col)
+        names = g("names")
+        code = np.searchsorted(names, group)
+        if code == len(names) or names[code] != group:
+            raise KeyError(group)
+        return dict(zip(SUMMARY_FIELDS, g("summary")[code].tolist()))
+
+    def global_summary(self):
+        return dict(zip(SUMMARY_FIELDS, self.summary.tolist()))
+
+    # ---------------------------------------------------------------
+    # Persistence
+    # ---------------------------------------------------------------
+
+    def save(self, path):
+        np.savez(path, **self.arrays)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            return cls({key: data[key] for key in data.files})
+
+
+def sidecar_path(dataset_path):
+    """
+    Where the rank index of a dataset lives: next to a CSV, or inside an
+    output directory (underscore-prefixed so parquet readers skip it).
+    """
+    if os.path.isdir(dataset_path):
+        return os.path.join(dataset_path, "_rank_index.npz")
+    return os.path.splitext(dataset_path)[0] + ".rank.npz"
+
+
+def load_or_build(df, path, value_col=VALUE_COLUMN, group_cols=GROUP_COLUMNS):
+    """
+    Load a saved index if it was built from the same values and groups,
+    otherwise build it and save it to path.
+    """
+    groups = {col: df[col].to_numpy() for col in group_cols if col in df}
+    values = df[value_col].to_numpy()
+
+    if os.path.exists(path):
+        index = RankIndex.load(path)
+        if index.fingerprint == fingerprint(values, groups):
+            return index
+
+    index = RankIndex.build(values, groups)
+    index.save(path)
+    return index
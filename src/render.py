@@ -0,0 +1,156 @@
+import functools
+import hashlib
+import json
+import os
+import pickle
+
+import numpy as np
+
+from src.profiling import stage
+
+CACHE_DIR = "data/cache/plots"
+STATS = ("count", "mean", "min", "max")
+
+
+def dataset_fingerprint(path):
+    """
+    Cheap dataset hash from the file's path, size and mtime, so cache keys
+    change whenever the file is rewritten without hashing its contents.
+    """
+    st = os.stat(path)
+    key = f"{os.path.abspath(path)}:{st.st_size}:{st.st_mtime_ns}"
+    return hashlib.sha1(key.encode()).hexdigest()
+
+
+def array_fingerprint(*arrays):
+    h = hashlib.blake2b(digest_size=20)
+    for arr in arrays:
+        h.update(np.ascontiguousarray(arr).tobytes())
+    return h.hexdigest()
+
+
+def bin_grid(x, y, values=None, bins=(360, 720), extent=(-180, 180, -90, 90),
+             stat="mean", chunk_size=5_000_000):
+    """
+    Aggregate points into a (rows, cols) grid with NumPy, chunk by chunk so
+    temporaries stay bounded for any point count.
+    extent = (x_min, x_max, y_min, y_max); row 0 is y_max, like an image.
+    stat: count, mean, min or max of values per cell (NaN where empty).
+    """
+    if stat not in STATS:
+        raise ValueError(f"stat must be one of {STATS}")
+
+    rows, cols = bins
+    x_min, x_max, y_min, y_max = extent
+    n_cells = rows * cols
+
+    counts = np.zeros(n_cells, dtype=np.int64)
+    if stat == "mean":
+        acc = np.zeros(n_cells, dtype=np.float64)
+    elif stat == "min":
+        acc = np.full(n_cells, np.inf)
+    elif stat == "max":
+        acc = np.full(n_cells, -np.inf)
+
+    x = np.asarray(x)
+    y = np.asarray(y)
+    if values is not None:
+        values = np.asarray(values)
+
+    for start in range(0, len(x), chunk_size):
+        xs = x[start:start + chunk_size]
+        ys = y[start:start + chunk_size]
+
+        # Closed extent: points on x_max / y_min land in the last cell
+        keep = (xs >= x_min) & (xs <= x_max) & (ys >= y_min) & (ys <= y_max)
+        c = np.minimum(((xs - x_min) / (x_max - x_min) * cols).astype(np.int64), cols - 1)
+        r = np.minimum(((y_max - ys) / (y_max - y_min) * rows).astype(np.int64), rows - 1)
+        cell = (r * cols + c)[keep]
+
+        counts += np.bincount(cell, minlength=n_cells)
+        if stat == "count":
+            continue
+
+        vs = values[start:start + chunk_size][keep].astype(np.float64)
+        if stat == "mean":
+            acc += np.bincount(cell, weights=vs, minlength=n_cells)
+        elif stat == "min":
+            np.minimum.at(acc, cell, vs)
+        else:
+            np.maximum.at(acc, cell, vs)
+
+    if stat == "count":
+        return counts.reshape(rows, cols)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        grid = acc / counts if stat == "mean" else acc
+    grid[counts == 0] = np.nan
+    return grid.reshape(rows, cols)
+
+
+@functools.lru_cache(maxsize=4)
+def load_basemap(shapefile, cache_dir=CACHE_DIR):
+    """
+    Country outlines as a list of (N, 2) lng/lat arrays. Parsed once per
+    process and pickled on disk next to the PNG cache, keyed on the
+    shapefile fingerprint, so later runs skip geopandas entirely.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    path = os.path.join(cache_dir, f"basemap-{dataset_fingerprint(shapefile)}.pkl")
+
+    if os.path.exists(path):
+        with open(path, "rb") as f:
+            return pickle.load(f)
+
+    import geopandas as gpd
+
+    world = gpd.read_file(shapefile)
+    polygons = []
+    for geom in world.geometry:
+        parts = getattr(geom, "geoms", [geom])
+        polygons.extend(np.asarray(p.exterior.coords) for p in parts)
+
+    with open(path, "wb") as f:
+        pickle.dump(polygons, f, protocol=pickle.HIGHEST_PROTOCOL)
+    return polygons
+
+
+def draw_basemap(ax, polygons, color="lightgray", edgecolor="white"):
+    from matplotlib.collections import PolyCollection
+
+    ax.add_collection(PolyCollection(polygons, facecolor=color, edgecolor=edgecolor,
+                                     linewidth=0.5, zorder=0))
+
+
+def cached_png(key, draw, cache_dir=None, dpi=100):
+    """
+    Path of a PNG rendered by draw() -> Figure, cached on disk under a hash
+    of key (a JSON-serializable dict of dataset hash and plot parameters).
+    The figure is closed after saving. cache_dir defaults to CACHE_DIR.
+    """
+    import matplotlib.pyplot as plt
+
+    cache_dir = cache_dir or CACHE_DIR
+    os.makedirs(cache_dir, exist_ok=True)
+    digest = hashlib.sha1(json.dumps(key, sort_keys=True, default=str).encode()).hexdigest()
+    path = os.path.join(cache_dir, f"{digest}.png")
+
+    if not os.path.exists(path):
+        # Only cache misses are traced: a hit is one os.path.exists
+        with stage(f"plot/{key.get('plot', 'png')}"):
+            fig = draw()
+            tmp = path + ".tmp.png"
+            fig.savefig(tmp, dpi=dpi)
+            plt.close(fig)
+            os.replace(tmp, path)
+
+    return path
+
+
+def show_png(path, figsize=(16, 10)):
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots(figsize=figsize)
+    ax.imshow(plt.imread(path))
+    ax.axis("off")
+    plt.show()
@@ -0,0 +1,260 @@
+"""
+Read-only arrays shared by several server processes.
+
+One process publishes a dict of NumPy arrays into a single flat file plus
+a manifest (name -> dtype, shape, offset) in a shared directory, by
+default on /dev/shm so it lives in RAM. Every worker attaches by mapping
+the file read-only: the pages come from the OS page cache and are shared
+by all processes, so another worker costs almost no extra resident memory.
+
+Lifecycle:
+  publish(name, arrays, key)    write a new data generation <name>.<gen>.bin,
+                                then swap <name>.json to point at it
+  attach(name)                  read-only views into the mapped file
+  publish_or_attach(name, key, build)
+                                attach if a store with the same key
+                                exists, otherwise build and publish it
+                                under a file lock (first worker wins)
+  cleanup(name)                 remove the files; processes that are still
+                                attached keep their mapping until they exit
+"""
+import json
+import os
+import time
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: publishing is not serialized between processes
+    fcntl = None
+
+DEFAULT_DIR = "/dev/shm/unfelt_time" if os.path.isdir("/dev/shm") else "data/cache/shared"
+SHARED_DIR = os.environ.get("UNFELT_TIME_SHARED_DIR", DEFAULT_DIR)
+
+ALIGNMENT = 64  # bytes; every array starts on a cache line
+
+
+def _manifest_path(name, directory):
+    return os.path.join(directory or SHARED_DIR, f"{name}.json")
+
+
+def _data_path(name, generation, directory):
+    return os.path.join(directory or SHARED_DIR, f"{name}.{generation}.bin")
+
+
+def _generations(name, directory):
+    directory = directory or SHARED_DIR
+    prefix = f"{name}."
+    return [f for f in os.listdir(directory)
+            if f.startswith(prefix) and f.endswith(".bin") and f[len(prefix):-4].count(".") == 0]
+
+
+def publish(name, arrays, key=None, meta=None, directory=None):
+    """
+    Write arrays (dict of name -> ndarray) as one shared store. key
+    identifies the content (e.g. a source hash) for publish_or_attach;
+    meta is any extra JSON-serializable information. Returns the manifest.
+
+    Every publish writes a new data file (generation) and only then
+    replaces the manifest, so a reader always pairs a manifest with the
+    data it describes. The previous generation is unlinked afterwards;
+    processes that mapped it keep their pages until they exit.
+    """
+    manifest_path = _manifest_path(name, directory)
+    os.makedirs(os.path.dirname(manifest_path), exist_ok=True)
+    previous = read_manifest(name, directory)
+    generation = f"{time.time_ns():x}{os.getpid():x}"
+    data_path = _data_path(name, generation, directory)
+
+    entries = {}
+    offset = 0
+    tmp_data = f"{data_path}.{os.getpid()}.tmp"
+    with open(tmp_data, "wb") as f:
+        for array_name, arr in arrays.items():
+            arr = np.ascontiguousarray(arr)
+            if arr.dtype.hasobject:
+                raise TypeError(f"{array_name}: object arrays cannot be shared")
+
+            offset = -(-offset // ALIGNMENT) * ALIGNMENT
+            f.seek(offset)
+            f.write(arr.tobytes())
+            entries[array_name] = {"dtype": arr.dtype.str, "shape": list(arr.shape),
+                                   "offset": offset}
+            offset += arr.nbytes
+        f.truncate(max(offset, 1))
+
+    manifest = {"key": key, "meta": meta or {}, "generation": generation,
+                "size": max(offset, 1), "arrays": entries}
+
+    # Data first, then the manifest that points at it: readers never see a
+    # manifest for a half-written file or for another generation's data
+    os.replace(tmp_data, data_path)
+    tmp_manifest = f"{manifest_path}.{os.getpid()}.tmp"
+    with open(tmp_manifest, "w") as f:
+        json.dump(manifest, f)
+    os.replace(tmp_manifest, manifest_path)
+
+    if previous is not None and previous.get("generation") != generation:
+        _remove(_data_path(name, previous.get("generation"), directory))
+    return manifest
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def read_manifest(name, directory=None):
+    try:
+        with open(_manifest_path(name, directory)) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    # Manifests from before generations point at no data file: republish
+    return manifest if "generation" in manifest else None
+
+
+def attach(name, directory=None):
+    """
+    (arrays, meta) of a published store; every array is a read-only view
+    into one shared mapping. Raises FileNotFoundError if nothing is
+    published under name.
+    """
+    for attempt in range(3):
+        manifest = read_manifest(name, directory)
+        if manifest is None:
+            raise FileNotFoundError(f"no shared store named {name!r}")
+        try:
+            buf = np.memmap(_data_path(name, manifest["generation"], directory),
+                            dtype=np.uint8, mode="r", shape=(manifest["size"],))
+            break
+        except FileNotFoundError:
+            # Republished between reading the manifest and mapping its data
+            if attempt == 2:
+                raise
+
+    arrays = {}
+    for array_name, entry in manifest["arrays"].items():
+        dtype = np.dtype(entry["dtype"])
+        count = int(np.prod(entry["shape"], dtype=np.int64))
+        start = entry["offset"]
+        view = buf[start:start + count * dtype.itemsize].view(dtype)
+        arrays[array_name] = view.reshape(entry["shape"])
+    return arrays, manifest["meta"]
+
+
+def publish_or_attach(name, key, build, directory=None):
+    """
+    Attach to the store if it was published with the same key; otherwise
+    call build() -> (arrays, meta), publish and attach. A lock file makes
+    concurrent workers build only once.
+    """
+    manifest = read_manifest(name, directory)
+    if manifest is not None and manifest["key"] == key:
+        return attach(name, directory)
+
+    manifest_path = _manifest_path(name, directory)
+    os.makedirs(os.path.dirname(manifest_path), exist_ok=True)
+    with open(f"{manifest_path}.lock", "w") as lock:
+        if fcntl is not None:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            manifest = read_manifest(name, directory)
+            if manifest is None or manifest["key"] != key:
+                arrays, meta = build()
+                publish(name, arrays, key, meta, directory)
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    return attach(name, directory)
+
+
+def cleanup(name, directory=None):
+    """
+    Remove a published store. Mappings in running processes stay valid.
+    """
+    manifest_path = _manifest_path(name, directory)
+    _remove(manifest_path)
+    if os.path.isdir(os.path.dirname(manifest_path)):
+        for data_file in _generations(name, directory):
+            _remove(os.path.join(os.path.dirname(manifest_path), data_file))
+    _remove(f"{manifest_path}.lock")
+
+
+# -------------------------------------------------------------------
+# DataFrames and models
+# -------------------------------------------------------------------
+
+def frame_to_arrays(df):
+    """
+    Split a DataFrame into shareable arrays: numeric columns as-is,
+    categorical/text columns as int32 codes with their categories in meta.
+    """
+    import pandas as pd
+
+    arrays, categories = {}, {}
+    for col in df.columns:
+        series = df[col]
+        if isinstance(series.dtype, pd.CategoricalDtype) or not pd.api.types.is_numeric_dtype(series):
+            cat = pd.Categorical(series)
+            arrays[col] = cat.codes.astype(np.int32)
+            categories[col] = [str(c) for c in cat.categories]
+        else:
+            arrays[col] = series.to_numpy()
+    return arrays, {"columns": list(df.columns), "categories": categories}
+
+
+def arrays_to_frame(arrays, meta):
+    """
+    DataFrame over attached arrays without copying the numeric columns.
+    """
+    import pandas as pd
+
+    data = {}
+    for col in meta["columns"]:
+        if col in meta["categories"]:
+            data[col] = pd.Categorical.from_codes(arrays[col], categories=meta["categories"][col])
+        else:
+            data[col] = pd.Series(arrays[col], copy=False)
+    return pd.DataFrame(data, copy=False)
+
+
+def model_to_arrays(model):
+    """
+    Shareable arrays for a src.nn_engine.NumpyMLP.
+    """
+    arrays = {}
+    for i, (w, b) in enumerate(zip(model.weights, model.biases)):
+        arrays[f"W{i}"] = w
+        arrays[f"b{i}"] = b
+    return arrays, {"activations": model.activation_names, "dtype": model.dtype.str}
+
+
+def list_stores(directory=None):
+    directory = directory or SHARED_DIR
+    if not os.path.isdir(directory):
+        return []
+    return sorted(f[:-5] for f in os.listdir(directory) if f.endswith(".json"))
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Inspect or remove shared stores.")
+    parser.add_argument("--dir", default=None, help=f"shared directory (default {SHARED_DIR})")
+    parser.add_argument("--cleanup", nargs="*", metavar="NAME",
+                        help="remove the named stores (all if no names given)")
+    args = parser.parse_args()
+
+    if args.cleanup is not None:
+        for name in args.cleanup or list_stores(args.dir):
+            cleanup(name, args.dir)
+            print(f"removed {name}")
+    else:
+        for name in list_stores(args.dir):
+            manifest = read_manifest(name, args.dir)
+            print(f"{name}: {len(manifest['arrays'])} arrays, {manifest['size'] / 2**20:.1f} MB")
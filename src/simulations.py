@@ -1,7 +1,11 @@
 import numpy as np
 import matplotlib.pyplot as plt
 from src.physics import time_dilation_sequence
+from src.perception import perception_frames
+from src.profiling import traced
+from src.worldline import Worldline
 
+@traced("simulation/time dilation")
 def simulation_time_dilation(total_time=10, velocity=0.8 * 299_792_458):
     """
     total_time: seconds
@@ -14,18 +18,27 @@ def simulation_time_dilation(total_time=10, velocity=0.8 * 299_792_458):
         "proper_time": tau
     }
 
-def simulation_brain_sampling(total_time=2.0, real_fps=1000, brain_fps=20):
+@traced("simulation/brain sampling")
+def simulation_brain_sampling(total_time=2.0, real_fps=1000, brain_fps=20, intervals=None,
+                              seed=None):
+    """
+    brain_fps may be a constant or a callable rate(t); intervals optionally
+    jitters the frames (see src.perception.perception_frames). For long
+    sessions use perception_frames / perception_summary directly instead of
+    materializing both arrays.
+    """
     real_time = np.linspace(0, total_time, int(real_fps * total_time))
 
     # brain perceives discrete frames
-    brain_interval = 1.0 / brain_fps
-    perceived_time = np.arange(0, total_time, brain_interval)
+    chunks = list(perception_frames(total_time, brain_fps, intervals, seed=seed))
+    perceived_time = np.concatenate(chunks) if chunks else np.empty(0)
 
     return {
         "real_time": real_time,
         "perceived_time": perceived_time
     }
 
+@traced("simulation/spacetime")
 def simulation_spacetime(total_time=10, velocity=0.8):
     """
     Simulate spacetime worldlines for a stationary and moving observer.
@@ -53,24 +66,45 @@ def simulation_spacetime(total_time=10, velocity=0.8):
 def spacetime_ticks(t, proper_time, num_ticks=10):
     """
     Generate tick marks for proper time along each worldline.
+    Nearest sample to each tick via np.searchsorted on the monotonic
+    proper time: O(K log N) instead of a full scan per tick.
     """
     max_proper = proper_time[-1]
     tick_values = np.linspace(0, max_proper, num_ticks)
 
-    tick_indices = [np.abs(proper_time - tv).argmin() for tv in tick_values]
+    right = np.clip(np.searchsorted(proper_time, tick_values), 1, len(proper_time) - 1)
+    left = right - 1
+    nearer_left = (tick_values - proper_time[left]) <= (proper_time[right] - tick_values)
+    tick_indices = np.where(nearer_left, left, right)
     tick_times = t[tick_indices]
 
     return tick_times, tick_indices
 
-def simulation_3d_worldline(total_time=5, velocity=0.5):
+def spacetime_worldlines(total_time=10, velocity=0.8, steps=500):
+    """
+    Stationary and moving observers of simulation_spacetime as Worldline
+    objects (c = 1).
+    """
+    t = np.linspace(0, total_time, steps)
+    return Worldline.inertial(t, 0.0), Worldline.inertial(t, velocity)
+
+@traced("simulation/3d worldline")
+def simulation_3d_worldline(total_time=5, velocity=0.5, steps=500):
     """
     Generate a 3D spacetime worldline:
     x(t), y(t)=0, t
     """
-    t = np.linspace(0, total_time, 500)
+    t = np.linspace(0, total_time, steps)
 
     # spatial motion
     x = velocity * t
     y = np.zeros_like(t)
 
     return {"t": t, "x": x, "y": y}
+
+def worldline_3d(total_time=5, velocity=0.5, steps=500):
+    """
+    simulation_3d_worldline as a Worldline object.
+    """
+    result = simulation_3d_worldline(total_time, velocity, steps)
+    return Worldline(result["t"], result["x"], result["y"])
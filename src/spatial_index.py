@@ -0,0 +1,156 @@
+import hashlib
+import os
+import pickle
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0
+VALUE_COLUMN = "microseconds_difference_per_year"
+
+
+def lat_lng_to_xyz(lat, lng):
+    """
+    (N, 3) unit-sphere coordinates for lat/lng arrays in degrees.
+    """
+    lat = np.radians(np.asarray(lat, dtype=np.float64))
+    lng = np.radians(np.asarray(lng, dtype=np.float64))
+    cos_lat = np.cos(lat)
+    return np.stack([cos_lat * np.cos(lng), cos_lat * np.sin(lng), np.sin(lat)], axis=-1)
+
+
+def chord_to_km(chord):
+    # Straight-line distance on the unit sphere -> great-circle distance
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.clip(chord / 2, 0, 1))
+
+
+def km_to_chord(km):
+    return 2 * np.sin(np.asarray(km, dtype=np.float64) / (2 * EARTH_RADIUS_KM))
+
+
+def fingerprint(lat, lng, values):
+    h = hashlib.sha1()
+    for arr in (lat, lng, values):
+        h.update(np.ascontiguousarray(arr, dtype=np.float64).tobytes())
+    return h.hexdigest()
+
+
+class CitySpatialIndex:
+    """
+    KD-tree on unit-sphere 3D coordinates of the cities. Chord distance is
+    monotonic in great-circle distance, so Euclidean k-NN and radius queries
+    on the sphere are exact. All queries take arrays and run on all cores.
+    """
+
+    def __init__(self, lat, lng, values):
+        self.lat = np.asarray(lat, dtype=np.float64)
+        self.lng = np.asarray(lng, dtype=np.float64)
+        self.values = np.asarray(values, dtype=np.float64)
+
+        self.xyz = lat_lng_to_xyz(self.lat, self.lng)
+        self._build_tree()
+        self.fingerprint = fingerprint(self.lat, self.lng, self.values)
+
+    def _build_tree(self):
+        # Imported here so modules that only need the helpers above do not
+        # pay for scipy at import time
+        from scipy.spatial import cKDTree
+        self.tree = cKDTree(self.xyz, copy_data=False)
+
+    @property
+    def arrays(self):
+        return {"lat": self.lat, "lng": self.lng, "values": self.values, "xyz": self.xyz}
+
+    @classmethod
+    def from_arrays(cls, arrays, digest=None):
+        """
+        Index over the arrays of another one (e.g. attached from a shared
+        store). The coordinates are used in place; only the tree's own
+        node and index arrays (a few bytes per city) are built per process.
+        """
+        index = cls.__new__(cls)
+        index.lat, index.lng = arrays["lat"], arrays["lng"]
+        index.values, index.xyz = arrays["values"], arrays["xyz"]
+        index._build_tree()
+        index.fingerprint = digest
+        return index
+
+    @classmethod
+    def from_dataframe(cls, df, value_col=VALUE_COLUMN):
+        return cls(df["lat"].to_numpy(), df["lng"].to_numpy(), df[value_col].to_numpy())
+
+    def query(self, lat, lng, k=5, workers=-1):
+        """
+        k nearest cities for each query point.
+        Returns (distance_km, row positions, values), each shaped (N, k),
+        with k capped at the number of cities.
+        """
+        # cKDTree pads missing neighbours with index n, which would fall off
+        # self.values
+        k = min(k, len(self.values))
+        # A list of ranks keeps the (N, k) shape even for k == 1
+        xyz = np.atleast_2d(lat_lng_to_xyz(lat, lng))
+        chord, idx = self.tree.query(xyz, k=list(range(1, k + 1)), workers=workers)
+        return chord_to_km(chord), idx, self.values[idx]
+
+    def query_radius(self, lat, lng, radius_km, workers=-1):
+        """
+        Row positions of every city within radius_km of each query point
+        (a list of arrays, one per point).
+        """
+        xyz = np.atleast_2d(lat_lng_to_xyz(lat, lng))
+        hits = self.tree.query_ball_point(xyz, km_to_chord(radius_km), workers=workers)
+        return [np.asarray(h, dtype=np.int64) for h in hits]
+
+    def interpolate(self, lat, lng, k=8, power=2.0, workers=-1):
+        """
+        Inverse-distance-weighted microseconds/year at arbitrary points from
+        their k nearest cities. A query on top of a city returns its value.
+        """
+        dist, _, values = self.query(lat, lng, k=k, workers=workers)
+
+        with np.errstate(divide="ignore"):
+            weights = 1.0 / dist**power
+
+        exact = np.isinf(weights)
+        hit = exact.any(axis=1)
+        weights[hit] = exact[hit]
+
+        return (weights * values).sum(axis=1) / weights.sum(axis=1)
+
+    def save(self, path):
+        with open(path, "wb") as f:
+            pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def load(path):
+        with open(path, "rb") as f:
+            return pickle.load(f)
+
+
+def load_or_build(df, path, value_col=VALUE_COLUMN):
+    """
+    Load a saved index if it was built from the same coordinates and values,
+    otherwise build it and save it to path.
+    """
+    lat, lng, values = df["lat"].to_numpy(), df["lng"].to_numpy(), df[value_col].to_numpy()
+
+    if os.path.exists(path):
+        index = CitySpatialIndex.load(path)
+        # Pickles from before the coordinates were kept are rebuilt
+        if index.fingerprint == fingerprint(lat, lng, values) and hasattr(index, "xyz"):
+            return index
+
+    index = CitySpatialIndex(lat, lng, values)
+    index.save(path)
+    return index
+
+
+def nearest_cities(df, lat, lng, k=5, index=None):
+    """
+    DataFrame of the k cities nearest to one point, with distance_km.
+    """
+    index = index or CitySpatialIndex.from_dataframe(df)
+    dist, idx, _ = index.query([lat], [lng], k=k)
+    out = df.iloc[idx[0]].copy()
+    out["distance_km"] = dist[0]
+    return out
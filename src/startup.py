@@ -0,0 +1,66 @@
+"""
+Per-phase startup timing for the app: wall time and resident memory after
+each phase (imports, dataset load, index builds). Only the standard
+library is imported here so it can wrap the app's own imports.
+"""
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+
+def resident_mb():
+    """
+    Current resident set size in MB (Linux /proc; peak RSS elsewhere).
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError, AttributeError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+
+class StartupProfile:
+    """
+    Collects (phase, seconds, rss_mb) rows:
+
+        profile = StartupProfile()
+        with profile.phase("import numpy"):
+            import numpy
+    """
+
+    # Set once the cold-start report of this process has been printed
+    printed = False
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.rows = []
+
+    @contextmanager
+    def phase(self, name):
+        # Also a trace stage when src.profiling tracing is on
+        from src.profiling import stage
+
+        start = time.perf_counter()
+        try:
+            with stage(f"startup/{name}"):
+                yield
+        finally:
+            self.rows.append({
+                "phase": name,
+                "seconds": time.perf_counter() - start,
+                "rss_mb": resident_mb(),
+            })
+
+    def total(self):
+        return time.perf_counter() - self.started
+
+    def format(self):
+        lines = [f"{'phase':<28}{'seconds':>10}{'rss MB':>10}"]
+        for row in self.rows:
+            lines.append(f"{row['phase']:<28}{row['seconds']:>10.3f}{row['rss_mb']:>10.1f}")
+        lines.append(f"{'total':<28}{self.total():>10.3f}{resident_mb():>10.1f}")
+        return "\n".join(lines)
@@ -0,0 +1,371 @@
+"""
+Proper time along time-stamped trajectories around the Earth: flights
+between cities, GPS/ISS-like orbits, balloon ascents and tabulated paths.
+
+Clock rates are taken in the Earth-centred inertial frame with the same
+weak-field model as src/dilation.py:
+
+    d(tau)/dt = sqrt(1 - 2GM / (r c^2) - v^2 / c^2)
+
+where r is the distance from the Earth's centre and v the inertial speed
+(including the Earth's rotation for anything moving with the ground).
+The integrand is handled as d(tau)/dt - 1 so month-long sums keep their
+sub-nanosecond digits.
+
+Every trajectory class is a batch: parameters are arrays of length n and
+state(t, member) evaluates any mix of members and times in one vectorized
+call. integrate_proper_time() runs adaptive Simpson quadrature over all
+members at once, splitting only the intervals whose error estimate is too
+large, so smooth stretches (cruise, circular orbits) take very few steps.
+"""
+from abc import ABC, abstractmethod
+
+import numpy as np
+
+from src.dilation import G, M, R, c, omega
+
+GM = G * M
+
+# Reference clock: sea level on the equator, as in src/dilation.py
+_EPS_REF = 2 * GM / (R * c**2) + (omega * R / c) ** 2
+REFERENCE_RATE_OFFSET = -_EPS_REF / (1 + np.sqrt(1 - _EPS_REF))
+
+TOLERANCE = 1e-9         # seconds of proper time, per trajectory
+MAX_STEP = 3_600.0       # seconds; initial intervals are at most this long
+MIN_STEP = 1e-3          # seconds; intervals are never split below this
+DIFF_STEP = 0.5          # seconds, for numerical velocities
+
+
+def rate_offset(r, v2):
+    """
+    d(tau)/dt - 1 for distance r from the Earth's centre (m) and inertial
+    speed squared v2 (m^2/s^2), without cancellation.
+    """
+    eps = 2 * GM / (r * c**2) + v2 / c**2
+    return -eps / (1 + np.sqrt(1 - eps))
+
+
+def geodetic_to_eci(lat_deg, lng_deg, altitude_m, t):
+    """
+    Inertial position (..., 3) of a point fixed to the rotating Earth
+    (spherical, radius R) at time t, with the frames aligned at t = 0.
+    """
+    lat = np.radians(lat_deg)
+    lon = np.radians(lng_deg) + omega * np.asarray(t, dtype=np.float64)
+    r = R + np.asarray(altitude_m, dtype=np.float64)
+    return np.stack([r * np.cos(lat) * np.cos(lon),
+                     r * np.cos(lat) * np.sin(lon),
+                     r * np.sin(lat)], axis=-1)
+
+
+class Trajectory(ABC):
+    """
+    Base class for a batch of n trajectories. Subclasses set self.duration
+    (n,) and implement position(t, member) returning inertial positions
+    (..., 3); those with a closed form for r and v also override state().
+    """
+
+    duration = None
+
+    def __len__(self):
+        return len(self.duration)
+
+    @abstractmethod
+    def position(self, t, member):
+        """
+        Inertial positions (..., 3) in metres for each (t, member) pair.
+        """
+
+    def breakpoints(self):
+        """
+        (member, t) arrays of times where the path has kinks (end of climb,
+        balloon burst, tabulated fixes); intervals never straddle them.
+        """
+        return np.empty(0, dtype=np.int64), np.empty(0)
+
+    def state(self, t, member):
+        """
+        (r, v^2) for each (t, member) pair; velocities by central
+        differences of position() unless a subclass knows them exactly.
+        """
+        pos = self.position(t, member)
+        h = DIFF_STEP
+        vel = (self.position(t + h, member) - self.position(t - h, member)) / (2 * h)
+        return np.linalg.norm(pos, axis=-1), np.einsum("...i,...i->...", vel, vel)
+
+    def rate_offset(self, t, member):
+        return rate_offset(*self.state(t, member))
+
+
+def _broadcast(*arrays):
+    return [np.atleast_1d(np.asarray(a, dtype=np.float64)) for a in np.broadcast_arrays(*arrays)]
+
+
+class KeplerOrbit(Trajectory):
+    """
+    Keplerian orbits with semi-major axis a (m) and eccentricity e, starting
+    at mean anomaly m0 (rad). r and v come from Kepler's equation and the
+    vis-viva equation, so no differencing is needed.
+    """
+
+    def __init__(self, semi_major_m, eccentricity=0.0, duration=86_400.0, m0=0.0):
+        self.a, self.e, self.duration, self.m0 = _broadcast(semi_major_m, eccentricity,
+                                                            duration, m0)
+        self.mean_motion = np.sqrt(GM / self.a**3)
+
+    @classmethod
+    def gps(cls, duration=86_400.0, eccentricity=0.01, m0=0.0):
+        return cls(26_560_000.0, eccentricity, duration, m0)
+
+    @classmethod
+    def iss(cls, duration=86_400.0, eccentricity=0.0005, m0=0.0):
+        return cls(R + 420_000.0, eccentricity, duration, m0)
+
+    def eccentric_anomaly(self, t, member):
+        e = self.e[member]
+        mean = self.m0[member] + self.mean_motion[member] * t
+
+        # Newton iterations on E - e sin E = M (converges fast for e < 0.9)
+        ecc = mean + e * np.sin(mean)
+        for _ in range(8):
+            ecc -= (ecc - e * np.sin(ecc) - mean) / (1 - e * np.cos(ecc))
+        return ecc
+
+    def position(self, t, member):
+        # Orbits are placed in the equatorial plane with perigee on the x
+        # axis; the clock rate does not depend on the orientation
+        a, e = self.a[member], self.e[member]
+        ecc = self.eccentric_anomaly(t, member)
+        x = a * (np.cos(ecc) - e)
+        y = a * np.sqrt(1 - e**2) * np.sin(ecc)
+        return np.stack([x, y, np.zeros_like(x)], axis=-1)
+
+    def state(self, t, member):
+        a, e = self.a[member], self.e[member]
+        r = a * (1 - e * np.cos(self.eccentric_anomaly(t, member)))
+        return r, GM * (2 / r - 1 / a)
+
+
+class BalloonAscent(Trajectory):
+    """
+    Weather balloons launched from (lat, lng): rise at ascent_rate to
+    burst_altitude, fall back at descent_rate, then sit on the ground until
+    duration. Horizontal drift is ignored; the ground's rotation is not.
+    """
+
+    def __init__(self, lat, lng, ascent_rate=5.0, burst_altitude=30_000.0,
+                 descent_rate=8.0, duration=None):
+        (self.lat, self.lng, self.ascent_rate, self.burst_altitude,
+         self.descent_rate) = _broadcast(lat, lng, ascent_rate, burst_altitude, descent_rate)
+        self.t_burst = self.burst_altitude / self.ascent_rate
+        self.t_land = self.t_burst + self.burst_altitude / self.descent_rate
+        self.duration = self.t_land if duration is None else _broadcast(duration, self.lat)[0]
+
+    def breakpoints(self):
+        member = np.arange(len(self))
+        return np.concatenate([member, member]), np.concatenate([self.t_burst, self.t_land])
+
+    def altitude(self, t, member):
+        up = self.ascent_rate[member] * t
+        down = self.descent_rate[member] * (self.t_land[member] - t)
+        return np.clip(np.minimum(up, down), 0, None)
+
+    def position(self, t, member):
+        return geodetic_to_eci(self.lat[member], self.lng[member], self.altitude(t, member), t)
+
+    def state(self, t, member):
+        h = self.altitude(t, member)
+        rising = t < self.t_burst[member]
+        landed = t >= self.t_land[member]
+        vz = np.where(rising, self.ascent_rate[member], self.descent_rate[member])
+        vz = np.where(landed, 0.0, vz)
+
+        r = R + h
+        v_rot = omega * r * np.cos(np.radians(self.lat[member]))
+        return r, v_rot**2 + vz**2
+
+
+class GreatCircleFlight(Trajectory):
+    """
+    Flights along the great circle between two points at a constant ground
+    speed, climbing and descending at climb_rate to cruise_altitude.
+    """
+
+    def __init__(self, lat1, lng1, lat2, lng2, ground_speed=250.0,
+                 cruise_altitude=11_000.0, climb_rate=10.0):
+        (lat1, lng1, lat2, lng2, self.ground_speed, self.cruise_altitude,
+         self.climb_rate) = _broadcast(lat1, lng1, lat2, lng2, ground_speed,
+                                       cruise_altitude, climb_rate)
+        self.start = geodetic_to_eci(lat1, lng1, 0.0, 0.0) / R
+        self.end = geodetic_to_eci(lat2, lng2, 0.0, 0.0) / R
+
+        cos_angle = np.clip(np.einsum("ij,ij->i", self.start, self.end), -1, 1)
+        self.angle = np.arccos(cos_angle)
+        self.duration = R * self.angle / self.ground_speed
+
+    @classmethod
+    def between_cities(cls, df, pairs, **kwargs):
+        """
+        Flights between named cities of the dataset, e.g.
+        pairs=[("Tokyo", "Sydney"), ("London", "New York")].
+        """
+        first = df.drop_duplicates("city").set_index("city")
+        a = first.loc[[p[0] for p in pairs]]
+        b = first.loc[[p[1] for p in pairs]]
+        return cls(a["lat"].to_numpy(), a["lng"].to_numpy(),
+                   b["lat"].to_numpy(), b["lng"].to_numpy(), **kwargs)
+
+    def breakpoints(self):
+        member = np.arange(len(self))
+        t_top = np.minimum(self.cruise_altitude / self.climb_rate, self.duration / 2)
+        return np.concatenate([member, member]), np.concatenate([t_top, self.duration - t_top])
+
+    def altitude(self, t, member):
+        climb = self.climb_rate[member]
+        h = np.minimum(climb * t, climb * (self.duration[member] - t))
+        return np.clip(h, 0, self.cruise_altitude[member])
+
+    def position(self, t, member):
+        t = np.asarray(t, dtype=np.float64)
+        s = np.clip(t / self.duration[member], 0, 1)[..., None]
+        angle = self.angle[member][..., None]
+
+        # Spherical linear interpolation in the Earth-fixed frame
+        with np.errstate(invalid="ignore", divide="ignore"):
+            w0 = np.sin((1 - s) * angle) / np.sin(angle)
+            w1 = np.sin(s * angle) / np.sin(angle)
+        w0 = np.where(angle > 0, w0, 1.0)
+        w1 = np.where(angle > 0, w1, 0.0)
+        unit = w0 * self.start[member] + w1 * self.end[member]
+
+        # Rotate with the Earth into the inertial frame
+        theta = omega * t
+        cos_t, sin_t = np.cos(theta), np.sin(theta)
+        x = cos_t * unit[..., 0] - sin_t * unit[..., 1]
+        y = sin_t * unit[..., 0] + cos_t * unit[..., 1]
+        r = R + self.altitude(t, member)
+        return np.stack([x, y, unit[..., 2]], axis=-1) * r[..., None]
+
+
+class TabulatedPath(Trajectory):
+    """
+    One arbitrary time-stamped path (times in seconds from 0, lat/lng in
+    degrees, altitude in metres), linearly interpolated between fixes.
+    """
+
+    def __init__(self, times, lat, lng, altitude):
+        self.times = np.asarray(times, dtype=np.float64) - times[0]
+        self.fixes = geodetic_to_eci(lat, lng, altitude, 0.0)
+        self.duration = np.array([self.times[-1]])
+
+    def breakpoints(self):
+        return np.zeros(len(self.times), dtype=np.int64), self.times
+
+    def position(self, t, member):
+        t = np.asarray(t, dtype=np.float64)
+        fixed = np.stack([np.interp(t, self.times, self.fixes[:, k]) for k in range(3)], axis=-1)
+        theta = omega * t
+        cos_t, sin_t = np.cos(theta), np.sin(theta)
+        return np.stack([cos_t * fixed[..., 0] - sin_t * fixed[..., 1],
+                         sin_t * fixed[..., 0] + cos_t * fixed[..., 1],
+                         fixed[..., 2]], axis=-1)
+
+
+def integrate_proper_time(trajectory, tol=TOLERANCE, max_step=MAX_STEP, min_step=MIN_STEP,
+                          return_path=False):
+    """
+    Adaptive Simpson integration of d(tau)/dt - 1 for every member of a
+    trajectory batch. Each wave evaluates all still-open intervals in one
+    vectorized call; an interval is accepted when its Richardson error
+    estimate is below tol scaled by its share of the trajectory's duration,
+    so the total error per trajectory stays within ~tol seconds.
+
+    Returns a dict of arrays over members:
+        duration, proper_time_offset (tau - t, s),
+        gain_vs_reference_us (vs. a sea-level equator clock),
+        error_estimate (s), evaluations
+    and, with return_path, per-member (t, cumulative offset) arrays.
+    """
+    duration = np.asarray(trajectory.duration, dtype=np.float64)
+    n = len(duration)
+
+    # Initial nodes: an even grid of at most max_step plus the kinks
+    pieces = np.maximum(np.ceil(duration / max_step), 1).astype(np.int64)
+    node_member = np.repeat(np.arange(n), pieces + 1)
+    k = np.arange(len(node_member)) - np.repeat(np.cumsum(pieces + 1) - pieces - 1, pieces + 1)
+    node_t = duration[node_member] * k / pieces[node_member]
+
+    kink_member, kink_t = trajectory.breakpoints()
+    inside = (kink_t > 0) & (kink_t < duration[kink_member])
+    node_member = np.concatenate([node_member, kink_member[inside]])
+    node_t = np.concatenate([node_t, kink_t[inside]])
+    order = np.lexsort((node_t, node_member))
+    node_member, node_t = node_member[order], node_t[order]
+
+    same = (node_member[1:] == node_member[:-1]) & (node_t[1:] > node_t[:-1])
+    member = node_member[:-1][same]
+    a = node_t[:-1][same]
+    b = node_t[1:][same]
+    m = (a + b) / 2
+
+    fa = trajectory.rate_offset(a, member)
+    fm = trajectory.rate_offset(m, member)
+    fb = trajectory.rate_offset(b, member)
+    evaluations = np.bincount(member, minlength=n) * 3
+
+    total = np.zeros(n)
+    error = np.zeros(n)
+    accepted = []
+
+    while len(member):
+        lm = (a + m) / 2
+        rm = (m + b) / 2
+        flm = trajectory.rate_offset(lm, member)
+        frm = trajectory.rate_offset(rm, member)
+        evaluations += np.bincount(member, minlength=n) * 2
+
+        width = b - a
+        coarse = width / 6 * (fa + 4 * fm + fb)
+        fine = width / 12 * (fa + 4 * flm + 2 * fm + 4 * frm + fb)
+        err = np.abs(fine - coarse) / 15
+
+        done = (err <= tol * width / duration[member]) | (width <= min_step)
+        value = fine + (fine - coarse) / 15
+
+        total += np.bincount(member[done], weights=value[done], minlength=n)
+        error += np.bincount(member[done], weights=err[done], minlength=n)
+        if return_path:
+            accepted.append((member[done], b[done], value[done]))
+
+        # Split the rest into halves, reusing the evaluated points
+        split = ~done
+        member = np.concatenate([member[split], member[split]])
+        a, m, b, fa, fm, fb = (
+            np.concatenate([a[split], m[split]]),
+            np.concatenate([lm[split], rm[split]]),
+            np.concatenate([m[split], b[split]]),
+            np.concatenate([fa[split], fm[split]]),
+            np.concatenate([flm[split], frm[split]]),
+            np.concatenate([fm[split], fb[split]]),
+        )
+
+    result = {
+        "duration": duration,
+        "proper_time_offset": total,
+        "gain_vs_reference_us": (total - REFERENCE_RATE_OFFSET * duration) * 1e6,
+        "error_estimate": error,
+        "evaluations": evaluations,
+    }
+
+    if return_path:
+        idx = np.concatenate([p[0] for p in accepted])
+        ends = np.concatenate([p[1] for p in accepted])
+        vals = np.concatenate([p[2] for p in accepted])
+        order = np.lexsort((ends, idx))
+        idx, ends, vals = idx[order], ends[order], vals[order]
+        bounds = np.searchsorted(idx, np.arange(n + 1))
+        result["path"] = [
+            (np.concatenate([[0.0], ends[s:e]]), np.concatenate([[0.0], np.cumsum(vals[s:e])]))
+            for s, e in zip(bounds[:-1], bounds[1:])
+        ]
+    return result
@@ -0,0 +1,185 @@
+import numpy as np
+
+
+class Worldline:
+    """
+    Compact worldline in units with c = 1: coordinate time t, position
+    x, y, z and proper time tau as contiguous float64 arrays.
+
+    x, y, z and tau are (samples,) for one worldline or (lines, samples)
+    for a bundle of many worldlines. t is (samples,) when the lines share
+    coordinate times, or (lines, samples) (e.g. after a boost); every
+    method works on all of these.
+    """
+
+    __slots__ = ("t", "x", "y", "z", "tau")
+
+    def __init__(self, t, x, y=None, z=None, tau=None):
+        self.t = np.ascontiguousarray(t, dtype=np.float64)
+        self.x = np.ascontiguousarray(x, dtype=np.float64)
+        self.y = np.zeros_like(self.x) if y is None else np.ascontiguousarray(y, dtype=np.float64)
+        self.z = np.zeros_like(self.x) if z is None else np.ascontiguousarray(z, dtype=np.float64)
+        self.tau = self._integrate_tau() if tau is None else np.ascontiguousarray(tau, dtype=np.float64)
+
+    def __len__(self):
+        return self.t.shape[-1]
+
+    @property
+    def n_lines(self):
+        return 1 if self.x.ndim == 1 else self.x.shape[0]
+
+    def _integrate_tau(self):
+        # d(tau)^2 = dt^2 - dx^2 - dy^2 - dz^2, tau = 0 at the first sample
+        dt = np.diff(self.t)
+        ds2 = dt * dt - np.diff(self.x) ** 2 - np.diff(self.y) ** 2 - np.diff(self.z) ** 2
+        d_tau = np.sqrt(np.maximum(ds2, 0))
+
+        tau = np.zeros(self.x.shape, dtype=np.float64)
+        np.cumsum(d_tau, axis=-1, out=tau[..., 1:])
+        return tau
+
+    @classmethod
+    def inertial(cls, t, velocity=0.0, x0=0.0):
+        """
+        Straight worldline x = x0 + v t. A scalar velocity gives one
+        worldline; an array of velocities gives a bundle of one worldline
+        per velocity, (lines, samples) even when it holds a single value.
+        """
+        t = np.asarray(t, dtype=np.float64)
+        v = np.asarray(velocity, dtype=np.float64)[..., None]
+        # Scalar v is (1,) here and broadcasts to (samples,); (lines,) -> (lines, samples)
+        x = x0 + v * t
+        tau = np.sqrt(1 - v * v) * (t - t[0])
+        return cls(t, x, tau=tau)
+
+    def line(self, i):
+        """
+        One worldline of a bundle.
+        """
+        if self.x.ndim == 1:
+            return self
+        t = self.t[i] if self.t.ndim == 2 else self.t
+        return Worldline(t, self.x[i], self.y[i], self.z[i], self.tau[i])
+
+    # ---------------------------------------------------------------
+    # Interpolation along the worldline
+    # ---------------------------------------------------------------
+
+    @staticmethod
+    def _locate(grid, values):
+        """
+        Left sample index and fraction for values on a monotonic grid.
+        grid is (samples,) or (lines, samples); for 2-D grids every row is
+        searched in one np.searchsorted call by offsetting the rows so they
+        form a single increasing sequence.
+        """
+        values = np.asarray(values, dtype=np.float64)
+
+        if grid.ndim == 1:
+            i = np.clip(np.searchsorted(grid, values, side="right") - 1, 0, len(grid) - 2)
+            g0, g1 = grid[i], grid[i + 1]
+        else:
+            lines, samples = grid.shape
+            span = grid[:, -1] - grid[:, 0]
+            offset = (np.arange(lines) * (np.max(span) + 1.0))[:, None]
+            flat = (grid - grid[:, :1] + offset).ravel()
+
+            vals = np.broadcast_to(values, (lines, values.shape[-1]))
+            pos = np.searchsorted(flat, (vals - grid[:, :1] + offset).ravel(), side="right") - 1
+            i = np.clip(pos.reshape(lines, -1) - np.arange(lines)[:, None] * samples,
+                        0, samples - 2)
+            rows = np.arange(lines)[:, None]
+            g0, g1 = grid[rows, i], grid[rows, i + 1]
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            frac = np.where(g1 > g0, (values - g0) / (g1 - g0), 0.0)
+        return i, np.clip(frac, 0, 1)
+
+    def _interp(self, arr, i, frac):
+        if arr.ndim == 1:
+            return arr[i] + frac * (arr[i + 1] - arr[i])
+        rows = np.arange(arr.shape[0])[:, None]
+        return arr[rows, i] + frac * (arr[rows, i + 1] - arr[rows, i])
+
+    def _events(self, i, frac):
+        t = self._interp(np.broadcast_to(self.t, self.x.shape), i, frac)
+        return {
+            "t": t,
+            "x": self._interp(self.x, i, frac),
+            "y": self._interp(self.y, i, frac),
+            "z": self._interp(self.z, i, frac),
+            "tau": self._interp(self.tau, i, frac),
+        }
+
+    def at_proper_time(self, tau_values):
+        """
+        Events (dict of t, x, y, z, tau) where the clock reads tau_values,
+        by np.searchsorted on the monotonic proper time plus linear
+        interpolation: O(K log N) for K values.
+        """
+        i, frac = self._locate(self.tau, tau_values)
+        return self._events(i, frac)
+
+    def at_time(self, t_values):
+        """
+        Events at coordinate times t_values (interpolated).
+        """
+        i, frac = self._locate(self.t, t_values)
+        if self.x.ndim == 2 and self.t.ndim == 1:
+            i = np.broadcast_to(i, (self.x.shape[0], i.shape[-1]))
+            frac = np.broadcast_to(frac, i.shape)
+        return self._events(i, frac)
+
+    def ticks(self, num_ticks=10):
+        """
+        num_ticks evenly spaced proper-time ticks from 0 to the final proper
+        time of each worldline, as interpolated events.
+        """
+        if self.tau.ndim == 1:
+            values = np.linspace(0, self.tau[-1], num_ticks)
+        else:
+            values = np.linspace(0, 1, num_ticks) * self.tau[:, -1:]
+        return self.at_proper_time(values)
+
+    # ---------------------------------------------------------------
+    # Frames and relations between worldlines
+    # ---------------------------------------------------------------
+
+    def boost(self, velocity):
+        """
+        Lorentz boost along x into a frame moving at `velocity` (fraction
+        of c). Returns a new Worldline of the same events; proper time is
+        invariant. A bundle comes back with per-line coordinate times.
+        """
+        v = float(velocity)
+        gamma = 1.0 / np.sqrt(1 - v * v)
+
+        t_new = gamma * (self.t - v * self.x)
+        x_new = gamma * (self.x - v * self.t)
+        return Worldline(t_new, x_new, self.y, self.z, self.tau)
+
+    def simultaneous_with(self, other, tau_values):
+        """
+        Events on `other` simultaneous (same coordinate time t in this
+        frame) with this worldline's clock reading tau_values.
+        """
+        return other.at_time(self.at_proper_time(tau_values)["t"])
+
+    def intersections(self, other, tol=1e-9):
+        """
+        Coordinate times at which this worldline and `other` (both single
+        lines) meet: sign changes of x - x_other on this worldline's time
+        grid, linearly refined, where y and z also agree within tol.
+        """
+        pos = other.at_time(self.t)
+        dx = self.x - pos["x"]
+        dy = self.y - pos["y"]
+        dz = self.z - pos["z"]
+
+        i = np.nonzero((dx[:-1] == 0) | (np.sign(dx[:-1]) * np.sign(dx[1:]) < 0))[0]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            frac = np.where(dx[i] != dx[i + 1], dx[i] / (dx[i] - dx[i + 1]), 0.0)
+        t_hit = self.t[i] + frac * (self.t[i + 1] - self.t[i])
+
+        off_axis = np.hypot(dy[i] + frac * (dy[i + 1] - dy[i]), dz[i] + frac * (dz[i + 1] - dz[i]))
+        return t_hit[off_axis <= tol]
@@ -0,0 +1,226 @@
+import asyncio
+import json
+import time
+
+import numpy as np
+import pandas as pd
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+import add_elevation_fast
+from add_elevation_fast import ElevationCache, coordinate_keys, fetch_elevations
+
+
+class FakeOpenTopoData:
+    """
+    Stand-in for the OpenTopoData batch endpoint: elevation = lat + lng,
+    null for points with negative latitude (open ocean). Requests that
+    contain a location in `failing` get HTTP 500; `queued` (status,
+    headers) responses are returned first, one per request.
+    """
+
+    def __init__(self):
+        self.failing = set()
+        self.queued = []
+        self.requests = []
+        self.times = []
+        self.active = 0
+        self.max_active = 0
+
+    async def handle(self, request):
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            await asyncio.sleep(0.02)
+            locations = request.query["locations"].split("|")
+            self.requests.append(locations)
+            self.times.append(time.monotonic())
+            if self.queued:
+                status, headers = self.queued.pop(0)
+                return web.Response(status=status, headers=headers)
+            if self.failing & set(locations):
+                return web.Response(status=500)
+
+            results = []
+            for loc in locations:
+                lat, lng = map(float, loc.split(","))
+                results.append({"elevation": None if lat < 0 else lat + lng,
+                                "location": {"lat": lat, "lng": lng}})
+            return web.json_response({"status": "OK", "results": results})
+        finally:
+            self.active -= 1
+
+    def app(self):
+        app = web.Application()
+        app.router.add_get("/v1/srtm90m", self.handle)
+        return app
+
+
+def _points(n=230, seed=0):
+    rng = np.random.default_rng(seed)
+    lat = np.round(rng.uniform(-20, 60, n), 3)
+    lng = np.round(rng.uniform(0, 100, n), 3)
+    # Duplicates are fetched once
+    return np.concatenate([lat, lat[:30]]), np.concatenate([lng, lng[:30]])
+
+
+def _expected(lat, lng):
+    return np.where(lat < 0, np.nan, lat + lng)
+
+
+async def _fetch(server, lat, lng, cache_path):
+    cache = ElevationCache(cache_path)
+    try:
+        return await fetch_elevations(lat, lng, cache, api_url=str(server.make_url("/v1/srtm90m")),
+                                      batch_size=20, concurrency=4, rate=1000, retries=1,
+                                      progress_every=0)
+    finally:
+        cache.close()
+
+
+def test_fetch_batches_caches_and_resumes(tmp_path):
+    fake = FakeOpenTopoData()
+    lat, lng = _points()
+    cache_path = str(tmp_path / "cache.sqlite")
+    unique = len(set(zip(*coordinate_keys(lat, lng))))
+
+    async def run():
+        server = TestServer(fake.app())
+        await server.start_server()
+        try:
+            # 1. One batch fails every retry
+            fake.failing = {f"{lat[0]:.5f},{lng[0]:.5f}"}
+            first, failures = await _fetch(server, lat, lng, cache_path)
+            first_requests = list(fake.requests)
+
+            # 2. Rerun: only the failed batch is requested again
+            fake.failing = set()
+            fake.requests.clear()
+            second, second_failures = await _fetch(server, lat, lng, cache_path)
+            second_requests = list(fake.requests)
+
+            # 3. Everything cached: no requests at all
+            fake.requests.clear()
+            third, _ = await _fetch(server, lat, lng, cache_path)
+            return first, failures, first_requests, second, second_failures, \
+                second_requests, third, list(fake.requests)
+        finally:
+            await server.close()
+
+    (first, failures, first_requests, second, second_failures,
+     second_requests, third, third_requests) = asyncio.run(run())
+
+    expected = _expected(lat, lng)
+
+    assert all(len(r) <= 20 for r in first_requests)
+    assert len({loc for r in first_requests for loc in r}) == unique
+    assert 1 < fake.max_active <= 4
+
+    assert len(failures) == 1 and failures[0]["locations"] == 20
+    failed = np.isnan(first) & ~np.isnan(expected)
+    assert failed.sum() >= 1 and failed[0]
+    np.testing.assert_allclose(first[~failed], expected[~failed])
+
+    assert second_failures == []
+    assert sum(len(r) for r in second_requests) == 20
+    np.testing.assert_allclose(second, expected)
+
+    assert third_requests == []
+    np.testing.assert_allclose(third, expected)
+
+
+def test_main_writes_failure_report(tmp_path):
+    fake = FakeOpenTopoData()
+    lat, lng = _points(60)
+    pd.DataFrame({"city": np.arange(len(lat)), "lat": lat, "lng": lng}).to_csv(
+        tmp_path / "in.csv", index=False)
+    fake.failing = {f"{lat[0]:.5f},{lng[0]:.5f}"}
+
+    async def run():
+        server = TestServer(fake.app())
+        await server.start_server()
+        try:
+            await add_elevation_fast.main([
+                "--input", str(tmp_path / "in.csv"), "--output", str(tmp_path / "out.csv"),
+                "--cache", str(tmp_path / "cache.sqlite"), "--report", str(tmp_path / "report.json"),
+                "--api-url", str(server.make_url("/v1/srtm90m")),
+                "--batch-size", "20", "--rate", "1000",
+            ])
+        finally:
+            await server.close()
+
+    asyncio.run(run())
+
+    with open(tmp_path / "report.json") as f:
+        report = json.load(f)
+    assert report["failed_batches"] == 1
+    assert report["batches"][0]["error"] == "HTTP 500"
+    out = pd.read_csv(tmp_path / "out.csv")["elevation_meters"].to_numpy()
+    expected = _expected(lat, lng)
+    missing = np.isnan(out) & ~np.isnan(expected)
+    assert missing[0] and missing.sum() <= 20 + 30  # one batch, plus duplicates of its points
+    np.testing.assert_allclose(out[~missing], expected[~missing])
+
+
+def _fetch_with(fake, lat, lng, cache_path, **kwargs):
+    async def run():
+        server = TestServer(fake.app())
+        await server.start_server()
+        cache = ElevationCache(cache_path)
+        try:
+            started = time.monotonic()
+            result = await fetch_elevations(lat, lng, cache,
+                                            api_url=str(server.make_url("/v1/srtm90m")),
+                                            progress_every=0, **kwargs)
+            return result, time.monotonic() - started
+        finally:
+            cache.close()
+            await server.close()
+
+    return asyncio.run(run())
+
+
+def test_rate_limit_has_no_initial_burst(tmp_path):
+    fake = FakeOpenTopoData()
+    lat, lng = _points(80)
+    _fetch_with(fake, lat, lng, str(tmp_path / "cache.sqlite"),
+                batch_size=20, concurrency=4, rate=10)
+
+    assert len(fake.times) == 4
+    assert np.min(np.diff(fake.times)) >= 0.09
+
+
+def test_429_waits_for_retry_after(tmp_path):
+    fake = FakeOpenTopoData()
+    fake.queued = [(429, {"Retry-After": "1"})]
+    lat, lng = _points(10)
+    (values, failures), elapsed = _fetch_with(fake, lat, lng, str(tmp_path / "cache.sqlite"),
+                                              rate=1000, retries=2)
+
+    assert failures == []
+    assert fake.times[1] - fake.times[0] >= 1.0
+    np.testing.assert_allclose(values, _expected(lat, lng))
+
+
+def test_client_errors_are_not_retried(tmp_path):
+    fake = FakeOpenTopoData()
+    fake.queued = [(404, {})] * 3
+    lat, lng = _points(10)
+    (_, failures), elapsed = _fetch_with(fake, lat, lng, str(tmp_path / "cache.sqlite"),
+                                         rate=1000, retries=3)
+
+    assert len(fake.requests) == 1
+    assert failures[0]["error"] == "HTTP 404"
+    assert elapsed < 0.5
+
+
+def test_no_sleep_after_last_attempt(tmp_path):
+    fake = FakeOpenTopoData()
+    fake.queued = [(500, {})] * 2
+    lat, lng = _points(10)
+    (_, failures), elapsed = _fetch_with(fake, lat, lng, str(tmp_path / "cache.sqlite"),
+                                         rate=1000, retries=2)
+
+    assert len(fake.requests) == 2 and failures[0]["error"] == "HTTP 500"
+    # One 0.5 s backoff between the two attempts, none after the last
+    assert elapsed < 0.9
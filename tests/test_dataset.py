@@ -0,0 +1,47 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from src.dataset import cache_path, load_columns
+
+
+def _write_source(path, n=20_000, seed=0):
+    rng = np.random.default_rng(seed)
+    pd.DataFrame({
+        "lat": rng.uniform(-60, 70, n),
+        "lng": rng.uniform(-180, 180, n),
+        "country": rng.choice(["France", "Japan", "Peru"], n),
+    }).to_csv(path, index=False)
+
+
+def _load_sum(args):
+    source, cache_dir = args
+    cols = load_columns(source, ["lat", "country"], cache_dir=cache_dir)
+    return float(np.sum(cols["lat"])), len(cols["country"])
+
+
+def test_concurrent_conversion(tmp_path):
+    source = str(tmp_path / "cities.csv")
+    cache_dir = str(tmp_path / "cache")
+    _write_source(source)
+
+    with ProcessPoolExecutor(max_workers=4) as pool:
+        results = list(pool.map(_load_sum, [(source, cache_dir)] * 8))
+
+    expected = pd.read_csv(source)["lat"].sum()
+    assert all(np.isclose(total, expected) and rows == 20_000 for total, rows in results)
+    leftovers = [name for name in os.listdir(cache_dir) if name.endswith(".tmp")]
+    assert leftovers == []
+
+
+def test_rebuilds_when_source_changes(tmp_path):
+    source = str(tmp_path / "cities.csv")
+    cache_dir = str(tmp_path / "cache")
+    _write_source(source, n=100)
+    assert len(load_columns(source, ["lat"], cache_dir=cache_dir)["lat"]) == 100
+
+    _write_source(source, n=150, seed=1)
+    assert len(load_columns(source, ["lat"], cache_dir=cache_dir)["lat"]) == 150
+    assert os.path.isdir(cache_path(source, cache_dir))
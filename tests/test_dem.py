@@ -0,0 +1,78 @@
+import numpy as np
+
+from src.dem import SRTM_VOID, DEMTiles, add_elevation_column, tile_name
+
+SIZE = 1201
+
+
+def _write_tile(directory, lat_floor, lng_floor, base=100, void=None):
+    # Linear surface z = base + 2 * row + 3 * col, row 0 = north edge
+    rows, cols = np.mgrid[0:SIZE, 0:SIZE]
+    grid = (base + 2 * rows + 3 * cols).astype(">i2")
+    if void is not None:
+        grid[void] = SRTM_VOID
+    grid.tofile(directory / f"{tile_name(lat_floor, lng_floor)}.hgt")
+
+
+def _expected(lat, lng, lat_floor, lng_floor, base=100):
+    row = (lat_floor + 1 - lat) * (SIZE - 1)
+    col = (lng - lng_floor) * (SIZE - 1)
+    return base + 2 * row + 3 * col
+
+
+def test_bilinear_on_linear_surface(tmp_path):
+    _write_tile(tmp_path, 41, -88)
+    rng = np.random.default_rng(0)
+    lat = rng.uniform(41, 42, 500)
+    lng = rng.uniform(-88, -87, 500)
+
+    dem = DEMTiles(str(tmp_path))
+    np.testing.assert_allclose(dem.lookup(lat, lng), _expected(lat, lng, 41, -88), atol=1e-6)
+
+    # Corners and edges of the tile (42.0 itself belongs to the N42 tile)
+    corners = dem.lookup([42.0 - 1e-12, 41.0 + 1e-12, 41.5], [-88.0, -87.0 - 1e-12, -88.0])
+    np.testing.assert_allclose(corners, [100, 100 + 2 * 1200 + 3 * 1200, 100 + 2 * 600], atol=1e-6)
+
+
+def test_voids_and_missing_tiles(tmp_path):
+    _write_tile(tmp_path, 41, -88, void=(600, 600))
+    dem = DEMTiles(str(tmp_path))
+
+    near_void = [41.5 - 0.2 / 1200, -88 + 600.3 / 1200]
+    clear = [41.25, -87.75]
+    missing = [10.5, 10.5]
+    out = dem.lookup([near_void[0], clear[0], missing[0]], [near_void[1], clear[1], missing[1]])
+
+    assert np.isnan(out[0]) and np.isnan(out[2])
+    np.testing.assert_allclose(out[1], _expected(*clear, 41, -88))
+
+    filled = DEMTiles(str(tmp_path), missing_value=-1.0).lookup([missing[0]], [missing[1]])
+    assert filled[0] == -1.0
+
+
+def test_lru_keeps_max_open_tiles(tmp_path):
+    _write_tile(tmp_path, 41, -88)
+    _write_tile(tmp_path, 41, -87, base=500)
+    dem = DEMTiles(str(tmp_path), max_open=1)
+
+    lat = np.array([41.3, 41.6, 41.3])
+    lng = np.array([-86.4, -87.9, -86.6])
+    out = dem.lookup(lat, lng)
+    expected = [_expected(41.3, -86.4, 41, -87, 500), _expected(41.6, -87.9, 41, -88),
+                _expected(41.3, -86.6, 41, -87, 500)]
+    np.testing.assert_allclose(out, expected, atol=1e-6)
+    assert len(dem._open) == 1
+
+    # Evicted tiles are mapped again on demand
+    np.testing.assert_allclose(dem.lookup([41.6], [-87.9]), [expected[1]], atol=1e-6)
+    assert list(dem._open) == ["N41W088"]
+
+
+def test_add_elevation_column(tmp_path):
+    import pandas as pd
+
+    _write_tile(tmp_path, 41, -88)
+    df = pd.DataFrame({"lat": [41.5, 0.5], "lng": [-87.5, 0.5]})
+    add_elevation_column(df, str(tmp_path))
+    np.testing.assert_allclose(df["elevation_meters"][0], _expected(41.5, -87.5, 41, -88))
+    assert np.isnan(df["elevation_meters"][1])
@@ -0,0 +1,63 @@
+import math
+from decimal import Decimal, getcontext
+
+import numpy as np
+import pytest
+
+from src.dilation import G, M, R, SECONDS_PER_YEAR, c, dilation_offsets, omega
+
+
+def _reference(lat_deg, altitude_m):
+    """
+    The original sqrt(1 - grav - rot) formula, evaluated with 50 digits.
+    """
+    getcontext().prec = 50
+    D = Decimal
+
+    def factor(lat, h):
+        r = D(R) + D(float(h))
+        cos2 = D(math.cos(math.radians(float(lat)))) ** 2
+        grav = 2 * D(G) * D(M) / (r * D(c) ** 2)
+        rot = (D(omega) * r) ** 2 * cos2 / D(c) ** 2
+        return (1 - grav - rot).sqrt()
+
+    ideal = factor(0.0, 0.0)
+    us = [(factor(lat, h) - ideal) * D(SECONDS_PER_YEAR) * D(10) ** 6
+          for lat, h in zip(lat_deg, altitude_m)]
+    return np.array([float(factor(lat, h)) for lat, h in zip(lat_deg, altitude_m)]), \
+        np.array([float(u) for u in us])
+
+
+@pytest.fixture(scope="module")
+def points():
+    rng = np.random.default_rng(0)
+    lat = rng.uniform(-90, 90, 300)
+    alt = rng.uniform(-430, 8_850, 300)
+    return lat, alt, *_reference(lat, alt)
+
+
+def test_float64_matches_high_precision(points):
+    lat, alt, ref_factor, ref_us = points
+    factor, us = dilation_offsets(lat, alt)
+    np.testing.assert_allclose(us, ref_us, rtol=0, atol=1e-9)
+    np.testing.assert_allclose(factor, ref_factor, rtol=0, atol=1e-15)
+
+
+def test_float32_within_1e5_microseconds(points):
+    lat, alt, ref_factor, ref_us = points
+    factor, us = dilation_offsets(lat, alt, dtype=np.float32)
+    assert us.dtype == np.float32 and factor.dtype == np.float64
+    np.testing.assert_allclose(us, ref_us, rtol=0, atol=1e-5)
+    np.testing.assert_allclose(factor, ref_factor, rtol=0, atol=1e-15)
+
+
+def test_naive_float64_formula_agrees(points):
+    # The row-wise formula the kernel replaced, in plain float64: same
+    # values up to its own cancellation error (~1e-16 * 3e13 us)
+    lat, alt, _, ref_us = points
+    r = R + alt
+    eps = 2 * G * M / (r * c**2) + (omega * r * np.cos(np.radians(lat)) / c) ** 2
+    eps0 = 2 * G * M / (R * c**2) + (omega * R / c) ** 2
+    naive = (np.sqrt(1 - eps) - np.sqrt(1 - eps0)) * SECONDS_PER_YEAR * 1e6
+    np.testing.assert_allclose(dilation_offsets(lat, alt)[1], naive, rtol=0, atol=0.02)
+    assert np.abs(naive - ref_us).max() > np.abs(dilation_offsets(lat, alt)[1] - ref_us).max()
@@ -0,0 +1,16 @@
+import numpy as np
+
+from src.dilation_raster import DilationRaster, bake_raster
+
+
+def test_pyramid_with_odd_level_sizes(tmp_path):
+    # 1 degree: 180x360 -> 90x180 -> 45x90 -> 22x45 -> 11x22 (45 and 45 are odd)
+    bake_raster(tmp_path, resolution_deg=1.0, levels=5, band_rows=16)
+    raster = DilationRaster(tmp_path)
+
+    assert raster.shapes == [(180, 360), (90, 180), (45, 90), (22, 45), (11, 22)]
+    for level in range(1, len(raster)):
+        finer = np.asarray(raster.level(level - 1), dtype=np.float64)
+        rows, cols = raster.shapes[level]
+        expected = finer[:2 * rows, :2 * cols].reshape(rows, 2, cols, 2).mean(axis=(1, 3))
+        np.testing.assert_allclose(raster.level(level), expected, rtol=1e-6)
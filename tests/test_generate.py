@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from generate_city_time_dataset import (MemmapColumnWriter, generate, generate_streaming,
+                                         open_memmap_columns)
+from src.rank_index import RankIndex, sidecar_path
+
+
+def test_memmap_writer_widens_integer_columns(tmp_path):
+    writer = MemmapColumnWriter(tmp_path)
+    writer.write(pd.DataFrame({"lat": [1.0, 2.0], "population": [500, 400]}))
+    writer.write(pd.DataFrame({"lat": [3.0], "population": [np.nan]}))
+    writer.close()
+
+    cols = open_memmap_columns(tmp_path)
+    assert cols["population"].dtype == np.float64
+    np.testing.assert_array_equal(cols["population"], [500, 400, np.nan])
+
+
+def test_memmap_writer_rejects_schema_drift(tmp_path):
+    writer = MemmapColumnWriter(tmp_path, schema={"lat": "f8", "population": "i8"})
+    writer.write(pd.DataFrame({"lat": [1.0], "population": [500]}))
+
+    with pytest.raises(ValueError, match="missing values"):
+        writer.write(pd.DataFrame({"lat": [2.0], "population": [np.nan]}))
+    with pytest.raises(ValueError, match="missing columns"):
+        writer.write(pd.DataFrame({"lat": [2.0]}))
+    with pytest.raises(TypeError):
+        writer.write(pd.DataFrame({"lat": ["north"], "population": [1]}))
+    writer.close()
+
+
+def test_streaming_rank_index_matches_in_memory(tmp_path):
+    rng = np.random.default_rng(0)
+    n = 5000
+    pd.DataFrame({
+        "city": [f"c{i}" for i in range(n)],
+        "lat": rng.uniform(-60, 70, n),
+        "lng": rng.uniform(-180, 180, n),
+        "country": rng.choice(["France", "Japan", "Peru", "Chad"], n),
+        "population": rng.integers(1000, 10**6, n),
+    }).to_csv(tmp_path / "in.csv", index=False)
+
+    out = tmp_path / "out"
+    rows = generate_streaming(tmp_path / "in.csv", out, chunk_size=700, workers=1, fmt="npy")
+    streamed = RankIndex.load(sidecar_path(out))
+
+    df = generate(tmp_path / "in.csv", tmp_path / "out.csv")
+    in_memory = RankIndex.from_dataframe(df)
+
+    assert rows == n
+    assert streamed.fingerprint == in_memory.fingerprint
+    for key, array in in_memory.arrays.items():
+        np.testing.assert_array_equal(streamed.arrays[key], array)
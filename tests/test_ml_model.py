@@ -0,0 +1,57 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from ml_model import (FEATURES, TARGET, arrays_stale, backup_dir, clear_other_backups, open_arrays,
+                      preprocess_to_memmap)
+
+
+def _write_source(path, n, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({col: rng.uniform(0, 100, n) for col in FEATURES + [TARGET]})
+    df.to_csv(path, index=False)
+
+
+def test_arrays_rebuilt_when_source_changes(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # the columnar cache lives under the working directory
+    source = str(tmp_path / "cities.csv")
+    arrays = str(tmp_path / "arrays")
+
+    _write_source(source, 50)
+    assert arrays_stale(source, arrays)
+    preprocess_to_memmap(source, arrays)
+    assert not arrays_stale(source, arrays)
+
+    _write_source(source, 80, seed=1)
+    os.utime(source, ns=(0, 0))
+    assert arrays_stale(source, arrays)
+
+    preprocess_to_memmap(source, arrays)
+    assert len(open_arrays(arrays)[1]) == 80
+    assert not arrays_stale(source, arrays)
+
+
+def test_backup_dir_is_keyed_on_data_and_setup(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    source = str(tmp_path / "cities.csv")
+    arrays = str(tmp_path / "arrays")
+    root = str(tmp_path / "backup")
+    _write_source(source, 50)
+    preprocess_to_memmap(source, arrays)
+
+    first = backup_dir(arrays, root=root)
+    assert backup_dir(arrays, root=root) == first
+    assert backup_dir(arrays, hidden=(32, 32), root=root) != first
+    assert backup_dir(arrays, batch_size=128, root=root) != first
+
+    # Rebuilt arrays from a changed CSV get a fresh backup
+    _write_source(source, 80, seed=1)
+    preprocess_to_memmap(source, arrays)
+    second = backup_dir(arrays, root=root)
+    assert second != first
+
+    os.makedirs(first)
+    os.makedirs(second)
+    clear_other_backups(second, root=root)
+    assert os.listdir(root) == [os.path.basename(second)]
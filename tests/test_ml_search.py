@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from ml_model import train_test_indices
+from ml_search import cv_folds, leaderboard, pick_model, run_search
+
+
+def test_cv_folds_partition_the_training_rows():
+    train_idx, test_idx = train_test_indices(1_000)
+    folds = cv_folds(1_000, folds=4)
+
+    assert len(folds) == 4
+    joined = np.concatenate(folds)
+    assert len(joined) == len(np.unique(joined))
+    np.testing.assert_array_equal(np.sort(joined), train_idx)
+    assert not np.intersect1d(joined, test_idx).size
+    assert all(np.all(np.diff(fold) > 0) for fold in folds)
+
+    small = np.concatenate(cv_folds(1_000, folds=4, max_rows=200))
+    assert len(small) == 200 and np.isin(small, train_idx).all()
+
+
+def _result(name, mae, latency, pruned=False):
+    return {"name": name, "hidden": [64, 32], "mae": mae, "pruned": pruned,
+            "latency_us_per_row": latency}
+
+
+def test_leaderboard_and_pick_model():
+    board = leaderboard([
+        _result("pruned", 0.5, 0.1, pruned=True),
+        _result("slow-accurate", 1.0, 9.0),
+        _result("fast", 2.0, 1.0),
+        _result("tied-slower", 2.0, 3.0),
+    ])
+    assert list(board["name"]) == ["slow-accurate", "fast", "tied-slower", "pruned"]
+    assert board["hidden"][0] == "64-32"
+
+    assert pick_model(board, max_mae=2.0)["name"] == "fast"
+    assert pick_model(board, max_mae=1.5)["name"] == "slow-accurate"
+    # Pruned trials never qualify, however good their partial MAE
+    assert pick_model(board, max_mae=0.6) is None
+    assert leaderboard([]).empty
+
+
+def test_resume_rejects_other_prune_ratio(tmp_path):
+    output = str(tmp_path / "search.ndjson")
+    run_search([], array_dir="arrays", prune_ratio=2.0, workers=1, threads=0, output=output)
+    with pytest.raises(ValueError, match="different search settings"):
+        run_search([], array_dir="arrays", prune_ratio=1.5, workers=1, threads=0, output=output)
@@ -0,0 +1,47 @@
+import os
+
+import numpy as np
+import pytest
+
+from src.nn_engine import FLOAT32_ATOL, H5_PATH, INT8_RTOL, NPZ_PATH, SCALER_PATH, NumpyMLP, export_npz
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+N_POINTS = 200_000
+
+
+def _path(relative):
+    return os.path.join(REPO, relative)
+
+
+@pytest.fixture(scope="module")
+def reference():
+    """
+    200k random points inside the training range and the Keras model's
+    predictions for them.
+    """
+    joblib = pytest.importorskip("joblib")
+    tf = pytest.importorskip("tensorflow")
+
+    rng = np.random.default_rng(0)
+    X = np.column_stack([
+        rng.uniform(-60, 75, N_POINTS),     # latitude
+        rng.uniform(-180, 180, N_POINTS),   # longitude
+        rng.uniform(0, 4500, N_POINTS),     # elevation (m)
+    ])
+    scaler = joblib.load(_path(SCALER_PATH))
+    model = tf.keras.models.load_model(_path(H5_PATH), compile=False)
+    keras = model.predict(scaler.transform(X), batch_size=8192, verbose=0)[:, 0]
+    return X, keras.astype(np.float64)
+
+
+def test_float32_engine_matches_keras(reference):
+    X, keras = reference
+    engine = NumpyMLP.load(_path(NPZ_PATH))
+    assert np.abs(engine.predict(X) - keras).max() < FLOAT32_ATOL
+
+
+def test_int8_engine_matches_keras(reference, tmp_path):
+    X, keras = reference
+    path = export_npz(_path(H5_PATH), _path(SCALER_PATH), str(tmp_path / "int8.npz"), int8=True)
+    engine = NumpyMLP.load(path)
+    assert np.abs(engine.predict(X) - keras).max() < INT8_RTOL * np.abs(keras).max()
@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+
+from src.pairwise import PairwiseEngine
+from src.spatial_index import EARTH_RADIUS_KM, lat_lng_to_xyz
+
+
+def _engine(n=300, ties=False, seed=0):
+    rng = np.random.default_rng(seed)
+    values = rng.normal(0, 20, n)
+    if ties:
+        values = np.round(values)
+    return PairwiseEngine(values, rng.uniform(-60, 60, n), rng.uniform(-180, 180, n),
+                          rng.choice(["France", "Kenya"], n))
+
+
+def _all_pairs(engine):
+    i, j = np.triu_indices(len(engine), k=1)
+    return i, j, np.abs(engine.values[i] - engine.values[j])
+
+
+@pytest.mark.parametrize("ties", [False, True])
+@pytest.mark.parametrize("largest", [True, False])
+def test_top_pairs_match_brute_force(ties, largest):
+    engine = _engine(ties=ties)
+    _, _, diff = _all_pairs(engine)
+    expected = np.sort(diff)[::-1][:50] if largest else np.sort(diff)[:50]
+
+    row_i, row_j, got = engine.top_pairs(k=50, largest=largest)
+    np.testing.assert_allclose(got, expected)
+    np.testing.assert_allclose(engine.values[row_i] - engine.values[row_j], got)
+    assert len(set(zip(row_i, row_j))) == 50
+
+
+@pytest.mark.parametrize("ties", [False, True])
+def test_pair_histogram_matches_brute_force(ties):
+    engine = _engine(ties=ties)
+    _, _, diff = _all_pairs(engine)
+    counts, edges = engine.pair_histogram(bins=30)
+    np.testing.assert_array_equal(counts, np.histogram(diff, bins=edges)[0])
+    assert counts.sum() == len(diff)
+
+
+def test_scan_pairs_match_brute_force_for_any_workers():
+    engine = _engine(ties=True)
+    i, j, diff = _all_pairs(engine)
+    xyz = lat_lng_to_xyz(engine.lat, engine.lng)
+    dist = EARTH_RADIUS_KM * np.arccos(np.clip(np.einsum("ij,ij->i", xyz[i], xyz[j]), -1, 1))
+    near = dist <= 3_000
+    edges = np.linspace(0, 100, 11)
+
+    serial = engine.scan_pairs(k=40, bins=edges, max_km=3_000, tile=64, workers=1)
+    parallel = engine.scan_pairs(k=40, bins=edges, max_km=3_000, tile=64, workers=2)
+    for a, b in zip(serial, parallel):
+        np.testing.assert_array_equal(a, b)
+
+    row_i, row_j, got, km, hist = serial
+    np.testing.assert_allclose(got, np.sort(diff[near])[::-1][:40])
+    assert np.all(km <= 3_000) and np.all(row_i < row_j)
+    np.testing.assert_array_equal(hist, np.histogram(diff[near], bins=edges)[0])
+
+
+def test_nearest_to_city_on_subset():
+    engine = _engine()
+    kenya = engine.group("Kenya")
+    position = int(kenya.positions[5])
+    rows, values = kenya.nearest_to_city(position, k=10)
+
+    others = kenya.positions != position
+    gaps = np.abs(kenya.values[others] - engine.values[position])
+    np.testing.assert_allclose(np.abs(values - engine.values[position]), np.sort(gaps)[:10])
+    assert position not in rows
+    with pytest.raises(KeyError):
+        kenya.nearest_to_city(int(engine.group("France").positions[0]))
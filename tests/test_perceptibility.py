@@ -0,0 +1,42 @@
+import pandas as pd
+import pytest
+
+from src.perceptibility import run_experiment
+
+SMALL = dict(velocities=[0.0, 0.5 * 299_792_458], offsets={"sea level": 0.0, "peak": 1.5},
+             observers=20_000, batch_size=3_000)
+
+
+def test_identical_for_any_worker_count():
+    serial = run_experiment(**SMALL, workers=1)
+    parallel = run_experiment(**SMALL, workers=3)
+    pd.testing.assert_frame_equal(serial, parallel)
+    assert (serial["observers"] == 20_000).all()
+
+
+def test_resume_after_crash(tmp_path):
+    output = str(tmp_path / "progress.ndjson")
+    full = run_experiment(**SMALL, workers=1, output=output)
+    with open(output) as f:
+        lines = f.readlines()
+    tasks = len(lines) - 1
+
+    # Killed after three batches, half-way through writing the fourth
+    with open(output, "w") as f:
+        f.writelines(lines[:4])
+        f.write(lines[4][:10])
+
+    resumed = run_experiment(**SMALL, workers=2, output=output)
+    pd.testing.assert_frame_equal(full, resumed)
+
+    with open(output) as f:
+        records = f.readlines()[1:]
+    assert len(records) == tasks
+    assert all(line.endswith("\n") for line in records)
+
+
+def test_resume_rejects_other_config(tmp_path):
+    output = str(tmp_path / "progress.ndjson")
+    run_experiment(**SMALL, workers=1, output=output)
+    with pytest.raises(ValueError, match="different configuration"):
+        run_experiment(**SMALL, workers=1, output=output, seed=7)
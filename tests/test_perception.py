@@ -0,0 +1,19 @@
+import numpy as np
+
+from src.perception import FrameIntervalStats, perception_frames, perception_summary
+
+
+def test_scalar_callable_rate_matches_constant():
+    constant = np.concatenate(list(perception_frames(130.0, 20.0)))
+    callable_rate = np.concatenate(list(perception_frames(130.0, lambda t: 20.0)))
+    assert len(callable_rate) == len(constant)
+    np.testing.assert_allclose(callable_rate, constant, atol=1e-9)
+
+
+def test_default_bins_are_not_shared():
+    first = FrameIntervalStats()
+    first.bins[:] = 0
+    assert FrameIntervalStats().bins[-1] == 0.2
+
+    summary = perception_summary(10.0, 20.0)
+    assert summary["histogram"].sum() == summary["intervals"]
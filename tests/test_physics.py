@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+
+from src.physics import BLOCK_SAMPLES, c, proper_time_batch, proper_time_piecewise
+
+
+def _reference(velocities, dt):
+    rate = np.sqrt(1 - (np.asarray(velocities, dtype=np.float64) / c) ** 2)
+    return np.cumsum(rate * dt, axis=1)
+
+
+def _profile(observers=3, samples=500, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.uniform(0, 0.95 * c, (observers, samples))
+
+
+@pytest.mark.parametrize("dtype", [np.float64, np.float32])
+@pytest.mark.parametrize("dt_shape", ["scalar", "samples", "full"])
+def test_dt_shapes(dtype, dt_shape):
+    velocities = _profile()
+    rng = np.random.default_rng(1)
+    dt = {"scalar": 0.01,
+          "samples": rng.uniform(0.005, 0.02, velocities.shape[1]),
+          "full": rng.uniform(0.005, 0.02, velocities.shape)}[dt_shape]
+
+    tau = proper_time_batch(velocities, dt, dtype=dtype)
+    assert tau.dtype == dtype and tau.shape == velocities.shape
+    rtol = 1e-12 if dtype == np.float64 else 1e-6
+    np.testing.assert_allclose(tau, _reference(velocities, dt), rtol=rtol)
+
+
+def test_float32_carry_across_blocks():
+    velocities = _profile(observers=2, samples=BLOCK_SAMPLES + 1_000)
+    tau = proper_time_batch(velocities, 1e-3, dtype=np.float32)
+    expected = _reference(velocities, 1e-3)
+
+    # Accumulated in float64: only the final float32 rounding remains,
+    # on both sides of the block boundary
+    np.testing.assert_allclose(tau, expected, rtol=1e-7)
+    boundary = slice(BLOCK_SAMPLES - 2, BLOCK_SAMPLES + 2)
+    np.testing.assert_allclose(tau[:, boundary], expected[:, boundary], rtol=1e-7)
+
+
+@pytest.mark.parametrize("dtype", [np.float64, np.float32])
+def test_out_buffer(dtype):
+    velocities = _profile()
+    out = np.empty(velocities.shape, dtype=dtype)
+    tau = proper_time_batch(velocities, 0.01, out=out)
+    assert tau is out
+    np.testing.assert_allclose(out, _reference(velocities, 0.01), rtol=1e-6)
+
+
+def test_one_dimensional_velocities():
+    velocities = _profile(observers=1)[0]
+    tau = proper_time_batch(velocities, 0.01)
+    assert tau.shape == (1, len(velocities))
+
+
+def test_piecewise_matches_sampled_profile():
+    rng = np.random.default_rng(2)
+    velocities = rng.uniform(0, 0.9 * c, (4, 3))
+    durations = np.array([1.0, 2.5, 0.5])
+
+    ends = proper_time_piecewise(velocities, durations)
+    np.testing.assert_allclose(ends, np.cumsum(np.sqrt(1 - (velocities / c) ** 2) * durations,
+                                               axis=1))
+
+    # Sampled at 1 ms the same profile integrates to the same values
+    samples = np.repeat(velocities, (durations * 1000).astype(int), axis=1)
+    sampled = proper_time_batch(samples, 1e-3)
+    np.testing.assert_allclose(sampled[:, -1], ends[:, -1], rtol=1e-12)
+
+
+def test_piecewise_times_beyond_last_segment():
+    velocities = np.array([[0.0, 0.6 * c]])
+    durations = np.array([2.0, 3.0])
+    times = np.array([0.0, 1.0, 2.0, 4.0, 5.0, 7.0])
+
+    tau = proper_time_piecewise(velocities, durations, times)
+    # Past t = 5 the last segment's rate (0.8) continues
+    np.testing.assert_allclose(tau[0], [0.0, 1.0, 2.0, 3.6, 4.4, 6.0])
+
+    with pytest.raises(ValueError):
+        proper_time_piecewise(velocities, np.ones((1, 2)), times)
@@ -0,0 +1,47 @@
+import asyncio
+import time
+
+import numpy as np
+import pytest
+
+from predict_service import BatchingPredictor
+
+
+def _sum_features(lat, lng, elevation):
+    return np.asarray(lat) + np.asarray(lng) + np.asarray(elevation)
+
+
+def _slow(lat, lng, elevation):
+    time.sleep(0.2)
+    return _sum_features(lat, lng, elevation)
+
+
+def test_batches_requests():
+    async def run():
+        predictor = BatchingPredictor(_sum_features, max_batch_size=8)
+        await predictor.start()
+        results = await asyncio.gather(*(predictor.predict(i, 1, 2) for i in range(20)))
+        await predictor.stop()
+        return results, predictor.metrics()
+
+    results, metrics = asyncio.run(run())
+    assert results == [i + 3.0 for i in range(20)]
+    assert metrics["requests"] == 20 and metrics["batches"] < 20
+
+
+def test_predict_before_start_raises():
+    with pytest.raises(RuntimeError, match="start"):
+        asyncio.run(BatchingPredictor(_sum_features).predict(0, 0, 0))
+
+
+def test_stop_fails_queued_and_in_flight_requests():
+    async def run():
+        predictor = BatchingPredictor(_slow, max_batch_size=2, max_wait_ms=1)
+        await predictor.start()
+        tasks = [asyncio.create_task(predictor.predict(i, 0, 0)) for i in range(6)]
+        await asyncio.sleep(0.05)  # first batch is now inside _slow
+        await predictor.stop()
+        return await asyncio.wait_for(asyncio.gather(*tasks, return_exceptions=True), 1)
+
+    results = asyncio.run(run())
+    assert all(isinstance(r, RuntimeError) for r in results)
@@ -0,0 +1,102 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pytest
+
+from src.shared_store import attach, cleanup, publish, publish_or_attach, read_manifest
+
+
+def _build(directory):
+    # Each call leaves a marker so the test can count builds across processes
+    open(os.path.join(directory, f"built.{os.getpid()}"), "w").close()
+    return {"values": np.arange(100_000, dtype=np.float64)}, {"source": "test"}
+
+
+def _attach_sum(directory):
+    arrays, meta = publish_or_attach("cities", "v1", lambda: _build(directory), directory)
+    return float(arrays["values"].sum()), meta["source"]
+
+
+def _attach_key(directory):
+    arrays, _ = attach("cities", directory)
+    return read_manifest("cities", directory)["key"], float(arrays["values"][0])
+
+
+def test_publish_or_attach_across_processes(tmp_path):
+    directory = str(tmp_path)
+    with ProcessPoolExecutor(max_workers=4) as pool:
+        results = list(pool.map(_attach_sum, [directory] * 8))
+
+    expected = float(np.arange(100_000).sum())
+    assert results == [(expected, "test")] * 8
+    assert len([f for f in os.listdir(directory) if f.startswith("built.")]) == 1
+
+
+def test_republish_swaps_generation(tmp_path):
+    directory = str(tmp_path)
+    publish("cities", {"values": np.zeros(10)}, "v1", directory=directory)
+    old, _ = attach("cities", directory)
+
+    publish("cities", {"values": np.ones(10)}, "v2", directory=directory)
+    with ProcessPoolExecutor(max_workers=2) as pool:
+        assert list(pool.map(_attach_key, [directory] * 2)) == [("v2", 1.0)] * 2
+
+    # The old mapping stays readable and only the new generation is on disk
+    assert old["values"].sum() == 0
+    data_files = [f for f in os.listdir(directory) if f.endswith(".bin")]
+    assert data_files == [f"cities.{read_manifest('cities', directory)['generation']}.bin"]
+
+
+def test_cleanup(tmp_path):
+    directory = str(tmp_path)
+    publish("cities", {"values": np.ones(10)}, "v1", directory=directory)
+    publish("cities.backup", {"values": np.ones(10)}, "v1", directory=directory)
+    publish_or_attach("cities", "v2", lambda: ({"values": np.ones(5)}, {}), directory)
+
+    cleanup("cities", directory)
+    with pytest.raises(FileNotFoundError):
+        attach("cities", directory)
+    assert not any(f.startswith("cities.") and "backup" not in f for f in os.listdir(directory))
+    assert attach("cities.backup", directory)[0]["values"].sum() == 10
+
+
+def test_indexes_round_trip_through_store(tmp_path):
+    import pandas as pd
+
+    from src.city_index import CityIndex
+    from src.pairwise import PairwiseEngine
+    from src.spatial_index import CitySpatialIndex
+
+    rng = np.random.default_rng(0)
+    n = 500
+    df = pd.DataFrame({
+        "city_ascii": [f"City{i % 200}" for i in range(n)],
+        "admin_name": rng.choice(["North", "South"], n),
+        "country": rng.choice(["France", "Kenya", "Peru"], n),
+        "population": rng.lognormal(10, 2, n),
+        "lat": rng.uniform(-60, 60, n),
+        "lng": rng.uniform(-180, 180, n),
+        "microseconds_difference_per_year": rng.normal(size=n),
+    })
+    directory = str(tmp_path)
+
+    def shared(cls, name, built):
+        arrays, _ = publish_or_attach(name, "v1", lambda: (built.arrays, {}), directory)
+        return cls.from_arrays(arrays)
+
+    cities = CityIndex(df)
+    attached = shared(CityIndex, "city_index", cities)
+    assert attached.search("city1", limit=10) == cities.search("city1", limit=10)
+    assert [attached.position(label) for label in cities.labels] == list(range(n))
+
+    engine = PairwiseEngine.from_dataframe(df)
+    attached = shared(PairwiseEngine, "pairwise", engine)
+    for a, b in zip(attached.top_pairs(20), engine.top_pairs(20)):
+        np.testing.assert_array_equal(a, b)
+    assert list(attached.group("Kenya").positions) == list(engine.group("Kenya").positions)
+
+    spatial = CitySpatialIndex.from_dataframe(df)
+    attached = shared(CitySpatialIndex, "spatial_index", spatial)
+    for a, b in zip(attached.query([10.0], [20.0], k=5), spatial.query([10.0], [20.0], k=5)):
+        np.testing.assert_array_equal(a, b)
@@ -0,0 +1,11 @@
+import numpy as np
+
+from src.spatial_index import CitySpatialIndex
+
+
+def test_query_caps_k_at_city_count():
+    index = CitySpatialIndex([41.88, 48.86, 35.68], [-87.63, 2.35, 139.69], [1.0, 2.0, 3.0])
+    dist, idx, values = index.query([41.0], [-87.0], k=8)
+    assert dist.shape == idx.shape == values.shape == (1, 3)
+    assert idx[0, 0] == 0 and np.all(np.isfinite(dist))
+    assert np.isfinite(index.interpolate([0.0], [0.0], k=8)).all()
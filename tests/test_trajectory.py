@@ -0,0 +1,20 @@
+import numpy as np
+import pytest
+
+from src.trajectory import BalloonAscent, KeplerOrbit, Trajectory
+
+
+def test_trajectory_is_abstract():
+    with pytest.raises(TypeError):
+        Trajectory()
+
+
+@pytest.mark.parametrize("trajectory", [KeplerOrbit.gps(eccentricity=0.05),
+                                        BalloonAscent(41.88, -87.63)])
+def test_closed_form_state_matches_position(trajectory):
+    t = np.array([100.0, 2_000.0, 5_000.0])
+    member = np.zeros(3, dtype=np.int64)
+    r, v2 = trajectory.state(t, member)
+    r_num, v2_num = Trajectory.state(trajectory, t, member)
+    np.testing.assert_allclose(r, r_num, rtol=1e-12)
+    np.testing.assert_allclose(v2, v2_num, rtol=1e-6)
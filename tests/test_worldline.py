@@ -0,0 +1,92 @@
+import numpy as np
+import pytest
+
+from src.worldline import Worldline
+
+T = np.linspace(0, 10, 201)
+
+
+@pytest.mark.parametrize("velocity, lines, shape", [
+    (0.6, 1, (201,)),
+    ([0.6], 1, (1, 201)),
+    ([0.0, 0.6, 0.8], 3, (3, 201)),
+    (np.array([0.3, 0.5]), 2, (2, 201)),
+])
+def test_inertial_shapes(velocity, lines, shape):
+    line = Worldline.inertial(T, velocity)
+    assert line.n_lines == lines
+    assert line.x.shape == line.tau.shape == shape
+    assert len(line) == 201
+
+
+def test_locate_row_offsets_match_per_row_search():
+    rng = np.random.default_rng(0)
+    # Rows start at different times and overlap, with different spans and steps
+    grid = np.sort(rng.uniform(0, 1, (4, 50)), axis=1) * [[1], [5], [0.5], [3]] + [[0], [-2], [0.2], [10]]
+    values = rng.uniform(-3, 14, (4, 30))
+
+    i, frac = Worldline._locate(grid, values)
+    for row in range(4):
+        expected_i, expected_frac = Worldline._locate(grid[row], values[row])
+        np.testing.assert_array_equal(i[row], expected_i)
+        np.testing.assert_allclose(frac[row], expected_frac)
+
+    # Values shared by every row broadcast across lines
+    shared = rng.uniform(0, 1, 30)
+    i, _ = Worldline._locate(grid, shared)
+    assert i.shape == (4, 30)
+    np.testing.assert_array_equal(i[1], Worldline._locate(grid[1], shared)[0])
+
+
+def test_ticks_on_bundle():
+    velocities = np.array([0.0, 0.6, 0.8])
+    ticks = Worldline.inertial(T, velocities).ticks(6)
+    rate = np.sqrt(1 - velocities ** 2)[:, None]
+
+    expected_tau = np.linspace(0, 1, 6) * 10 * rate
+    np.testing.assert_allclose(ticks["tau"], expected_tau, atol=1e-12)
+    np.testing.assert_allclose(ticks["t"], expected_tau / rate, atol=1e-9)
+    np.testing.assert_allclose(ticks["x"], velocities[:, None] * ticks["t"], atol=1e-9)
+
+    single = Worldline.inertial(T, [0.6]).ticks(6)
+    np.testing.assert_allclose(single["tau"], expected_tau[1:2], atol=1e-12)
+
+
+def test_boost():
+    line = Worldline.inertial(T, 0.6, x0=1.0)
+    rest = line.boost(0.6)
+
+    # In its own rest frame the line is at rest, and tau runs with coordinate time
+    np.testing.assert_allclose(rest.x, rest.x[0], atol=1e-12)
+    np.testing.assert_allclose(rest.tau, rest.t - rest.t[0], atol=1e-12)
+    np.testing.assert_array_equal(rest.tau, line.tau)
+    np.testing.assert_allclose(rest.t ** 2 - rest.x ** 2, line.t ** 2 - line.x ** 2, atol=1e-9)
+
+    back = rest.boost(-0.6)
+    np.testing.assert_allclose(back.t, line.t, atol=1e-12)
+    np.testing.assert_allclose(back.x, line.x, atol=1e-12)
+
+    # A bundle gets per-line coordinate times, and stays searchable
+    bundle = Worldline.inertial(T, [0.0, 0.6]).boost(0.6)
+    assert bundle.t.shape == bundle.x.shape == (2, 201)
+    at = bundle.at_proper_time([4.0])
+    np.testing.assert_allclose(at["tau"], [[4.0], [4.0]], atol=1e-12)
+    np.testing.assert_allclose(at["x"][1], bundle.x[1, 0], atol=1e-12)
+
+
+def test_intersections():
+    left = Worldline.inertial(T, 0.5)
+    right = Worldline.inertial(T, -0.5, x0=3.1)
+    np.testing.assert_allclose(left.intersections(right), [3.1], atol=1e-12)
+
+    # Lines that never cross, and lines that cross in x but are apart in y
+    assert left.intersections(Worldline.inertial(T, 0.5, x0=1.0)).size == 0
+    apart = Worldline(T, right.x, y=np.full_like(T, 0.5))
+    assert left.intersections(apart).size == 0
+
+    # A line crossing back and forth meets the rest line twice
+    rest = Worldline.inertial(T, 0.0, x0=1.0)
+    wave = Worldline(T, 1.0 + 0.5 * np.sin(T * np.pi / 4 + 0.1))
+    hits = wave.intersections(rest)
+    assert len(hits) == 2
+    np.testing.assert_allclose(hits, [4 - 0.4 / np.pi, 8 - 0.4 / np.pi], atol=1e-3)